@@ -0,0 +1,72 @@
+"""
+Benchmark for fleet analytics: pure Python vs NumPy.
+
+Builds synthetic telemetry columns grouped by battery (the layout of a
+ColumnarTelemetry store), then times AnalyticsEngine.summarize_fleet()
+against VectorizedAnalyticsEngine.summarize_fleet(). Defaults to 10M
+readings. That both engines agree is checked by
+tests/test_vectorized_engine.py.
+
+    python benchmarks/bench_analytics.py --telemetry 1000000
+"""
+import argparse
+import os
+import sys
+import time
+from array import array
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.analytics_engine import AnalyticsEngine  # noqa: E402
+from services.vectorized_engine import HAS_NUMPY, VectorizedAnalyticsEngine  # noqa: E402
+
+
+# Readings of a battery are an hour apart, from 2025-01-01 (in microseconds)
+START_US = 1_735_689_600_000_000
+HOUR_US = 3_600_000_000
+
+
+def generate(n_batteries, n_telemetry):
+    """Return (battery_ids, temperatures, voltages, timestamps_us) arrays grouped by battery."""
+    battery_ids = array("q")
+    temperatures = array("d")
+    voltages = array("d")
+    timestamps = array("q")
+    per_battery = max(1, n_telemetry // n_batteries)
+    for i in range(n_telemetry):
+        battery_id = min(i // per_battery, n_batteries - 1) + 1
+        battery_ids.append(battery_id)
+        # Every 97th reading is out of range so cleaning has work to do
+        temperatures.append(200.0 if i % 97 == 0 else 20 + (i * 7919 % 300) / 10)
+        voltages.append(48 - (i % per_battery) * 0.001 + (i % 7) / 100)
+        timestamps.append(START_US + (i % per_battery) * HOUR_US)
+    return battery_ids, temperatures, voltages, timestamps
+
+
+def timed(label, func, *args):
+    t0 = time.perf_counter()
+    result = func(*args)
+    print(f"{label:<16} {time.perf_counter() - t0:8.3f}s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--batteries", type=int, default=50_000)
+    parser.add_argument("--telemetry", type=int, default=10_000_000)
+    args = parser.parse_args()
+
+    print(f"Generating {args.batteries} batteries / {args.telemetry} readings ...")
+    columns = generate(args.batteries, args.telemetry)
+
+    timed("pure python", AnalyticsEngine().summarize_fleet, *columns)
+
+    if not HAS_NUMPY:
+        print("NumPy is not installed; only the pure Python path was run.")
+        return
+
+    timed("numpy", VectorizedAnalyticsEngine().summarize_fleet, *columns)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Benchmark for a fleet-wide anomaly detection backfill.
+
+Builds synthetic telemetry columns grouped by battery (the layout of a
+ColumnarTelemetry store) with a few injected faults, then runs
+AnomalyDetector.backfill_columns() over them in one sequential pass.
+Defaults to 10M readings.
+
+    python benchmarks/bench_anomaly.py --telemetry 1000000
+"""
+import argparse
+import os
+import sys
+import time
+from array import array
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.anomaly_detector import AnomalyDetector  # noqa: E402
+
+
+def generate(n_batteries, n_telemetry):
+    """Return the six backfill columns, one reading per minute per battery."""
+    cols = [array("q"), array("q"), array("q"), array("d"), array("d"), array("d")]
+    battery_ids, record_ids, timestamps, temps, volts, amps = cols
+    per_battery = max(1, n_telemetry // n_batteries)
+    for i in range(n_telemetry):
+        j = i % per_battery
+        battery_ids.append(min(i // per_battery, n_batteries - 1) + 1)
+        record_ids.append(i + 1)
+        timestamps.append(1_735_689_600_000_000 + j * 60_000_000)
+        noise = (i * 7919 % 1000) / 1000
+        temps.append(30 + noise + (40 if i % 10_007 == 5_000 else 0))
+        volts.append(48 + noise / 10 - (8 if i % 20_011 == 9_000 else 0))
+        amps.append(10 + noise)
+    return cols
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--batteries", type=int, default=50_000)
+    parser.add_argument("--telemetry", type=int, default=10_000_000)
+    args = parser.parse_args()
+
+    print(f"Generating {args.batteries} batteries / {args.telemetry} readings ...")
+    columns = generate(args.batteries, args.telemetry)
+
+    detector = AnomalyDetector()
+    t0 = time.perf_counter()
+    found = sum(1 for _ in detector.backfill_columns(*columns))
+    elapsed = time.perf_counter() - t0
+
+    print(f"{'backfill':<16} {elapsed:8.3f}s  ({args.telemetry / elapsed:,.0f} readings/s)")
+    print(f"{'anomalies':<16} {found}")
+
+
+if __name__ == "__main__":
+    main()
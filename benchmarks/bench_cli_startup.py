@@ -0,0 +1,125 @@
+"""
+Startup-time benchmark for the fleet.py command line.
+
+Builds a large fleet in a throwaway data directory, then runs each
+command as a fresh process several times and reports the median wall
+time (stdout discarded). Light commands (help, trucks and batteries)
+should stay well under 100 ms; the telemetry and analytics commands are
+listed for comparison, as is loading the full repository the way the
+interactive menu does before it shows anything.
+
+    python benchmarks/bench_cli_startup.py --trucks 5000 --readings 500000
+"""
+import argparse
+import itertools
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from storage.backend import open_backend  # noqa: E402
+
+# Target for light commands, in seconds
+TARGET = 0.1
+
+# Readings the benchmark adds: "{new_id}" in a command becomes the next
+# id above the generated ones and "{new_time}" a time just after the
+# middle generated reading, so no run is a duplicate and each one is
+# checked against a day full of readings
+NEW_IDS = itertools.count(10 ** 12)
+
+COMMANDS = [
+    ("python (empty)", ["-c", "pass"], False),
+    ("fleet --help", ["fleet.py", "--help"], True),
+    ("trucks list", ["fleet.py", "trucks", "list"], True),
+    ("batteries list --truck 1", ["fleet.py", "batteries", "list", "--truck", "1"], True),
+    ("telemetry list --battery 1", ["fleet.py", "telemetry", "list", "--battery", "1", "--limit", "10"], False),
+    ("telemetry add", ["fleet.py", "telemetry", "add", "--record-id", "{new_id}", "--truck", "1", "--battery", "1",
+                       "--temperature", "30", "--voltage", "48", "--current", "10",
+                       "--timestamp", "{new_time}"], False),
+    ("analytics run --battery 1", ["fleet.py", "analytics", "run", "--battery", "1", "--workers", "1"], False),
+    ("menu load (main.py)", ["-c", "import main; main.FleetRepository.load()"], False),
+]
+
+
+def make_data(data_dir, storage, trucks, batteries_per_truck, readings):
+    backend = open_backend(storage, data_dir)
+    backend.replace_all("users", [{
+        "user_id": i, "name": f"User {i}", "email": f"user{i}@example.com",
+        "role": "viewer", "password_hash": "0" * 64, "trucks": [i],
+    } for i in range(1, trucks + 1)])
+    backend.replace_all("trucks", [{
+        "truck_id": i, "VIN": f"BENCH{i:012d}", "make": "Ford", "model": "F150", "year": 2020,
+    } for i in range(1, trucks + 1)])
+
+    battery_count = trucks * batteries_per_truck
+    backend.replace_all("batteries", [{
+        "battery_id": i, "truck_id": (i - 1) // batteries_per_truck + 1,
+        "capacity_ah": 350.0, "voltage_v": 72.0, "status": "active",
+    } for i in range(1, battery_count + 1)])
+
+    start = datetime(2025, 1, 1)
+    step = timedelta(days=30) / max(1, readings // battery_count)
+    rows = []
+    for i in range(readings):
+        battery_id = i % battery_count + 1
+        rows.append({
+            "record_id": i + 1,
+            "truck_id": (battery_id - 1) // batteries_per_truck + 1,
+            "battery_id": battery_id,
+            "temperature_c": 20.0 + i % 30,
+            "voltage_v": 48.0 - (i % 100) / 100,
+            "current_a": 10.0,
+            "timestamp": (start + step * (i // battery_count)).isoformat(),
+        })
+    backend.upsert("telemetry", rows)
+    backend.close()
+    return datetime.fromisoformat(rows[len(rows) // 2]["timestamp"]) if rows else start
+
+
+def time_command(argv, env, runs, busy_time):
+    """Median wall time of running argv `runs` times (busy_time: see NEW_IDS)."""
+    times = []
+    for run in range(1, runs + 1):
+        new_id = str(next(NEW_IDS))
+        new_time = (busy_time + timedelta(microseconds=run)).isoformat()
+        args = [a.replace("{new_id}", new_id).replace("{new_time}", new_time) for a in argv]
+        t0 = time.perf_counter()
+        subprocess.run([sys.executable, *args], cwd=ROOT, env=env, check=True,
+                       stdout=subprocess.DEVNULL)
+        times.append(time.perf_counter() - t0)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--trucks", type=int, default=5000)
+    parser.add_argument("--batteries-per-truck", type=int, default=4)
+    parser.add_argument("--readings", type=int, default=500_000)
+    parser.add_argument("--storage", choices=("json", "sqlite"), default="json")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        t0 = time.perf_counter()
+        busy_time = make_data(data_dir, args.storage, args.trucks, args.batteries_per_truck, args.readings)
+        print(f"{args.trucks} trucks, {args.trucks * args.batteries_per_truck} batteries, "
+              f"{args.readings} readings ({args.storage}, built in {time.perf_counter() - t0:.1f}s)")
+
+        env = dict(os.environ, FLEET_DATA_DIR=data_dir, FLEET_STORAGE=args.storage)
+        for label, argv, light in COMMANDS:
+            seconds = time_command(argv, env, args.runs, busy_time)
+            verdict = ""
+            if light:
+                verdict = "ok" if seconds < TARGET else f"over {TARGET * 1000:.0f} ms"
+            print(f"{label:<28} {seconds * 1000:8.1f} ms  {verdict}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Memory and construction-rate benchmark for TelemetryRecord.
+
+Compares three ways of building N records:
+  dict layout  - the validated constructor on a copy of the class without
+                 __slots__ (the layout the models had before)
+  validated    - TelemetryRecord(...) with its setter checks
+  trusted      - TelemetryRecord.from_rows(...), used when loading storage
+
+    python benchmarks/bench_models.py --records 1000000
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+import types
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.telemetry import TelemetryRecord  # noqa: E402
+
+
+def without_slots(cls):
+    """Copy a slotted class into an equivalent class that uses a __dict__."""
+    namespace = {
+        k: v for k, v in vars(cls).items()
+        if k != "__slots__" and not isinstance(v, types.MemberDescriptorType)
+    }
+    return type(cls.__name__, (), namespace)
+
+
+def make_rows(n):
+    start = datetime(2025, 1, 1)
+    return [{
+        "record_id": i,
+        "truck_id": None,
+        "battery_id": None,
+        "temperature_c": 20.0 + (i % 30),
+        "voltage_v": 48.0 + (i % 7) / 10,
+        "current_a": 10.0 + (i % 5),
+        "timestamp": (start + timedelta(seconds=i)).isoformat()
+    } for i in range(n)]
+
+
+def build_validated(cls, rows):
+    parse = datetime.fromisoformat
+    return [
+        cls(r["record_id"], None, None, r["temperature_c"], r["voltage_v"],
+            r["current_a"], parse(r["timestamp"]))
+        for r in rows
+    ]
+
+
+def build_trusted(rows):
+    return TelemetryRecord.from_rows(rows, {}, {})
+
+
+def measure(label, func, *args):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    records = func(*args)
+    elapsed = time.perf_counter() - t0
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    n = len(records)
+    print(f"{label:<12} {n / elapsed:>12,.0f} records/s "
+          f"{current / n:>8.1f} bytes/record")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--records", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    rows = make_rows(args.records)
+    measure("dict layout", build_validated, without_slots(TelemetryRecord), rows)
+    measure("validated", build_validated, TelemetryRecord, rows)
+    measure("trusted", build_trusted, rows)
+
+
+if __name__ == "__main__":
+    main()
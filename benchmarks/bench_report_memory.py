@@ -0,0 +1,64 @@
+"""
+Memory benchmark for the report export.
+
+Builds a fleet in a throwaway data directory and reports the peak memory
+(tracemalloc) and time of exporting the report two ways: streaming the
+stored telemetry into per-battery running stats (what
+`python -m services.report_export` does) and loading every reading with
+load_all() first. The streamed peak should stay flat as --readings grows.
+
+    python benchmarks/bench_report_memory.py --readings 500000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import database_manager  # noqa: E402
+from bench_cli_startup import make_data  # noqa: E402
+from services.report_export import export_report, export_stored  # noqa: E402
+
+
+def loaded_export(path):
+    _, _, batteries, _ = database_manager.load_all()
+    return export_report(path, batteries)
+
+
+def measure(export, path):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    try:
+        export(path)
+        return time.perf_counter() - t0, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--trucks", type=int, default=500)
+    parser.add_argument("--batteries-per-truck", type=int, default=4)
+    parser.add_argument("--readings", type=int, default=200_000)
+    parser.add_argument("--storage", choices=("json", "sqlite"), default="json")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        make_data(data_dir, args.storage, args.trucks, args.batteries_per_truck, args.readings)
+        database_manager.set_backend(args.storage, data_dir)
+        print(f"{args.trucks} trucks, {args.trucks * args.batteries_per_truck} batteries, "
+              f"{args.readings} readings ({args.storage})")
+
+        out = os.path.join(data_dir, "report.csv")
+        for label, export in (("streamed", export_stored), ("load_all", loaded_export)):
+            seconds, peak = measure(export, out)
+            print(f"{label:<10} peak {peak / 2**20:8.1f} MiB  {seconds:6.2f} s")
+        database_manager.get_backend().close()
+
+
+if __name__ == "__main__":
+    main()
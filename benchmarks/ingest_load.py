@@ -0,0 +1,151 @@
+"""
+Load generator for the telemetry ingestion server.
+
+Opens many concurrent connections, each sending batches of readings and
+waiting for the acknowledgement, then reports the sustained readings per
+second and the p50/p99 latency from sending a batch to its ack (which
+includes the storage write). Batches refused by a full queue (drop-oldest
+or reject overflow) are resent after a short pause and counted as
+retries. The server's queue metrics are printed at the end.
+
+By default it starts a server on a throwaway data directory; use
+--port with --no-spawn to load an already running server instead.
+
+    python benchmarks/ingest_load.py --connections 50 --batches 200 --batch-size 20
+    python benchmarks/ingest_load.py --max-queue 5000 --overflow reject
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def make_data_dir(path):
+    """Minimal fleet: one truck with one battery (ids 1)."""
+    files = {
+        "users.json": [],
+        "trucks.json": [{"truck_id": 1, "VIN": "LOADTEST00001", "make": "Ford",
+                         "model": "F150", "year": 2020}],
+        "batteries.json": [{"battery_id": 1, "truck_id": 1, "capacity_ah": 350.0,
+                            "voltage_v": 72.0, "status": "active"}],
+    }
+    for name, rows in files.items():
+        with open(os.path.join(path, name), "w") as f:
+            json.dump(rows, f)
+
+
+def spawn_server(data_dir, args):
+    env = dict(os.environ, FLEET_DATA_DIR=data_dir)
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "services.ingest_server", "--port", str(args.port),
+         "--max-batch", str(args.max_batch), "--max-delay-ms", str(args.max_delay_ms),
+         "--max-queue", str(args.max_queue), "--overflow", args.overflow],
+        cwd=ROOT, env=env, stdout=subprocess.PIPE, text=True
+    )
+    proc.stdout.readline()   # "Listening on ..."
+    return proc
+
+
+async def connection(host, port, conn_id, args, latencies, retries):
+    reader, writer = await asyncio.open_connection(host, port)
+    record_id = args.first_id + conn_id * args.batches * args.batch_size
+    for b in range(args.batches):
+        batch = []
+        for i in range(args.batch_size):
+            batch.append({
+                "record_id": record_id,
+                "truck_id": args.truck_id,
+                "battery_id": args.battery_id,
+                "temperature_c": 30 + (record_id % 20),
+                "voltage_v": 48.0,
+                "current_a": 10.0,
+                "timestamp": f"2025-03-01T{(b // 60) % 24:02d}:{b % 60:02d}:{i % 60:02d}",
+            })
+            record_id += 1
+        line = (json.dumps(batch) + "\n").encode()
+        t0 = time.perf_counter()
+        while True:
+            writer.write(line)
+            await writer.drain()
+            reply = json.loads(await reader.readline())
+            if reply.get("rejected"):
+                raise RuntimeError(f"Server rejected readings: {reply}")
+            if not reply.get("error"):
+                break
+            # Refused by a full queue: back off and resend
+            retries.append(1)
+            await asyncio.sleep(0.01)
+        latencies.append(time.perf_counter() - t0)
+    writer.close()
+    await writer.wait_closed()
+
+
+async def run(host, port, args):
+    latencies = []
+    retries = []
+    t0 = time.perf_counter()
+    await asyncio.gather(*(connection(host, port, c, args, latencies, retries)
+                           for c in range(args.connections)))
+    elapsed = time.perf_counter() - t0
+
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(b'{"metrics": true}\n')
+    metrics = json.loads(await reader.readline())
+    writer.close()
+    await writer.wait_closed()
+
+    readings = args.connections * args.batches * args.batch_size
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2]
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(f"{'readings':<16} {readings}")
+    print(f"{'elapsed':<16} {elapsed:8.3f}s")
+    print(f"{'throughput':<16} {readings / elapsed:,.0f} readings/s")
+    print(f"{'p50 latency':<16} {p50 * 1000:8.1f} ms")
+    print(f"{'p99 latency':<16} {p99 * 1000:8.1f} ms")
+    print(f"{'retries':<16} {len(retries)}")
+    for name, value in metrics.get("queue", {}).items():
+        print(f"{'queue ' + name:<16} {value}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--no-spawn", action="store_true",
+                        help="Use a running server instead of starting one")
+    parser.add_argument("--connections", type=int, default=50)
+    parser.add_argument("--batches", type=int, default=100)
+    parser.add_argument("--batch-size", type=int, default=20)
+    parser.add_argument("--first-id", type=int, default=10_000_000)
+    parser.add_argument("--truck-id", type=int, default=1)
+    parser.add_argument("--battery-id", type=int, default=1)
+    parser.add_argument("--max-batch", type=int, default=5000)
+    parser.add_argument("--max-delay-ms", type=float, default=50)
+    parser.add_argument("--max-queue", type=int, default=50000)
+    parser.add_argument("--overflow", default="block",
+                        choices=("block", "drop-oldest", "reject"))
+    args = parser.parse_args()
+
+    if args.no_spawn:
+        asyncio.run(run(args.host, args.port, args))
+        return
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        make_data_dir(data_dir)
+        server = spawn_server(data_dir, args)
+        try:
+            asyncio.run(run(args.host, args.port, args))
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
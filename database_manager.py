@@ -1,4 +1,3 @@
-import json
 import os
 from datetime import datetime
 
@@ -6,37 +5,256 @@ from models.user import User
 from models.truck import Truck
 from models.battery import Battery
 from models.telemetry import TelemetryRecord
+from models.telemetry_list import TelemetryList
+from services.anomaly_detector import ANOMALY_FILE, AnomalyDetector
+from services.quantiles import SKETCH_FILE, QuantileSketches
+from services.rollups import ROLLUP_FILE, TelemetryRollups
+from storage.backend import open_backend
+from storage.columnar import ColumnarTelemetry
+from storage.derived import DerivedView
 
 
-DATA_DIR = "data"
+DATA_DIR = os.environ.get("FLEET_DATA_DIR", "data")
 
-# ===== Functions for loading and saving raw JSON =====
+# Which storage backend to use: "json" (default) or "sqlite"
+STORAGE_BACKEND = os.environ.get("FLEET_STORAGE", "json")
 
-def load_json(filename):
-    path = os.path.join(DATA_DIR, filename)
-    if not os.path.exists(path):
-        with open(path, "w") as f:
-            f.write("[]")
-    with open(path, "r") as f:
-        return json.load(f)
-    
+# Read-only columnar copy of the telemetry, used for analytics scans
+TELEMETRY_COLUMNS = "telemetry.cols"
 
-def save_json(filename, data):
-    path = os.path.join(DATA_DIR, filename)
-    with open(path, "w") as f:
-        json.dump(data, f, indent=4)
+# Data derived from the telemetry and kept up to date by every write
+# through open_storage(): name -> (file in the data directory, class)
+DERIVED = {
+    "rollups": (ROLLUP_FILE, TelemetryRollups),
+    "anomalies": (ANOMALY_FILE, AnomalyDetector),
+    "sketches": (SKETCH_FILE, QuantileSketches),
+}
 
+_backend = None
 
-# ===== Loading functions - Converts JSON to Python Objects =====
+# DerivedViews of the active backend, by name
+_views = {}
 
+# Hydrator used by the lazy telemetry lists created in load_all()
+_hydrator = None
 
-def load_users():
+
+# ===== Storage backend =====
+
+
+def open_storage(name=None, data_dir=None):
+    """
+    Open a backend (default: the configured one) whose telemetry writes
+    keep the derived data (see DERIVED) up to date. Every process that
+    writes telemetry opens its backends here. Returns (backend, views).
+    """
+    backend = open_backend(name or STORAGE_BACKEND, data_dir or DATA_DIR)
+    views = {key: DerivedView(backend, filename, cls) for key, (filename, cls) in DERIVED.items()}
+    return backend, views
+
+
+def get_backend():
+    """
+    Return the active storage backend, opening it on first use.
+    Reopens it if DATA_DIR or STORAGE_BACKEND were changed.
+    """
+    global _backend, _views
+    if (_backend is None or _backend.name != STORAGE_BACKEND
+            or _backend.data_dir != DATA_DIR):
+        if _backend is not None:
+            _backend.close()
+        _backend, _views = open_storage()
+    return _backend
+
+
+def rollups():
+    """
+    Minute/hour/day rollups of the stored telemetry (services.rollups),
+    loaded from data/rollups.json and brought up to date if needed.
+    """
+    get_backend()
+    return _views["rollups"].get()
+
+
+def sketches(battery_ids=None):
+    """
+    Per-battery quantile sketches of the stored telemetry
+    (services.quantiles), loaded from data/sketches.json and brought up
+    to date if needed. With battery_ids, only the sketches of those
+    batteries are read; query the result only for them.
+    """
+    get_backend()
+    if battery_ids is not None:
+        return _views["sketches"].get_part(battery_ids)
+    return _views["sketches"].get()
+
+
+def watch_anomalies(callback, build=True):
+    """
+    Score every telemetry write of this process for anomalies
+    (services.anomaly_detector) and call callback(anomalies) with what
+    each one flags. The detector state is kept in data/anomalies.json;
+    with build=False writes are not scored while that file does not
+    exist, instead of building it from all telemetry. Returns whether
+    writes are scored.
+    """
+    get_backend()
+    return _views["anomalies"].watch(callback, build)
+
+
+def set_backend(name, data_dir=None):
+    """Select the storage backend ("json" or "sqlite") and data directory."""
+    global STORAGE_BACKEND, DATA_DIR
+    STORAGE_BACKEND = name
+    if data_dir is not None:
+        DATA_DIR = data_dir
+    return get_backend()
+
+
+def compact_telemetry():
+    """Reclaim space from deleted or overwritten telemetry rows."""
+    get_backend().compact()
+
+
+def drop_telemetry_before(cutoff):
+    """
+    Retention: delete telemetry taken before the cutoff datetime.
+    With the JSON backend whole day partitions are dropped, so readings
+    from the cutoff's own day are kept.
+    """
+    return get_backend().drop_telemetry_before(cutoff)
+
+
+def data_stamp(ignore=()):
+    """Fingerprint of the stored data; changes whenever anything is written."""
+    get_backend()
+    derived = [name for view in _views.values() for name in view.files]
+    return _backend.data_stamp(ignore=(TELEMETRY_COLUMNS, *derived, *ignore))
+
+
+# ===== Columnar telemetry =====
+
+
+def _telemetry_columns_version(backend):
+    return [backend.name, backend.telemetry_version()]
+
+
+def build_telemetry_columns():
+    """
+    Write the current telemetry into the columnar store (telemetry.cols).
+    Rebuild it after ingesting data to make the new readings visible there.
+    """
+    backend = get_backend()
+    path = os.path.join(DATA_DIR, TELEMETRY_COLUMNS)
+    with backend.lock:
+        ColumnarTelemetry.write(path, backend.read_rows("telemetry"),
+                                _telemetry_columns_version(backend))
+    return path
+
+
+def current_telemetry_columns():
+    """
+    Path of the columnar store, rebuilt first if telemetry was written
+    (by any process) since it was built, so it holds the stored telemetry.
+    """
+    backend = get_backend()
+    path = os.path.join(DATA_DIR, TELEMETRY_COLUMNS)
+    with backend.lock:
+        try:
+            with ColumnarTelemetry(path) as store:
+                version = store.version
+        except (OSError, ValueError):
+            version = None
+        if version != _telemetry_columns_version(backend):
+            build_telemetry_columns()
+    return path
+
+
+def open_telemetry_columns(rebuild=False):
     """
-    Load all users from users.json and reconstruct User objects.
+    Open the columnar telemetry store with mmap, building it if needed.
+    Close it (or use it in a with-block) when done.
+    """
+    path = os.path.join(DATA_DIR, TELEMETRY_COLUMNS)
+    if rebuild or not os.path.exists(path):
+        build_telemetry_columns()
+    return ColumnarTelemetry(path)
+
+
+# ===== Object -> row conversion =====
+
+
+def user_to_dict(u):
+    return {
+        "user_id": u.user_id,
+        "name": u.name,
+        "email": u.email,
+        "role": u.role,
+        "password_hash": u.password,     # already hashed
+        "trucks": [t.truck_id for t in u.trucks]
+    }
+
+
+def truck_to_dict(t):
+    return {
+        "truck_id": t.truck_id,
+        "VIN": t.VIN,
+        "make": t.make,
+        "model": t.model,
+        "year": t.year
+    }
+
+
+def battery_to_dict(b):
+    return {
+        "battery_id": b.battery_id,
+        "truck_id": b.truck.truck_id if b.truck else None,
+        "capacity_ah": b.capacity_ah,
+        "voltage_v": b.voltage_v,
+        "status": b.status
+    }
+
+
+def telemetry_to_dict(r):
+    return {
+        "record_id": r.record_id,
+        "truck_id": r.truck.truck_id if r.truck else None,
+        "battery_id": r.battery.battery_id if r.battery else None,
+        "temperature_c": r.temperature_c,
+        "voltage_v": r.voltage_v,
+        "current_a": r.current_a,
+        "timestamp": r.timestamp.isoformat()
+    }
+
+
+TO_DICT = {
+    "users": user_to_dict,
+    "trucks": truck_to_dict,
+    "batteries": battery_to_dict,
+    "telemetry": telemetry_to_dict,
+}
+
+# Model class -> (table, id attribute)
+TABLE_OF = {
+    User: ("users", "user_id"),
+    Truck: ("trucks", "truck_id"),
+    Battery: ("batteries", "battery_id"),
+    TelemetryRecord: ("telemetry", "record_id"),
+}
+
+
+# ===== Loading functions - Converts stored rows to Python Objects =====
+
+
+def load_users(trucks=None):
+    """
+    Load all users from storage and reconstruct User objects.
     Handles both new and old JSON formats.
+    If trucks are given, each user is linked to its trucks in the same pass.
     """
-    users_raw = load_json("users.json")
+    users_raw = get_backend().read_rows("users")
     users = []
+    truck_map = {t.truck_id: t for t in trucks} if trucks is not None else {}
 
     for u in users_raw:
 
@@ -52,6 +270,7 @@ def load_users():
                 u["role"]
             )
 
+            _link_user_trucks(user, u, truck_map)
             users.append(user)
             continue
 
@@ -66,211 +285,323 @@ def load_users():
         # Override the temporary hash
         user._password_hash = u["password_hash"]
 
+        _link_user_trucks(user, u, truck_map)
         users.append(user)
 
     return users
 
 
+def _link_user_trucks(user, user_raw, truck_map):
+    for truck_id in user_raw.get("trucks", []):
+        truck = truck_map.get(truck_id)
+        if truck:
+            user.add_truck(truck)
 
 
-def load_trucks():
+def load_trucks(truck_ids=None):
     """
-    Load all trucks from trucks.json
+    Load all trucks from storage, or only those whose ids are in truck_ids.
+    Batteries link themselves to their truck in load_batteries().
     """
-    trucks_raw = load_json("trucks.json")
-    trucks = []
+    if truck_ids is None:
+        trucks_raw = get_backend().read_rows("trucks")
+    else:
+        trucks_raw = get_backend().read_rows_where("trucks", "truck_id", truck_ids)
 
-    for t in trucks_raw:
-        truck = Truck(t["truck_id"], t["VIN"], t["make"], t["model"], 
-                      t["year"])
+    # Stored rows were validated when they were written
+    return Truck.from_rows(trucks_raw)
 
-        truck._batteries = t["batteries"]
-        truck._telemetry = t["telemetry"]
 
-        trucks.append(truck)
+def load_batteries(trucks, truck_ids=None):
+    """
+    Load all batteries, or only those of the trucks in truck_ids, and
+    link each one to its truck
+    """
+    if truck_ids is None:
+        batteries_raw = get_backend().read_rows("batteries")
+    else:
+        batteries_raw = get_backend().read_rows_where("batteries", "truck_id", truck_ids)
 
-    return trucks
+    truck_map = {t.truck_id: t for t in trucks}
+    return Battery.from_rows(batteries_raw, truck_map)
 
 
-def load_batteries(trucks):
+def load_battery(battery_id, start=None, end=None):
     """
-    Load all batteries and link each one to its truck
+    Load one battery with its truck and its telemetry (readings taken in
+    [start, end) if given), without reading any other battery or truck.
+    Returns None if there is no such battery.
     """
-    batteries_raw = load_json("batteries.json")
-    batteries = []
+    backend = get_backend()
+    rows = backend.read_rows_where("batteries", "battery_id", [battery_id])
+    if not rows:
+        return None
+
+    truck_id = rows[0]["truck_id"]
+    trucks = load_trucks({truck_id}) if truck_id is not None else []
+    truck_map = {t.truck_id: t for t in trucks}
+    battery = Battery.from_rows(rows, truck_map)[0]
 
-    for b in batteries_raw:
-        # Find corresponding truck object
-        truck = next((t for t in trucks if t.truck_id == b["truck_id"]), None)
+    telemetry_raw = backend.read_telemetry(battery_id=battery_id, start=start, end=end)
+    records = TelemetryRecord.from_rows(telemetry_raw, truck_map, {battery_id: battery})
+    battery._telemetry = TelemetryList(records)
+    return battery
 
-        battery = Battery(
-            b["battery_id"],
-            truck,
-            b["capacity_ah"],
-            b["voltage_v"],
-            b["status"]
-        )
 
-        battery._telemetry = b["telemetry"]
+def load_telemetry(trucks, batteries, start=None, end=None):
+    """
+    Load telemetry records and link them to their truck and battery.
+    If start/end are given only readings taken in [start, end) are loaded,
+    and only the storage partitions overlapping that window are read.
+    """
+    telemetry_raw = get_backend().read_telemetry(start=start, end=end)
+
+    truck_map = {t.truck_id: t for t in trucks}
+    battery_map = {b.battery_id: b for b in batteries}
+
+    # Stored rows were validated when they were written
+    records = TelemetryRecord.from_rows(telemetry_raw, truck_map, battery_map)
 
-        batteries.append(battery)
+    for record in records:
+        if record.truck is not None:
+            record.truck.add_telemetry(record)
+        if record.battery is not None:
+            record.battery.add_telemetry(record)
 
-    return batteries
+    return records
 
 
-def load_telemetry(trucks, batteries):
+class TelemetryHydrator:
     """
-    Load telemetry records and link them to their truck and battery.
+    Builds TelemetryRecords from storage on demand for lazy TelemetryLists.
+    Each record is built once and shared by its truck's and battery's list.
     """
-    telemetry_raw = load_json("telemetry.json")
-    records = []
 
-    for r in telemetry_raw:
-        truck = next((t for t in trucks if t.truck_id == r["truck_id"]), None)
-        battery = next((b for b in batteries if b.battery_id == r["battery_id"]), None)
+    def __init__(self, backend, trucks, batteries, start=None, end=None):
+        self._backend = backend
+        self._window = {"start": start, "end": end}
+        self._truck_map = {t.truck_id: t for t in trucks}
+        self._battery_map = {b.battery_id: b for b in batteries}
+        self._records = {}
+
+        # Without indexed reads, all rows are read once and grouped by owner
+        self._rows_by = None
+
+    def _build(self, r):
+        record = self._records.get(r["record_id"])
+        if record is not None:
+            return record
 
-        record = TelemetryRecord(
+        # Built without linking, so building a record never triggers
+        # loading of the lists it belongs to.
+        record = TelemetryRecord.from_trusted(
             r["record_id"],
-            truck,
-            battery,
+            self._truck_map.get(r["truck_id"]),
+            self._battery_map.get(r["battery_id"]),
             r["temperature_c"],
             r["voltage_v"],
             r["current_a"],
             datetime.fromisoformat(r["timestamp"])
         )
 
-        records.append(record)
+        self._records[record.record_id] = record
+        return record
 
-    return records
+    def _rows_for(self, column, value):
+        if self._backend.indexed_telemetry:
+            return self._backend.read_telemetry(**{column: value}, **self._window)
+
+        if self._rows_by is None:
+            self._rows_by = {"truck_id": {}, "battery_id": {}}
+            for r in self._backend.read_telemetry(**self._window):
+                self._rows_by["truck_id"].setdefault(r["truck_id"], []).append(r)
+                self._rows_by["battery_id"].setdefault(r["battery_id"], []).append(r)
+
+        # Every list loads only once, so its rows can be dropped afterwards.
+        return self._rows_by[column].pop(value, [])
 
+    def loader(self, column, value):
+        """Return a loader for the records whose `column` equals value."""
+        return lambda: [self._build(r) for r in self._rows_for(column, value)]
 
-# ===== Saving functons - Convert Python Objects to JSON =====
+    def load_everything(self):
+        """Return every stored telemetry record."""
+        return [self._build(r) for r in self._backend.read_telemetry(**self._window)]
+
+    def remember(self, record):
+        """Share a record created in memory with lists loaded later."""
+        self._records[record.record_id] = record
+
+    def forget(self, record_id):
+        self._records.pop(record_id, None)
+
+
+# ===== Saving functons - Convert Python Objects to stored rows =====
+
+
+def save_entities(table, objects):
+    """
+    Insert or update only the given objects in a table.
+    table is one of "users", "trucks", "batteries", "telemetry".
+    """
+    get_backend().upsert(table, [TO_DICT[table](o) for o in objects])
+
+    if table == "telemetry" and _hydrator is not None:
+        for record in objects:
+            _hydrator.remember(record)
+
+
+def delete_entities(table, ids):
+    """Delete only the rows with the given ids from a table."""
+    ids = list(ids)
+    get_backend().delete(table, ids)
+
+    if table == "telemetry" and _hydrator is not None:
+        for record_id in ids:
+            _hydrator.forget(record_id)
 
 
 def save_users(users):
     """
-    Save all users into users.json.
+    Save all users, replacing whatever is stored.
     Stores SHA-256 hashed passwords.
     """
-    data = []
-    for u in users:
-        data.append({
-            "user_id": u.user_id,
-            "name": u.name,
-            "email": u.email,
-            "role": u.role,
-            "password_hash": u.password,     # already hashed
-            "trucks": [t.truck_id for t in u.trucks]
-        })
-    save_json("users.json", data)
-
+    get_backend().replace_all("users", [user_to_dict(u) for u in users])
 
 
 def save_trucks(trucks):
     """
-    Save all Truck objects into trucks.json.
-    Only store primitive fields + lists of IDs.
+    Save all Truck objects, replacing whatever is stored.
+    Only store primitive fields; batteries point at their truck instead.
     """
-    data = []
-    for t in trucks:
-        data.append({
-            "truck_id": t.truck_id,
-            "VIN": t.VIN,
-            "make": t.make,
-            "model": t.model,
-            "year": t.year,
-            "batteries": [b.battery_id for b in t.batteries],
-            "telemetry": [tr.record_id for tr in t.telemetry]
-        })
-    save_json("trucks.json", data)
+    get_backend().replace_all("trucks", [truck_to_dict(t) for t in trucks])
 
 
 def save_batteries(batteries):
     """
-    Save all Battery objects into batteries.json.
+    Save all Battery objects, replacing whatever is stored.
     """
-    data = []
-    for b in batteries:
-        data.append({
-            "battery_id": b.battery_id,
-            "truck_id": b.truck.truck_id if b.truck else None,
-            "capacity_ah": b.capacity_ah,
-            "voltage_v": b.voltage_v,
-            "status": b.status,
-            "telemetry": [t.record_id for t in b.telemetry]
-        })
-    save_json("batteries.json", data)
+    get_backend().replace_all("batteries", [battery_to_dict(b) for b in batteries])
 
 
 def save_telemetry(records):
     """
-    Save all telemetry records into telemetry.json.
+    Save all telemetry records, replacing whatever is stored.
+    Use save_entities("telemetry", [...]) to write single records.
     """
-    data = []
-    for r in records:
-        data.append({
-            "record_id": r.record_id,
-            "truck_id": r.truck.truck_id if r.truck else None,
-            "battery_id": r.battery.battery_id if r.battery else None,
-            "temperature_c": r.temperature_c,
-            "voltage_v": r.voltage_v,
-            "current_a": r.current_a,
-            "timestamp": r.timestamp.isoformat()
-        })
-    save_json("telemetry.json", data)
+    get_backend().replace_all("telemetry", [telemetry_to_dict(r) for r in records])
+
+
+# ===== Unit of work =====
+
+
+class Session:
+    """
+    Records which Users, Trucks, Batteries and TelemetryRecords were
+    created, modified or deleted, and persists only those on commit().
+    """
+
+    def __init__(self):
+        self._upserts = {}   # table -> {id: object}
+        self._deletes = {}   # table -> set of ids
+
+    def _key(self, obj):
+        table, id_attr = TABLE_OF[type(obj)]
+        return table, getattr(obj, id_attr)
+
+    def add(self, obj):
+        """Mark a new object to be inserted."""
+        table, obj_id = self._key(obj)
+        self._deletes.get(table, set()).discard(obj_id)
+        self._upserts.setdefault(table, {})[obj_id] = obj
+
+    def update(self, obj):
+        """Mark an existing object as modified."""
+        self.add(obj)
+
+    def delete(self, obj):
+        """Mark an object to be deleted."""
+        table, obj_id = self._key(obj)
+        self._upserts.get(table, {}).pop(obj_id, None)
+        self._deletes.setdefault(table, set()).add(obj_id)
+
+    def pending(self, table):
+        """Objects added or updated and ids deleted in a table since the last commit."""
+        return list(self._upserts.get(table, {}).values()), set(self._deletes.get(table, ()))
+
+    def pending_object(self, table, obj_id):
+        """The object added or updated under this id since the last commit, or None."""
+        return self._upserts.get(table, {}).get(obj_id)
+
+    def is_deleted(self, table, obj_id) -> bool:
+        """True if the object with this id was deleted since the last commit."""
+        return obj_id in self._deletes.get(table, ())
+
+    @property
+    def has_changes(self) -> bool:
+        return any(self._upserts.values()) or any(self._deletes.values())
+
+    def commit(self):
+        """Write all pending changes in one batch and clear them."""
+        if not self.has_changes:
+            return
+
+        upserts = {
+            table: [TO_DICT[table](o) for o in objs.values()]
+            for table, objs in self._upserts.items()
+        }
+        deletes = {table: list(ids) for table, ids in self._deletes.items()}
+        get_backend().apply(upserts, deletes)
+
+        if _hydrator is not None:
+            for record in self._upserts.get("telemetry", {}).values():
+                _hydrator.remember(record)
+            for record_id in self._deletes.get("telemetry", ()):
+                _hydrator.forget(record_id)
+
+        self.clear()
+
+    def clear(self):
+        """Forget all pending changes without writing them."""
+        self._upserts = {}
+        self._deletes = {}
 
 
 # ===== Master Loader =====
 
 
-def load_all():
+def load_all(lazy=True, start=None, end=None, users=True):
     """
     Load ALL data and rebuild full relationships:
     User -> Trucks -> Batteries -> TelemetryRecords
+
+    Each file is read exactly once. Relationships are resolved through id
+    maps built once per loader, using the foreign keys stored on the child
+    rows (battery.truck_id, telemetry.truck_id / battery_id), so loading is
+    linear in the number of rows.
+
+    With lazy=True (the default) no telemetry is read here: Truck.telemetry,
+    Battery.telemetry and the returned telemetry list load their records
+    the first time they are used.
+
+    start/end limit the telemetry to readings taken in [start, end).
+    With users=False the users are not read and an empty list is returned.
     """
+    global _hydrator
 
-    users = load_users()
     trucks = load_trucks()
+    users = load_users(trucks) if users else []
     batteries = load_batteries(trucks)
-    telemetry = load_telemetry(trucks, batteries)
 
-    # === FAST lookup dictionaries ===
-    truck_map = {t.truck_id: t for t in trucks}
-    battery_map = {b.battery_id: b for b in batteries}
-    telemetry_map = {r.record_id: r for r in telemetry}
-
-    # --- Reconnect Users -> Trucks ---
-    users_raw = load_json("users.json")
-    for u_data, user in zip(users_raw, users):
-        for truck_id in u_data["trucks"]:
-            truck_obj = truck_map.get(truck_id)
-            if truck_obj:
-                user.add_truck(truck_obj)
-
-    # --- Reconnect Trucks -> Batteries ---
-    trucks_raw = load_json("trucks.json")
-    for t_data, truck in zip(trucks_raw, trucks):
-        truck._batteries = []
-        for battery_id in t_data["batteries"]:
-            battery_obj = battery_map.get(battery_id)
-            if battery_obj:
-                truck.add_battery(battery_obj)
-
-    # --- Reconnect Trucks -> Telemetry ---
-    for t_data, truck in zip(trucks_raw, trucks):
-        truck._telemetry = []
-        for record_id in t_data["telemetry"]:
-            record_obj = telemetry_map.get(record_id)
-            if record_obj:
-                truck.add_telemetry(record_obj)
-
-    # --- Reconnect Batteries -> Telemetry ---
-    batteries_raw = load_json("batteries.json")
-    for b_data, battery in zip(batteries_raw, batteries):
-        battery._telemetry = []
-        for record_id in b_data["telemetry"]:
-            record_obj = telemetry_map.get(record_id)
-            if record_obj:
-                battery.add_telemetry(record_obj)
+    if not lazy:
+        telemetry = load_telemetry(trucks, batteries, start, end)
+        return users, trucks, batteries, telemetry
+
+    _hydrator = TelemetryHydrator(get_backend(), trucks, batteries, start, end)
+    for truck in trucks:
+        truck._telemetry = TelemetryList(loader=_hydrator.loader("truck_id", truck.truck_id))
+    for battery in batteries:
+        battery._telemetry = TelemetryList(loader=_hydrator.loader("battery_id", battery.battery_id))
+    telemetry = TelemetryList(loader=_hydrator.load_everything)
 
     return users, trucks, batteries, telemetry
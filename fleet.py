@@ -0,0 +1,268 @@
+"""
+Non-interactive command line for scripts and cron jobs.
+
+    python fleet.py trucks list
+    python fleet.py batteries list --truck 3
+    python fleet.py telemetry list --battery 7 --limit 20
+    python fleet.py telemetry series --battery 7 --start 2025-01-01 --resolution hour
+    python fleet.py telemetry add --record-id 42 --truck 3 --battery 7 \\
+        --temperature 31.5 --voltage 47.9 --current 12.0
+    python fleet.py analytics run --battery 7
+    python fleet.py analytics percentiles --truck 3
+
+Each command reads only the tables it needs, and modules are imported
+inside the command that uses them, so light commands start quickly
+(see benchmarks/bench_cli_startup.py). The interactive menu is main.py.
+"""
+import argparse
+import os
+import sys
+
+
+def iso_time(value):
+    from datetime import datetime
+    from models.telemetry import naive_utc
+    # Stored times are naive UTC (see models.telemetry.naive_utc)
+    return naive_utc(datetime.fromisoformat(value))
+
+
+# ===== Trucks and batteries =====
+
+
+def trucks_list(args):
+    import database_manager
+
+    for truck in database_manager.load_trucks():
+        print(truck)
+
+
+def batteries_list(args):
+    import database_manager
+
+    truck_ids = {args.truck} if args.truck is not None else None
+    trucks = database_manager.load_trucks(truck_ids)
+    if args.truck is not None and not trucks:
+        raise ValueError(f"Truck {args.truck} not found")
+
+    for battery in database_manager.load_batteries(trucks, truck_ids):
+        print(battery)
+
+
+# ===== Telemetry =====
+
+
+def telemetry_list(args):
+    import database_manager
+    from models.telemetry import TelemetryRecord
+
+    if (args.battery is None) == (args.truck is None):
+        raise ValueError("Give exactly one of --battery or --truck")
+
+    rows = database_manager.get_backend().read_telemetry(
+        truck_id=args.truck, battery_id=args.battery, start=args.start, end=args.end
+    )
+    rows.sort(key=lambda r: r["timestamp"])
+    if args.limit is not None:
+        rows = rows[-args.limit:]
+
+    # Only the readings are printed, so they are not linked to their owners
+    for record in TelemetryRecord.from_rows(rows, {}, {}):
+        print(record)
+
+
+def telemetry_series(args):
+    import database_manager
+    from models.telemetry import utc_now
+    from services.analytics_engine import AnalyticsEngine
+    from services.rollups import TIERS
+
+    if (args.battery is None) == (args.truck is None):
+        raise ValueError("Give exactly one of --battery or --truck")
+    kind, owner_id = ("battery", args.battery) if args.battery is not None else ("truck", args.truck)
+
+    # Answered from the stored rollups, not the raw readings
+    series = AnalyticsEngine().temperature_series(
+        database_manager.rollups(), kind, owner_id,
+        args.start, args.end or utc_now(), TIERS[args.resolution]
+    )
+    for step, avg_temp in series:
+        print(f"{step.isoformat()}  {avg_temp:.2f}°C")
+
+
+def telemetry_add(args):
+    import database_manager
+    from models.telemetry import TelemetryRecord
+    from services.anomaly_detector import describe
+
+    backend = database_manager.get_backend()
+    if not backend.read_rows_where("trucks", "truck_id", [args.truck]):
+        raise ValueError(f"Truck {args.truck} not found")
+    # Usually on the given truck, whose batteries the JSON backend reads
+    # without the rest of the table
+    on_truck = backend.read_rows_where("batteries", "truck_id", [args.truck])
+    if (all(b["battery_id"] != args.battery for b in on_truck)
+            and not backend.read_rows_where("batteries", "battery_id", [args.battery])):
+        raise ValueError(f"Battery {args.battery} not found")
+
+    # Not linked to its truck or battery: only the setters run, and
+    # nothing else is loaded
+    record = TelemetryRecord(args.record_id, None, None, args.temperature,
+                             args.voltage, args.current, args.timestamp)
+    row = {
+        "record_id": record.record_id,
+        "truck_id": args.truck,
+        "battery_id": args.battery,
+        "temperature_c": record.temperature_c,
+        "voltage_v": record.voltage_v,
+        "current_a": record.current_a,
+        "timestamp": record.timestamp.isoformat(),
+    }
+
+    # Scored against the saved detector state; without one, building it
+    # would scan all telemetry, so the reading is not scored
+    flagged = []
+    scored = database_manager.watch_anomalies(flagged.extend, build=False)
+    # Indexed duplicate checks, under the lock of the write
+    with backend.lock:
+        ids, readings = backend.stored_telemetry_keys([row])
+        if ids:
+            raise ValueError(f"A telemetry record with ID {record.record_id} already exists")
+        if readings:
+            raise ValueError(f"Battery {args.battery} already has a reading at {record.timestamp}")
+        backend.upsert("telemetry", [row])
+    print("Telemetry record added.")
+    if not scored:
+        print("Not scored for anomalies: no saved detector state yet (data/anomalies.json).")
+    for anomaly in flagged:
+        print(f"ALERT: {describe(anomaly)}")
+
+
+# ===== Analytics =====
+
+
+def analytics_run(args):
+    import database_manager
+    from services.parallel_analytics import ParallelAnalyticsRunner
+    from services.result_cache import AnalyticsCache, CACHE_FILE
+
+    if args.battery is not None:
+        battery = database_manager.load_battery(args.battery, args.start, args.end)
+        if battery is None:
+            raise ValueError(f"Battery {args.battery} not found")
+        batteries = [battery]
+    else:
+        _, trucks, batteries, _ = database_manager.load_all(users=False)
+
+    cache = AnalyticsCache(path=os.path.join(database_manager.DATA_DIR, CACHE_FILE))
+    cache.load(database_manager.data_stamp(ignore=(CACHE_FILE,)), batteries)
+
+    # Workers read the batteries' readings from the columnar store themselves
+    runner = ParallelAnalyticsRunner(workers=args.workers, cache=cache,
+                                     columns=database_manager.current_telemetry_columns)
+    for result in runner.run(batteries, args.start, args.end):
+        print(result)
+        print("--------------------------------")
+
+    cache.save(database_manager.data_stamp(ignore=(CACHE_FILE,)), batteries)
+
+
+def analytics_percentiles(args):
+    import database_manager
+    from services.analytics_engine import AnalyticsEngine
+
+    if args.battery is not None and args.truck is not None:
+        raise ValueError("Give at most one of --battery or --truck")
+
+    # Answered from the stored sketches, not the raw readings; only those
+    # of the batteries asked about are read
+    if args.battery is not None:
+        sketch = database_manager.sketches([args.battery]).battery(args.battery, args.field)
+    elif args.truck is not None:
+        batteries = database_manager.get_backend().read_rows_where("batteries", "truck_id", [args.truck])
+        battery_ids = [b["battery_id"] for b in batteries]
+        sketch = database_manager.sketches(battery_ids).merged(battery_ids, args.field)
+    else:
+        sketch = database_manager.sketches().fleet(args.field)
+
+    if not sketch.count:
+        print("No readings.")
+        return
+    for p, value in AnalyticsEngine().percentiles(sketch).items():
+        print(f"p{p}  {value:.2f}")
+
+
+# ===== Argument parsing =====
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="fleet", description="Fleet management commands.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    trucks = commands.add_parser("trucks", help="Trucks").add_subparsers(dest="action", required=True)
+    trucks.add_parser("list", help="List all trucks").set_defaults(func=trucks_list)
+
+    batteries = commands.add_parser("batteries", help="Batteries").add_subparsers(dest="action", required=True)
+    p = batteries.add_parser("list", help="List batteries")
+    p.add_argument("--truck", type=int, help="Only the batteries of this truck")
+    p.set_defaults(func=batteries_list)
+
+    telemetry = commands.add_parser("telemetry", help="Telemetry readings").add_subparsers(dest="action", required=True)
+    p = telemetry.add_parser("list", help="List the readings of a battery or truck, oldest first")
+    p.add_argument("--battery", type=int)
+    p.add_argument("--truck", type=int)
+    p.add_argument("--start", type=iso_time, help="ISO time, inclusive")
+    p.add_argument("--end", type=iso_time, help="ISO time, exclusive")
+    p.add_argument("--limit", type=int, help="Only the newest N readings")
+    p.set_defaults(func=telemetry_list)
+
+    p = telemetry.add_parser("series", help="Average temperature per minute, hour or day")
+    p.add_argument("--battery", type=int)
+    p.add_argument("--truck", type=int)
+    p.add_argument("--start", type=iso_time, required=True, help="ISO time, inclusive")
+    p.add_argument("--end", type=iso_time, help="ISO time, exclusive (default: now)")
+    p.add_argument("--resolution", choices=("minute", "hour", "day"), default="day")
+    p.set_defaults(func=telemetry_series)
+
+    p = telemetry.add_parser("add", help="Add one reading")
+    p.add_argument("--record-id", type=int, required=True)
+    p.add_argument("--truck", type=int, required=True)
+    p.add_argument("--battery", type=int, required=True)
+    p.add_argument("--temperature", type=float, required=True, help="Celsius")
+    p.add_argument("--voltage", type=float, required=True, help="Volts")
+    p.add_argument("--current", type=float, required=True, help="Amperes")
+    p.add_argument("--timestamp", type=iso_time, help="ISO time, UTC unless it has an offset (default: now)")
+    p.set_defaults(func=telemetry_add)
+
+    analytics = commands.add_parser("analytics", help="Battery analytics").add_subparsers(dest="action", required=True)
+    p = analytics.add_parser("run", help="Analyze every battery, or one")
+    p.add_argument("--battery", type=int)
+    p.add_argument("--start", type=iso_time, help="ISO time, inclusive")
+    p.add_argument("--end", type=iso_time, help="ISO time, exclusive")
+    p.add_argument("--workers", type=int, help="Worker processes (default: $FLEET_ANALYTICS_WORKERS or CPUs)")
+    p.set_defaults(func=analytics_run)
+
+    p = analytics.add_parser("percentiles", help="Approximate p50/p95/p99 of a battery, truck or the fleet")
+    p.add_argument("--battery", type=int)
+    p.add_argument("--truck", type=int)
+    p.add_argument("--field", choices=("temperature_c", "voltage_v"), default="temperature_c")
+    p.set_defaults(func=analytics_percentiles)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        args.func(args)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 1
+    except BrokenPipeError:
+        # Output piped into a command that stopped reading (e.g. head)
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,293 @@
+from datetime import timedelta
+
+from database_manager import get_backend, load_all, Session
+
+
+class FleetRepository:
+    """
+    Owns the users, trucks, batteries and telemetry of the fleet and keeps
+    id and email indexes over them, so lookups and uniqueness checks are
+    O(1) and cascading deletes only touch the affected rows.
+
+    Reverse indexes (truck -> batteries / telemetry, battery -> telemetry)
+    are the collections on the Truck and Battery objects themselves; the
+    repository keeps them in sync. Changes are recorded in a Session and
+    written by commit().
+
+    Listeners (see add_listener) are told about every telemetry record
+    added or removed, so derived data can be kept up to date.
+
+    Telemetry duplicates (same record_id, or same battery and timestamp)
+    are looked up in storage (SQLite's primary key and indexes, or the
+    JSON partitions' key files) and among the records added here, so
+    adding a record never loads or scans the telemetry.
+    """
+
+    def __init__(self, users, trucks, batteries, telemetry, session=None):
+        """
+        Args:
+            users (list): User objects.
+            trucks (list): Truck objects.
+            batteries (list): Battery objects.
+            telemetry (TelemetryList): All telemetry records (may be lazy).
+            session (Session | None): Unit of work that records changes.
+        """
+        self._users = {u.user_id: u for u in users}
+        self._users_by_email = {u.email: u for u in users}
+        self._trucks = {t.truck_id: t for t in trucks}
+        self._batteries = {b.battery_id: b for b in batteries}
+        self._telemetry = telemetry
+        self.session = session or Session()
+        self._listeners = []
+        # (battery_id, timestamp) -> record_id of the readings added here
+        self._added_readings = {}
+
+    @classmethod
+    def load(cls):
+        """Load the repository from the active storage backend."""
+        return cls(*load_all())
+
+    def commit(self):
+        """Persist everything changed since the last commit."""
+        self.session.commit()
+
+    def add_listener(self, listener):
+        """
+        Register an object with telemetry_added(record) and
+        telemetry_removed(record) methods, called after each change.
+        """
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        self._listeners.remove(listener)
+
+    # ===== Collections =====
+
+    @property
+    def users(self) -> list:
+        return list(self._users.values())
+
+    @property
+    def trucks(self) -> list:
+        return list(self._trucks.values())
+
+    @property
+    def batteries(self) -> list:
+        return list(self._batteries.values())
+
+    @property
+    def telemetry(self):
+        return self._telemetry
+
+    # ===== Lookups =====
+
+    def get_user(self, user_id):
+        return self._users.get(user_id)
+
+    def find_user_by_email(self, email):
+        return self._users_by_email.get(email.strip().lower())
+
+    def email_taken(self, email) -> bool:
+        return self.find_user_by_email(email) is not None
+
+    def get_truck(self, truck_id):
+        return self._trucks.get(truck_id)
+
+    def get_battery(self, battery_id):
+        return self._batteries.get(battery_id)
+
+    def get_telemetry(self, record_id):
+        """
+        Find a record through its owning battery (or truck), so only that
+        owner's readings are loaded, not the whole fleet's.
+        """
+        record = self.session.pending_object("telemetry", record_id)
+        if record is not None:
+            return record
+        if self.session.is_deleted("telemetry", record_id):
+            return None
+        if self._telemetry.loaded:
+            return self._telemetry.get(record_id)
+
+        rows = get_backend().read_rows_where("telemetry", "record_id", [record_id])
+        if not rows:
+            return None
+        owner = self._batteries.get(rows[0]["battery_id"]) or self._trucks.get(rows[0]["truck_id"])
+        if owner is None:
+            # A reading of no known battery or truck is only in the full list
+            return self._telemetry.get(record_id)
+        return owner.telemetry.get(record_id)
+
+    def batteries_of(self, truck_id) -> list:
+        truck = self._trucks.get(truck_id)
+        return truck.batteries if truck else []
+
+    def telemetry_of(self, battery_id):
+        battery = self._batteries.get(battery_id)
+        return battery.telemetry if battery else []
+
+    # ===== Time queries =====
+
+    def _time_index(self, battery_id, truck_id):
+        if (battery_id is None) == (truck_id is None):
+            raise ValueError("Give exactly one of battery_id or truck_id")
+        owner = self._batteries.get(battery_id) if battery_id is not None else self._trucks.get(truck_id)
+        return owner.time_index if owner is not None else None
+
+    def telemetry_between(self, start=None, end=None, battery_id=None, truck_id=None):
+        """Iterate a battery's or truck's readings taken in [start, end), oldest first."""
+        index = self._time_index(battery_id, truck_id)
+        return index.between(start, end) if index is not None else iter(())
+
+    def latest_telemetry(self, n, battery_id=None, truck_id=None):
+        """Iterate a battery's or truck's n newest readings, newest first."""
+        index = self._time_index(battery_id, truck_id)
+        return index.latest(n) if index is not None else iter(())
+
+    def telemetry_as_of(self, timestamp, battery_id=None, truck_id=None):
+        """A battery's or truck's newest reading taken at or before timestamp, or None."""
+        index = self._time_index(battery_id, truck_id)
+        return index.as_of(timestamp) if index is not None else None
+
+    # ===== Adding =====
+
+    def add_user(self, user):
+        if user.user_id in self._users:
+            raise ValueError(f"A user with ID {user.user_id} already exists")
+        if user.email in self._users_by_email:
+            raise ValueError("A user with this email already exists")
+
+        self._users[user.user_id] = user
+        self._users_by_email[user.email] = user
+        self.session.add(user)
+
+    def add_truck(self, truck):
+        if truck.truck_id in self._trucks:
+            raise ValueError(f"A truck with ID {truck.truck_id} already exists")
+
+        self._trucks[truck.truck_id] = truck
+        self.session.add(truck)
+
+    def add_battery(self, battery):
+        """Add a battery. It is linked to its truck by Battery itself."""
+        if battery.battery_id in self._batteries:
+            if battery.truck is not None:
+                battery.truck.remove_battery(battery)
+            raise ValueError(f"A battery with ID {battery.battery_id} already exists")
+
+        self._batteries[battery.battery_id] = battery
+        self.session.add(battery)
+
+    @staticmethod
+    def _battery_id(record):
+        return record.battery.battery_id if record.battery is not None else None
+
+    def _duplicate(self, record):
+        """
+        Why a record repeats a reading ("record_id" or "reading"), or None.
+        Stored readings deleted since the last commit do not count.
+        """
+        session = self.session
+        if session.pending_object("telemetry", record.record_id) is not None:
+            return "record_id"
+
+        # Index lookups: SQLite's keys, or the JSON partitions' key files
+        backend = get_backend()
+        battery_id = self._battery_id(record)
+        stored_ids, stored_readings = backend.stored_telemetry_keys([{
+            "record_id": record.record_id, "battery_id": battery_id,
+            "timestamp": record.timestamp.isoformat(),
+        }])
+        if stored_ids and not session.is_deleted("telemetry", record.record_id):
+            return "record_id"
+        if battery_id is None:
+            return None
+        if (battery_id, record.timestamp) in self._added_readings:
+            return "reading"
+        if not stored_readings:
+            return None
+
+        # The stored reading may be one deleted since the last commit
+        _, deleted = session.pending("telemetry")
+        if not deleted:
+            return "reading"
+        stored = backend.read_telemetry(battery_id=battery_id, start=record.timestamp,
+                                        end=record.timestamp + timedelta(microseconds=1))
+        return "reading" if any(r["record_id"] not in deleted for r in stored) else None
+
+    def add_telemetry(self, record):
+        """Add a telemetry record and link it to its truck and battery."""
+        duplicate = self._duplicate(record)
+        if duplicate == "record_id":
+            raise ValueError(f"A telemetry record with ID {record.record_id} already exists")
+        if duplicate == "reading":
+            raise ValueError(f"Battery {record.battery.battery_id} already has a reading at {record.timestamp}")
+        if record.battery is not None:
+            self._added_readings[(record.battery.battery_id, record.timestamp)] = record.record_id
+
+        if record.truck is not None:
+            record.truck.add_telemetry(record)
+        if record.battery is not None:
+            record.battery.add_telemetry(record)
+
+        self._telemetry.append(record)
+        self.session.add(record)
+
+        for listener in self._listeners:
+            listener.telemetry_added(record)
+
+    # ===== Deleting =====
+
+    def _remove_record(self, record):
+        if record.truck is not None:
+            record.truck.remove_telemetry(record)
+        if record.battery is not None:
+            record.battery.remove_telemetry(record)
+
+        self._telemetry.discard(record)
+        self.session.delete(record)
+        reading = (self._battery_id(record), record.timestamp)
+        if self._added_readings.get(reading) == record.record_id:
+            del self._added_readings[reading]
+
+        for listener in self._listeners:
+            listener.telemetry_removed(record)
+
+    def delete_telemetry(self, record_id):
+        """Delete one telemetry record. Returns it, or None if not found."""
+        record = self.get_telemetry(record_id)
+        if record is None:
+            return None
+
+        self._remove_record(record)
+        return record
+
+    def delete_battery(self, battery_id):
+        """Delete a battery and its telemetry. Returns it, or None."""
+        battery = self._batteries.pop(battery_id, None)
+        if battery is None:
+            return None
+
+        for record in list(battery.telemetry):
+            self._remove_record(record)
+
+        if battery.truck is not None:
+            battery.truck.remove_battery(battery)
+
+        self.session.delete(battery)
+        return battery
+
+    def delete_truck(self, truck_id):
+        """Delete a truck with its batteries and telemetry. Returns it, or None."""
+        truck = self._trucks.pop(truck_id, None)
+        if truck is None:
+            return None
+
+        for battery in list(truck.batteries):
+            self.delete_battery(battery.battery_id)
+
+        for record in list(truck.telemetry):
+            self._remove_record(record)
+
+        self.session.delete(truck)
+        return truck
@@ -1,18 +1,18 @@
-from database_manager import (
-    load_all,
-    save_users,
-    save_trucks,
-    save_batteries,
-    save_telemetry
-)
+import os
+
+import database_manager
+from fleet_repository import FleetRepository
 
 from models.user import User
 from models.truck import Truck
 from models.battery import Battery
-from models.telemetry import TelemetryRecord
+from models.telemetry import TelemetryRecord, utc_now
 from services.analytics_engine import AnalyticsEngine
+from services.anomaly_detector import describe
+from services.parallel_analytics import ParallelAnalyticsRunner
+from services.result_cache import AnalyticsCache, CACHE_FILE
 
-from datetime import datetime
+from datetime import timedelta
 
 def pause():
     input("\nPress ENTER to continue...")
@@ -22,11 +22,11 @@ def pause():
 # USER MANAGEMENT
 # ============================================================
 
-def login(users):
+def login(repo):
     print("\n--- Login ---")
     email = input("Enter your email: ").strip().lower()
 
-    user = next((u for u in users if u.email == email), None)
+    user = repo.find_user_by_email(email)
 
     if not user:
         print("User not found.")
@@ -42,15 +42,15 @@ def login(users):
     return user
 
 
-def add_user(users):
+def add_user(repo):
     print("\n--- Add New User ---")
     try:
         user_id = int(input("Enter User ID: "))
         name = input("Enter name: ")
         email = input("Enter email: ")
 
-        # ===== CHECK FOR EXISTING EMAIL IN JSON =====
-        if any(u.email == email for u in users):
+        # ===== CHECK FOR EXISTING EMAIL =====
+        if repo.email_taken(email):
             print("Error: A user with this email already exists")
             pause()
             return
@@ -59,9 +59,9 @@ def add_user(users):
         role = input("Enter role (manager/admin/etc): ")
 
         new_user = User(user_id, name, email, password, role)
-        users.append(new_user)
+        repo.add_user(new_user)
+        repo.commit()
 
-        save_users(users)
         print(f"User '{new_user.name}' added successfully.")
 
     except ValueError as e:
@@ -80,7 +80,7 @@ def confirm_admin(user):
 # TRUCK MANAGEMENT
 # ============================================================
 
-def add_truck(trucks):
+def add_truck(repo):
     print("\n--- Add New Truck ---")
 
     try:
@@ -91,9 +91,9 @@ def add_truck(trucks):
         year = int(input("Enter Manufacture Year: "))
 
         truck = Truck(truck_id, vin, make, model, year)
-        trucks.append(truck)
+        repo.add_truck(truck)
+        repo.commit()
 
-        save_trucks(trucks)
         print("Truck added successfully.")
 
     except ValueError as e:
@@ -101,7 +101,7 @@ def add_truck(trucks):
 
     pause()
 
-def delete_truck(current_user, trucks, batteries, telemetry):
+def delete_truck(repo, current_user):
     print("\n--- Delete Truck ---")
 
     # Admin permission check
@@ -110,26 +110,13 @@ def delete_truck(current_user, trucks, batteries, telemetry):
     
     truck_id = int(input("Enter Truck ID to delete: "))
 
-    truck = next((t for t in trucks if t.truck_id == truck_id), None)
-
-    if not truck:
+    # Removes the truck with its batteries and telemetry
+    if not repo.delete_truck(truck_id):
         print("Truck not found.")
         pause()
         return
-    
-    # Remove batteries that belong to this struck
-    batteries[:] = [b for b in batteries if b.truck.truck_id != truck_id]
-
-    # Remove telemetry data for this truck
-    telemetry[:] = [tr for tr in telemetry if tr.truck.truck_id != truck_id]
-    
-    # Remove the truck itself
-    trucks.remove(truck)
 
-    # Save updated data
-    save_trucks(trucks)
-    save_batteries(batteries)
-    save_telemetry(telemetry)
+    repo.commit()
 
     print(f"Truck {truck_id} and all related batteries/telemetry deleted.")
     pause()
@@ -139,14 +126,14 @@ def delete_truck(current_user, trucks, batteries, telemetry):
 # BATTERY MANAGEMENT
 # ============================================================
 
-def add_battery(batteries, trucks):
+def add_battery(repo):
     print("\n--- Add New Battery ---")
 
     try:
         battery_id = int(input("Enter Battery ID: "))
         truck_id = int(input("Enter Truck ID for this battery: "))
 
-        truck = next((t for t in trucks if t.truck_id == truck_id), None)
+        truck = repo.get_truck(truck_id)
         if not truck:
             print("Truck not found.")
             pause()
@@ -157,10 +144,8 @@ def add_battery(batteries, trucks):
         status = input("Enter Status: ")
 
         battery = Battery(battery_id, truck, capacity, voltage, status)
-        batteries.append(battery)
-
-        save_batteries(batteries)
-        save_trucks(trucks)
+        repo.add_battery(battery)
+        repo.commit()
 
         print("Battery added successfully.")
 
@@ -169,7 +154,7 @@ def add_battery(batteries, trucks):
 
     pause()
 
-def delete_battery(current_user, batteries, telemetry):
+def delete_battery(repo, current_user):
     print("\n--- Delete Battery ---")
 
     # Admin permission check
@@ -178,20 +163,13 @@ def delete_battery(current_user, batteries, telemetry):
 
     battery_id = int(input("Battery ID: "))
 
-    battery = next((b for b in batteries if b.battery_id == battery_id), None)
-
-    if not battery:
+    # Removes the battery with its telemetry
+    if not repo.delete_battery(battery_id):
         print("Battery not found.")
         pause()
         return
 
-    telemetry[:] = [tr for tr in telemetry if tr.battery.battery_id != battery_id]
-
-    # Remove battery
-    batteries.remove(battery)
-
-    save_batteries(batteries)
-    save_telemetry(telemetry)
+    repo.commit()
 
     print("Battery deleted.")
     pause()
@@ -200,7 +178,12 @@ def delete_battery(current_user, batteries, telemetry):
 # TELEMETRY MANAGEMENT
 # ============================================================
 
-def add_telemetry(trucks, batteries, telemetry):
+def report_anomalies(anomalies):
+    for anomaly in anomalies:
+        print(f"ALERT: {describe(anomaly)}")
+
+
+def add_telemetry(repo):
     print("\n--- Add Telemetry Record ---")
 
     try:
@@ -208,8 +191,8 @@ def add_telemetry(trucks, batteries, telemetry):
         truck_id = int(input("Truck ID: "))
         battery_id = int(input("Battery ID: "))
 
-        truck = next((t for t in trucks if t.truck_id == truck_id), None)
-        battery = next((b for b in batteries if b.battery_id == battery_id), None)
+        truck = repo.get_truck(truck_id)
+        battery = repo.get_battery(battery_id)
 
         if not truck:
             print("Truck not found.")
@@ -225,7 +208,7 @@ def add_telemetry(trucks, batteries, telemetry):
         voltage = float(input("Voltage (V): "))
         current = float(input("Current (A): "))
 
-        timestamp = datetime.now()
+        timestamp = utc_now()
 
         record = TelemetryRecord(
             record_id,
@@ -237,13 +220,10 @@ def add_telemetry(trucks, batteries, telemetry):
             timestamp
         )
 
-        telemetry.append(record)
-        truck.add_telemetry(record)
-        battery.add_telemetry(record)
-
-        save_telemetry(telemetry)
-        save_trucks(trucks)
-        save_batteries(batteries)
+        # Only the new record is written; truck and battery links are
+        # rebuilt from the record's own ids on load.
+        repo.add_telemetry(record)
+        repo.commit()
 
         print("Telemetry record added.")
 
@@ -252,7 +232,7 @@ def add_telemetry(trucks, batteries, telemetry):
 
     pause()
 
-def delete_telemetry(current_user, telemetry):
+def delete_telemetry(repo, current_user):
     print("\n--- Delete Telemetry Record ---")
 
     # Admin permission check
@@ -261,44 +241,68 @@ def delete_telemetry(current_user, telemetry):
 
     record_id = int(input("Enter Record ID: "))
 
-    record = next((r for r in telemetry if r.record_id == record_id), None)
-
-    if not record:
+    if not repo.delete_telemetry(record_id):
         print("Record not found.")
         pause()
         return
 
-    telemetry.remove(record)
-    save_telemetry(telemetry)
+    repo.commit()
 
     print("Telemetry record deleted.")
     pause()
 
+def daily_temperature():
+    print("\n--- Daily Temperature of a Battery ---")
+
+    try:
+        battery_id = int(input("Battery ID: "))
+        days = int(input("Number of days: "))
+    except ValueError as e:
+        print(f"Error: {e}")
+        pause()
+        return
+
+    # Answered from the rollups, which every write keeps up to date
+    end = utc_now()
+    series = AnalyticsEngine().temperature_series(
+        database_manager.rollups(), "battery", battery_id,
+        end - timedelta(days=days), end, timedelta(days=1)
+    )
+    if not series:
+        print("No readings in that period.")
+    for day, avg_temp in series:
+        print(f"{day.date()}: {avg_temp:.2f}°C")
+    pause()
+
 # ============================================================
 # ANALYTICS MANAGEMENT
 # ============================================================
 
-def run_analytics(batteries):
+def run_analytics(batteries, cache):
     print("\n=== Battery Analytics ===")
 
-    engine = AnalyticsEngine()
-
     if not batteries:
         print("No batteries in the system.")
         pause()
         return
-    
-    for b in batteries:
-        print(engine.analyze_battery(b))
+
+    # Worker count comes from $FLEET_ANALYTICS_WORKERS (default: all CPUs);
+    # workers read unloaded batteries from the columnar store themselves
+    runner = ParallelAnalyticsRunner(cache=cache, columns=database_manager.current_telemetry_columns)
+    for result in runner.run(batteries):
+        print(result)
         print("--------------------------------")
 
+    stats = cache.stats()
+    print(f"Cache: {stats['hits']} hits, {stats['misses']} misses")
+
     pause()
 
 # ============================================================
 # DISPLAY MENU FUNCTIONS
 # ============================================================
 
-def users_menu(users):
+def users_menu(repo):
     while True:
         print("\n--- User Menu ---")
         print("1. Add User")
@@ -307,13 +311,13 @@ def users_menu(users):
         sub = input("Choose: ")
 
         if sub == "1":
-            add_user(users)
+            add_user(repo)
         elif sub == "2":
-            print_list("Users", users)
+            print_list("Users", repo.users)
         else:
             return
         
-def trucks_menu(current_user, trucks, batteries, telemetry):
+def trucks_menu(repo, current_user):
     while True:
         print("\n--- Truck Menu ---")
         print("1. Add Truck")
@@ -323,15 +327,15 @@ def trucks_menu(current_user, trucks, batteries, telemetry):
         sub = input("Choose: ")
 
         if sub == "1":
-            add_truck(trucks)
+            add_truck(repo)
         elif sub == "2":
-            print_list("Trucks", trucks)
+            print_list("Trucks", repo.trucks)
         elif sub == "3":
-            delete_truck(current_user, trucks, batteries, telemetry)
+            delete_truck(repo, current_user)
         else:
             return
         
-def battery_menu(current_user, trucks, batteries, telemetry):
+def battery_menu(repo, current_user):
     while True:
         print("\n--- Battery Menu ---")
         print("1. Add Battery")
@@ -341,29 +345,32 @@ def battery_menu(current_user, trucks, batteries, telemetry):
         sub = input("Choose: ")
 
         if sub == "1":
-            add_battery(batteries, trucks)
+            add_battery(repo)
         elif sub == "2":
-            print_list("Batteries", batteries)
+            print_list("Batteries", repo.batteries)
         elif sub == "3":
-            delete_battery(current_user, batteries, telemetry)
+            delete_battery(repo, current_user)
         else:
             return
 
-def telemetry_menu(current_user, trucks, batteries, telemetry):
+def telemetry_menu(repo, current_user):
     while True:
         print("\n--- Telemetry Menu ---")
         print("1. Add Telemetry Record")
         print("2. View Telemetry")
         print("3. Delete Telemetry (Admin Only)")
-        print("4. Back")
+        print("4. Daily Temperature of a Battery")
+        print("5. Back")
         sub = input("Choose: ")
 
         if sub == "1":
-            add_telemetry(trucks, batteries, telemetry)
+            add_telemetry(repo)
         elif sub == "2":
-            print_list("Telemetries", telemetry)
+            print_list("Telemetries", repo.telemetry)
         elif sub == "3":
-            delete_telemetry(current_user, telemetry)
+            delete_telemetry(repo, current_user)
+        elif sub == "4":
+            daily_temperature()
         else:
             return
         
@@ -381,10 +388,20 @@ def print_list(title, items):
 # ============================================================
 
 def main():
-    # Load everything from JSON database
-    users, trucks, batteries, telemetry = load_all()
+    # Load everything from the database (telemetry loads on first use)
+    repo = FleetRepository.load()
+
+    # Rollups are loaded the first time a rollup view needs them; writes
+    # made before that are logged and replayed then (see storage.derived)
+
+    # Readings added from the menu are checked for anomalies as they are stored
+    database_manager.watch_anomalies(report_anomalies)
+
+    # Analytics results survive between sessions while the data is unchanged
+    cache = AnalyticsCache(path=os.path.join(database_manager.DATA_DIR, CACHE_FILE))
+    cache.load(database_manager.data_stamp(ignore=(CACHE_FILE,)), repo.batteries)
 
-    current_user = login(users)
+    current_user = login(repo)
 
     if not current_user:
         print("Exiting...")
@@ -404,21 +421,22 @@ def main():
         choice = input("Choose an option: ")
 
         if choice == "1":
-            users_menu(users)
+            users_menu(repo)
 
         elif choice == "2":
-            trucks_menu(current_user, trucks, batteries, telemetry)
+            trucks_menu(repo, current_user)
 
         elif choice == "3":
-            battery_menu(current_user, trucks, batteries, telemetry)
+            battery_menu(repo, current_user)
 
         elif choice == "4":
-            telemetry_menu(current_user, trucks, batteries, telemetry)
+            telemetry_menu(repo, current_user)
 
         elif choice == "5":
-            run_analytics(batteries)
+            run_analytics(repo.batteries, cache)
 
         elif choice == "6":
+            cache.save(database_manager.data_stamp(ignore=(CACHE_FILE,)), repo.batteries)
             print("Goodbye!")
             break
 
@@ -1,9 +1,19 @@
+from models.fade_window import FadeWindows
+from models.running_stats import RunningStats
+from models.telemetry_list import TelemetryList
+from models.time_index import TimeIndex
+
+
 class Battery:
     """
     Represents a battery installed in a truck within the fleet system.
     Handles capacity, voltage, operational status, and linkage to its truck.
     """
 
+    __slots__ = ("_battery_id", "_truck", "_capacity_ah", "_voltage_v",
+                 "_status", "_telemetry", "_stats", "_fade_windows",
+                 "_telemetry_version", "_time_index")
+
     def __init__(self, battery_id: int, truck, capacity_ah: float, voltage_v: float, status: str):
         """
         Constructor for the Battery class.
@@ -18,7 +28,11 @@ class Battery:
         self._battery_id = battery_id
 
         self._truck = None
-        self._telemetry = []
+        self._telemetry = TelemetryList()
+        self._stats = None
+        self._fade_windows = None
+        self._telemetry_version = 0
+        self._time_index = None
 
         self.truck = truck
         self.capacity_ah = capacity_ah
@@ -30,6 +44,37 @@ class Battery:
             truck.add_battery(self)
 
 
+    # ===== Trusted construction =====
+
+
+    @classmethod
+    def from_rows(cls, rows, truck_map):
+        """
+        Build batteries in bulk from stored rows, skipping the setter checks
+        (the rows were validated when written). Each battery is linked to
+        its truck, resolved through truck_map.
+        """
+        new = cls.__new__
+        get_truck = truck_map.get
+        batteries = []
+        for r in rows:
+            battery = new(cls)
+            battery._battery_id = r["battery_id"]
+            battery._truck = truck = get_truck(r["truck_id"])
+            battery._capacity_ah = float(r["capacity_ah"])
+            battery._voltage_v = float(r["voltage_v"])
+            battery._status = r["status"]
+            battery._telemetry = TelemetryList()
+            battery._stats = None
+            battery._fade_windows = None
+            battery._telemetry_version = 0
+            battery._time_index = None
+            if truck is not None:
+                truck.add_battery(battery)
+            batteries.append(battery)
+        return batteries
+
+
     # ===== Getter Methods =====
 
 
@@ -54,8 +99,44 @@ class Battery:
         return self._status
 
     @property
-    def telemetry(self):
+    def telemetry(self) -> TelemetryList:
         return self._telemetry
+
+    @property
+    def telemetry_version(self) -> int:
+        """Bumped whenever a reading is added or removed (cache key)."""
+        return self._telemetry_version
+
+    @property
+    def stats(self) -> RunningStats:
+        """
+        Running aggregates over this battery's telemetry. Built from the
+        records on first use, then kept up to date by add_telemetry and
+        remove_telemetry in O(1).
+        """
+        if self._stats is None:
+            self._stats = RunningStats(self._telemetry)
+        return self._stats
+
+    @property
+    def time_index(self) -> TimeIndex:
+        """
+        This battery's telemetry sorted by timestamp, for range, latest-N
+        and as-of queries. Built on first use, then kept up to date.
+        """
+        if self._time_index is None:
+            self._time_index = TimeIndex(self._telemetry)
+        return self._time_index
+
+    @property
+    def fade_windows(self) -> FadeWindows:
+        """
+        Voltage fade over the last 24h / 7d / 30d of readings. Built from
+        the records on first use, then updated by add/remove_telemetry.
+        """
+        if self._fade_windows is None:
+            self._fade_windows = FadeWindows(records=self._telemetry)
+        return self._fade_windows
     
 
     # ===== Setters =====
@@ -96,7 +177,38 @@ class Battery:
 
     def add_telemetry(self, record):
         """Add a TelemetryRecord associated with this battery."""
+        # Built stats or indexes mean a loaded list: a record with the same
+        # id is replaced, so its old reading is taken out of them first
+        built = (self._stats is not None or self._fade_windows is not None
+                 or self._time_index is not None)
+        previous = self._telemetry.get(record.record_id) if built else None
         self._telemetry.append(record)
+        self._telemetry_version += 1
+        if previous is record:
+            return
+        if self._stats is not None:
+            if previous is not None:
+                self._stats.remove(previous)
+            self._stats.add(record)
+        if self._fade_windows is not None:
+            if previous is not None:
+                self._fade_windows.remove(previous)
+            self._fade_windows.add(record)
+        if self._time_index is not None:
+            if previous is not None:
+                self._time_index.remove(previous)
+            self._time_index.add(record)
+
+    def remove_telemetry(self, record):
+        """Remove a TelemetryRecord from this battery."""
+        if self._stats is not None and record in self._telemetry:
+            self._stats.remove(record)
+        self._telemetry.discard(record)
+        self._telemetry_version += 1
+        if self._fade_windows is not None:
+            self._fade_windows.remove(record)
+        if self._time_index is not None:
+            self._time_index.remove(record)
     
     def is_operational(self) -> bool:
         """Return True if the battery is usable."""
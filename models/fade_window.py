@@ -0,0 +1,177 @@
+from collections import deque
+from datetime import timedelta
+
+from models.telemetry import is_valid_reading
+
+
+# Rolling windows tracked by default, by name
+DEFAULT_FADE_WINDOWS = {
+    "24h": timedelta(hours=24),
+    "7d": timedelta(days=7),
+    "30d": timedelta(days=30),
+}
+
+SECONDS_PER_DAY = 86400.0
+
+
+class SlidingFadeWindow:
+    """
+    Voltage trend over the readings of the last `span` of time, ending at
+    the newest reading. Fits voltage against timestamp (in days), so the
+    slope is volts per day.
+
+    Readings are kept in a deque ordered by time with running regression
+    sums; adding a reading evicts the ones that fell out of the window, so
+    re-evaluating after each reading is O(1) amortized.
+    """
+
+    __slots__ = ("span", "_readings", "_ids", "_origin", "count",
+                 "sum_x", "sum_y", "sum_xy", "sum_x2")
+
+    def __init__(self, span: timedelta):
+        """
+        Args:
+            span (timedelta): Length of the window.
+        """
+        if span <= timedelta(0):
+            raise ValueError("Window span must be positive.")
+        self.span = span
+        self._readings = deque()   # (timestamp, record_id, x, y), oldest first
+        self._ids = set()          # record_ids in the window
+        self._origin = None        # timestamp where x == 0
+
+        self.count = 0
+        self.sum_x = 0.0
+        self.sum_y = 0.0
+        self.sum_xy = 0.0
+        self.sum_x2 = 0.0
+
+    def _x(self, timestamp) -> float:
+        return (timestamp - self._origin).total_seconds() / SECONDS_PER_DAY
+
+    def _count(self, x, y, sign):
+        self.count += sign
+        self.sum_x += sign * x
+        self.sum_y += sign * y
+        self.sum_xy += sign * x * y
+        self.sum_x2 += sign * x * x
+
+    def _rebase(self):
+        """
+        Move x == 0 to the oldest reading, so the sums stay small and the
+        regression does not lose precision as time goes on.
+        """
+        timestamp = self._readings[0][0]
+        shift = self._x(timestamp)
+        n = self.count
+        self.sum_x2 += -2 * shift * self.sum_x + n * shift * shift
+        self.sum_xy -= shift * self.sum_y
+        self.sum_x -= n * shift
+        self._readings = deque((t, rid, x - shift, y) for t, rid, x, y in self._readings)
+        self._origin = timestamp
+
+    @property
+    def newest(self):
+        """Timestamp of the newest reading in the window, or None."""
+        return self._readings[-1][0] if self._readings else None
+
+    def add(self, record_id, timestamp, voltage) -> bool:
+        """
+        Add a reading. Readings older than the window, or already in it,
+        are ignored (returns False); late readings are inserted in time order.
+        """
+        if record_id in self._ids:
+            return False
+        if self._origin is None:
+            self._origin = timestamp
+
+        newest = self.newest
+        if newest is not None and timestamp <= newest - self.span:
+            return False
+
+        x = self._x(timestamp)
+        entry = (timestamp, record_id, x, voltage)
+        if newest is None or timestamp >= newest:
+            self._readings.append(entry)
+        else:
+            # Late readings are usually only a little late: scan from the end
+            i = len(self._readings)
+            while i > 0 and self._readings[i - 1][0] > timestamp:
+                i -= 1
+            self._readings.insert(i, entry)
+        self._ids.add(record_id)
+        self._count(x, voltage, 1)
+
+        cutoff = self.newest - self.span
+        while self._readings[0][0] <= cutoff:
+            _, old_id, old_x, old_y = self._readings.popleft()
+            self._ids.discard(old_id)
+            self._count(old_x, old_y, -1)
+
+        if self._readings[0][0] - self._origin > self.span:
+            self._rebase()
+        return True
+
+    def remove(self, record_id) -> bool:
+        """
+        Remove a reading from the window. O(window size). Readings that
+        were already evicted do not come back.
+        """
+        if record_id not in self._ids:
+            return False
+        self._ids.discard(record_id)
+        for i, (_, rid, x, y) in enumerate(self._readings):
+            if rid == record_id:
+                del self._readings[i]
+                self._count(x, y, -1)
+                return True
+        return False
+
+    def slope(self) -> float:
+        """Voltage change per day over the window (0 with < 2 readings)."""
+        n = self.count
+        if n < 2:
+            return 0.0
+        denominator = n * self.sum_x2 - self.sum_x ** 2
+        if denominator <= 0:
+            return 0.0
+        return (n * self.sum_xy - self.sum_x * self.sum_y) / denominator
+
+    def fade(self) -> float:
+        return abs(self.slope())
+
+
+class FadeWindows:
+    """A set of named SlidingFadeWindows fed the same readings."""
+
+    __slots__ = ("_windows",)
+
+    def __init__(self, windows=None, records=None):
+        """
+        Args:
+            windows (dict | None): name -> timedelta. Defaults to
+                DEFAULT_FADE_WINDOWS (24h, 7d, 30d).
+            records (iterable | None): Readings to start from.
+        """
+        windows = windows or DEFAULT_FADE_WINDOWS
+        self._windows = {name: SlidingFadeWindow(span) for name, span in windows.items()}
+        if records:
+            for record in sorted(records, key=lambda r: r.timestamp):
+                self.add(record)
+
+    def add(self, record):
+        if not is_valid_reading(record.temperature_c, record.voltage_v):
+            return
+        for window in self._windows.values():
+            window.add(record.record_id, record.timestamp, record.voltage_v)
+
+    def remove(self, record):
+        for window in self._windows.values():
+            window.remove(record.record_id)
+
+    def __getitem__(self, name) -> SlidingFadeWindow:
+        return self._windows[name]
+
+    def fades(self) -> dict:
+        """Return {window name: fade in volts per day}."""
+        return {name: w.fade() for name, w in self._windows.items()}
@@ -0,0 +1,127 @@
+from models.telemetry import MICROS_PER_DAY, is_valid_reading, to_micros
+
+
+class RunningStats:
+    """
+    Running aggregates over the telemetry of one battery or truck, updated
+    one reading at a time so analytics never rescan the readings:
+
+    - count and temperature mean/variance (Welford's algorithm)
+    - the voltage trend: means and co-moments (the same updates) of
+      voltage (y) against the reading time in days (x), so the regression
+      slope is in volts per day, as AnalyticsEngine.voltage_fade() fits it
+
+    Only clean readings are counted (see models.telemetry.is_valid_reading).
+    Readings are added and removed in O(1), in any order. The stats do not
+    remember which readings they counted, so callers add each reading once
+    and only remove readings they added.
+    """
+
+    __slots__ = ("count", "mean_temp", "_m2", "mean_x", "mean_y", "_cxy", "_m2x")
+
+    def __init__(self, records=None):
+        """
+        Args:
+            records (iterable | None): Readings to start from, in any order.
+        """
+        self.count = 0
+        self.mean_temp = 0.0
+        self._m2 = 0.0
+
+        self.mean_x = 0.0
+        self.mean_y = 0.0
+        self._cxy = 0.0     # Σ(x - mean_x)(y - mean_y)
+        self._m2x = 0.0     # Σ(x - mean_x)²
+
+        for record in records or ():
+            self.add(record)
+
+    @classmethod
+    def from_columns(cls, temperatures, voltages, timestamps_us):
+        """
+        Stats of plain, parallel sequences of temperatures, voltages and
+        timestamps (microseconds since the epoch, see models.telemetry).
+        """
+        stats = cls()
+        for t, v, ts in zip(temperatures, voltages, timestamps_us):
+            stats.add_values(t, v, ts)
+        return stats
+
+    def add(self, record) -> bool:
+        """Count a reading. Returns False if it was invalid."""
+        return self.add_values(record.temperature_c, record.voltage_v, to_micros(record.timestamp))
+
+    def remove(self, record) -> bool:
+        """
+        Take back a reading counted by add(), reversing its updates.
+        Returns False if it was invalid (and so never counted).
+        """
+        if not is_valid_reading(record.temperature_c, record.voltage_v):
+            return False
+        self._retract(record.temperature_c, record.voltage_v, to_micros(record.timestamp))
+        return True
+
+    def add_values(self, temperature_c, voltage_v, timestamp_us) -> bool:
+        """Count a reading given by its values. Returns False if it was invalid."""
+        if not is_valid_reading(temperature_c, voltage_v):
+            return False
+        self._accumulate(temperature_c, voltage_v, timestamp_us)
+        return True
+
+    def _accumulate(self, t, y, timestamp_us):
+        self.count += 1
+        n = self.count
+        delta = t - self.mean_temp
+        self.mean_temp += delta / n
+        self._m2 += delta * (t - self.mean_temp)
+
+        # Deviations from the running means, so times far from the epoch
+        # lose no precision
+        x = timestamp_us / MICROS_PER_DAY
+        dx = x - self.mean_x
+        self.mean_x += dx / n
+        self.mean_y += (y - self.mean_y) / n
+        self._cxy += dx * (y - self.mean_y)
+        self._m2x += dx * (x - self.mean_x)
+
+    def _retract(self, t, y, timestamp_us):
+        # _accumulate() run backwards: the means before the reading was
+        # added, then the co-moment terms it added
+        n = self.count
+        if n <= 1:
+            self.__init__()
+            return
+        self.count = n - 1
+        mean_temp = self.mean_temp + (self.mean_temp - t) / (n - 1)
+        self._m2 -= (t - mean_temp) * (t - self.mean_temp)
+        self.mean_temp = mean_temp
+
+        x = timestamp_us / MICROS_PER_DAY
+        mean_x = self.mean_x + (self.mean_x - x) / (n - 1)
+        mean_y = self.mean_y + (self.mean_y - y) / (n - 1)
+        self._cxy -= (x - mean_x) * (y - self.mean_y)
+        self._m2x -= (x - mean_x) * (x - self.mean_x)
+        self.mean_x, self.mean_y = mean_x, mean_y
+
+    @property
+    def variance_temp(self) -> float:
+        """Sample variance of the temperature (0 with fewer than 2 readings)."""
+        if self.count < 2:
+            return 0.0
+        return max(0.0, self._m2 / (self.count - 1))
+
+    def regression(self):
+        """
+        Slope (volts per day) and intercept of voltage over time in days
+        since the epoch, like run_regression(); (0, 0) if there is no
+        spread in time.
+        """
+        if self.count < 2 or self._m2x <= 0:
+            return 0, 0
+
+        slope = self._cxy / self._m2x
+        return slope, self.mean_y - slope * self.mean_x
+
+    def __repr__(self):
+        return (f"RunningStats(count={self.count}, mean_temp={self.mean_temp:.2f}, "
+                f"slope={self.regression()[0]:.4f})")
@@ -1,5 +1,41 @@
 # models/telemetry.py
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
+
+
+def is_valid_reading(temperature_c, voltage_v) -> bool:
+    """
+    Whether a temperature/voltage pair is physically possible. The one
+    rule every analysis uses to drop bad readings.
+    """
+    return -40 < temperature_c < 150 and voltage_v > 0
+
+
+def naive_utc(timestamp: datetime) -> datetime:
+    """
+    A timestamp in the stored form: offset-aware datetimes are converted
+    to naive UTC, naive ones are kept as they are. Stored timestamps are
+    compared as ISO strings, so they must not carry offsets.
+    """
+    if timestamp.tzinfo is None:
+        return timestamp
+    return timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def utc_now() -> datetime:
+    """The current time in the stored form (naive UTC), the default timestamp."""
+    return naive_utc(datetime.now(timezone.utc))
+
+
+# Stored timestamps as numbers: microseconds since the epoch, as in the
+# columnar store; the voltage trend is fitted against them in days
+EPOCH = datetime(1970, 1, 1)
+MICROS_PER_DAY = 86_400_000_000
+
+
+def to_micros(timestamp: datetime) -> int:
+    """Convert a stored (naive) timestamp to microseconds since the epoch."""
+    return (timestamp - EPOCH) // timedelta(microseconds=1)
+
 
 class TelemetryRecord:
     """
@@ -7,6 +43,11 @@ class TelemetryRecord:
     Includes temperature, voltage, current, and timestamp.
     """
 
+    # Fixed attribute layout: no per-instance __dict__, which matters when
+    # millions of readings are in memory.
+    __slots__ = ("_record_id", "_truck", "_battery", "_temperature_c",
+                 "_voltage_v", "_current_a", "_timestamp")
+
     def __init__(self, record_id: int, truck, battery,
                  temperature_c: float, voltage_v: float,
                  current_a: float, timestamp=None):
@@ -18,7 +59,8 @@ class TelemetryRecord:
             temperature_c (float): Temperature in Celsius.
             voltage_v (float): Voltage in volts.
             current_a (float): Current in amperes.
-            timestamp (datetime | None): Timestamp of measurement.
+            timestamp (datetime | None): Timestamp of measurement (default:
+                now). Stored as naive UTC, see naive_utc().
         """
         self._record_id = record_id
         self.truck = truck             
@@ -26,11 +68,57 @@ class TelemetryRecord:
         self.temperature_c = temperature_c
         self.voltage_v = voltage_v
         self.current_a = current_a
-        self.timestamp = timestamp or datetime.now()
+        self.timestamp = timestamp or utc_now()
+
+        # Not linked into the truck or battery here: FleetRepository.add_telemetry
+        # does that once the record is accepted.
+
 
-        # Link into truck + battery for easy referencing
-        if truck is not None:
-            truck.add_telemetry(self)
+    # ===== Trusted construction =====
+
+
+    @classmethod
+    def from_trusted(cls, record_id, truck, battery, temperature_c,
+                     voltage_v, current_a, timestamp):
+        """
+        Build a record from data that was already validated (e.g. read back
+        from our own storage). Skips the setter checks and conversions, and
+        does not link the record into its truck or battery.
+        """
+        record = cls.__new__(cls)
+        record._record_id = record_id
+        record._truck = truck
+        record._battery = battery
+        record._temperature_c = temperature_c
+        record._voltage_v = voltage_v
+        record._current_a = current_a
+        record._timestamp = timestamp
+        return record
+
+    @classmethod
+    def from_rows(cls, rows, truck_map, battery_map):
+        """
+        Build records in bulk from stored rows (dicts with record_id,
+        truck_id, battery_id, temperature_c, voltage_v, current_a and an ISO
+        timestamp). Trucks and batteries are resolved through the id maps.
+        """
+        new = cls.__new__
+        parse = datetime.fromisoformat
+        get_truck = truck_map.get
+        get_battery = battery_map.get
+
+        records = []
+        for r in rows:
+            record = new(cls)
+            record._record_id = r["record_id"]
+            record._truck = get_truck(r["truck_id"])
+            record._battery = get_battery(r["battery_id"])
+            record._temperature_c = r["temperature_c"]
+            record._voltage_v = r["voltage_v"]
+            record._current_a = r["current_a"]
+            record._timestamp = parse(r["timestamp"])
+            records.append(record)
+        return records
 
 
     # ===== Getter Methods =====
@@ -94,7 +182,9 @@ class TelemetryRecord:
 
     @timestamp.setter
     def timestamp(self, t):
-        self._timestamp = t
+        if not isinstance(t, datetime):
+            raise ValueError("Timestamp must be a datetime.")
+        self._timestamp = naive_utc(t)
 
     # ========= String Representation =========
 
@@ -0,0 +1,127 @@
+from collections.abc import MutableSequence
+
+
+class TelemetryList(MutableSequence):
+    """
+    List of TelemetryRecords belonging to a truck or battery.
+    If created with a loader, the records are fetched from storage the
+    first time the list is used, instead of when the data is loaded.
+
+    Records are kept in insertion order and indexed by record_id, so
+    appending, removing, membership tests and get() are O(1). append()
+    and discard() do not force a lazy list to load. Indexing goes through
+    a list of the records that is built on first use and kept until the
+    records change (appends extend it), so indexed loops are O(N).
+    """
+
+    def __init__(self, records=None, loader=None):
+        """
+        Args:
+            records (list | None): Records already in memory.
+            loader (callable | None): Returns the stored records when called.
+        """
+        self._records = {r.record_id: r for r in records} if records else {}
+        self._loader = loader
+        self._discarded = set()   # ids discarded before loading
+        self._values = None       # list of the records, see _list()
+
+    @property
+    def loaded(self) -> bool:
+        """True once the records are in memory."""
+        return self._loader is None
+
+    @property
+    def untouched(self) -> bool:
+        """True while not loaded and unchanged: the list is what its loader returns."""
+        return self._loader is not None and not self._records and not self._discarded
+
+    def _load(self):
+        if self._loader is not None:
+            loader, self._loader = self._loader, None
+            added = self._records
+            self._records = {
+                r.record_id: r for r in loader()
+                if r.record_id not in self._discarded
+            }
+            self._records.update(added)
+            self._discarded = set()
+            self._values = None
+
+    def _list(self) -> list:
+        """The records as a list, for indexing. Do not modify it."""
+        self._load()
+        if self._values is None:
+            self._values = list(self._records.values())
+        return self._values
+
+    def _replace(self, records):
+        self._records = {r.record_id: r for r in records}
+        self._values = None
+
+    # ===== Sequence methods =====
+
+    def __len__(self):
+        self._load()
+        return len(self._records)
+
+    def __getitem__(self, index):
+        return self._list()[index]
+
+    def __setitem__(self, index, record):
+        records = list(self._list())
+        records[index] = record
+        self._replace(records)
+
+    def __delitem__(self, index):
+        records = list(self._list())
+        del records[index]
+        self._replace(records)
+
+    def insert(self, index, record):
+        records = list(self._list())
+        records.insert(index, record)
+        self._replace(records)
+
+    def __iter__(self):
+        self._load()
+        return iter(self._records.values())
+
+    def __contains__(self, record):
+        self._load()
+        return self._records.get(record.record_id) is record
+
+    def append(self, record):
+        if self._loader is not None:
+            self._discarded.discard(record.record_id)
+        if self._values is not None:
+            if record.record_id in self._records:
+                # Replaced in place: its position is unchanged
+                self._values = None
+            else:
+                self._values.append(record)
+        self._records[record.record_id] = record
+
+    def discard(self, record):
+        """Remove a record if it is in the list."""
+        if self._loader is not None:
+            self._discarded.add(record.record_id)
+        if self._records.get(record.record_id) is record:
+            del self._records[record.record_id]
+            self._values = None
+
+    def remove(self, record):
+        self._load()
+        if self._records.get(record.record_id) is not record:
+            raise ValueError("Record is not in this list.")
+        del self._records[record.record_id]
+        self._values = None
+
+    def get(self, record_id):
+        """Return the record with this id, or None."""
+        self._load()
+        return self._records.get(record_id)
+
+    def __repr__(self):
+        if not self.loaded:
+            return "TelemetryList(<not loaded>)"
+        return f"TelemetryList({list(self._records.values())!r})"
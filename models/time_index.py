@@ -0,0 +1,72 @@
+from bisect import bisect_left, bisect_right
+
+
+class TimeIndex:
+    """
+    Telemetry records of one battery or truck kept sorted by timestamp
+    (ties broken by record_id), answering time queries with binary search.
+
+    Queries return lazy iterators over the index itself, not copies; do
+    not add or remove records while iterating one.
+    """
+
+    __slots__ = ("_keys", "_records")
+
+    def __init__(self, records=None):
+        """
+        Args:
+            records (iterable | None): Records to index, in any order.
+        """
+        records = sorted(records or (), key=lambda r: (r.timestamp, r.record_id))
+        self._keys = [(r.timestamp, r.record_id) for r in records]
+        self._records = records
+
+    def __len__(self):
+        return len(self._records)
+
+    def add(self, record) -> bool:
+        """Index a record. Returns False if it is already indexed."""
+        key = (record.timestamp, record.record_id)
+        if self._keys and key > self._keys[-1]:
+            # Readings usually arrive in time order
+            i = len(self._keys)
+        else:
+            i = bisect_left(self._keys, key)
+            if i < len(self._keys) and self._keys[i] == key:
+                return False
+        self._keys.insert(i, key)
+        self._records.insert(i, record)
+        return True
+
+    def remove(self, record) -> bool:
+        """Drop a record from the index. Returns False if it was not there."""
+        key = (record.timestamp, record.record_id)
+        i = bisect_left(self._keys, key)
+        if i == len(self._keys) or self._keys[i] != key:
+            return False
+        del self._keys[i]
+        del self._records[i]
+        return True
+
+    def _iter(self, lo, hi):
+        records = self._records
+        for i in range(lo, hi):
+            yield records[i]
+
+    def between(self, start=None, end=None):
+        """Iterate the records taken in [start, end), oldest first."""
+        lo = 0 if start is None else bisect_left(self._keys, (start,))
+        hi = len(self._keys) if end is None else bisect_left(self._keys, (end,))
+        return self._iter(lo, hi)
+
+    def latest(self, n: int):
+        """Iterate the n newest records, newest first."""
+        records = self._records
+        stop = max(len(records) - n, 0)
+        return (records[i] for i in range(len(records) - 1, stop - 1, -1))
+
+    def as_of(self, timestamp):
+        """The newest record taken at or before timestamp, or None."""
+        # Every key with this timestamp sorts before (timestamp, <anything larger>)
+        i = bisect_right(self._keys, (timestamp, float("inf")))
+        return self._records[i - 1] if i else None
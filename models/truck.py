@@ -1,3 +1,8 @@
+from models.running_stats import RunningStats
+from models.telemetry_list import TelemetryList
+from models.time_index import TimeIndex
+
+
 class Truck:
 
 	"""	
@@ -5,6 +10,9 @@ class Truck:
 	Each truck has identifying details and can be linked to batteries
 	"""
 
+	__slots__ = ("_truck_id", "_VIN", "_make", "_model", "_year",
+				 "_batteries", "_telemetry", "_stats", "_time_index")
+
 	def __init__(self, truck_id: int, VIN: str, make: str, model: str, year: int):
 		"""	
 		Constructor for truck data
@@ -23,7 +31,35 @@ class Truck:
 		self.year = year
 
 		self._batteries = []
-		self._telemetry = []
+		self._telemetry = TelemetryList()
+		self._stats = None
+		self._time_index = None
+
+
+	# ===== Trusted construction =====
+
+
+	@classmethod
+	def from_rows(cls, rows):
+		"""
+		Build trucks in bulk from stored rows, which were validated and
+		normalized when they were written, so the setter checks are skipped
+		"""
+		new = cls.__new__
+		trucks = []
+		for r in rows:
+			truck = new(cls)
+			truck._truck_id = r["truck_id"]
+			truck._VIN = r["VIN"]
+			truck._make = r["make"]
+			truck._model = r["model"]
+			truck._year = r["year"]
+			truck._batteries = []
+			truck._telemetry = TelemetryList()
+			truck._stats = None
+			truck._time_index = None
+			trucks.append(truck)
+		return trucks
 
 
 	# ===== Getter Methods =====
@@ -54,8 +90,28 @@ class Truck:
 		return self._batteries
 	
 	@property
-	def telemetry(self) -> list:
+	def telemetry(self) -> TelemetryList:
 		return self._telemetry
+
+	@property
+	def stats(self) -> RunningStats:
+		"""
+		Running aggregates over this truck's telemetry, built on first use
+		and then kept up to date by add_telemetry and remove_telemetry
+		"""
+		if self._stats is None:
+			self._stats = RunningStats(self._telemetry)
+		return self._stats
+
+	@property
+	def time_index(self) -> TimeIndex:
+		"""
+		This truck's telemetry sorted by timestamp, built on first use
+		and then kept up to date by add/remove_telemetry
+		"""
+		if self._time_index is None:
+			self._time_index = TimeIndex(self._telemetry)
+		return self._time_index
 	
 
 	# ===== Setter Methods =====
@@ -107,7 +163,35 @@ class Truck:
 		self._batteries.append(battery)
 
 	def add_telemetry(self, record):
+		# Built stats or index mean a loaded list: a record with the same
+		# id is replaced, so its old reading is taken out of them first
+		built = self._stats is not None or self._time_index is not None
+		previous = self._telemetry.get(record.record_id) if built else None
 		self._telemetry.append(record)
+		if previous is record:
+			return
+		if self._stats is not None:
+			if previous is not None:
+				self._stats.remove(previous)
+			self._stats.add(record)
+		if self._time_index is not None:
+			if previous is not None:
+				self._time_index.remove(previous)
+			self._time_index.add(record)
+
+	def remove_battery(self, battery):
+		"""
+		Unlink a Battery object from this truck
+		"""
+		if battery in self._batteries:
+			self._batteries.remove(battery)
+
+	def remove_telemetry(self, record):
+		if self._stats is not None and record in self._telemetry:
+			self._stats.remove(record)
+		self._telemetry.discard(record)
+		if self._time_index is not None:
+			self._time_index.remove(record)
 
 	def __str__(self) -> str:
 		"""Return string representation of the truck"""
@@ -1,15 +1,32 @@
+from models.running_stats import RunningStats
+from models.telemetry import MICROS_PER_DAY, is_valid_reading, to_micros
+
+
 class AnalyticsEngine:
     """
     Performs analysis on telemetry data including
     regression, average temperature, and battery life estimation.
     """
 
+    def is_valid_reading(self, temperature_c, voltage_v):
+        """Return True if a temperature/voltage pair is physically possible."""
+        return is_valid_reading(temperature_c, voltage_v)
+
     def clean_data(self, telemetry_list):
         """Remove telemetry records with invalid temperatures or voltages."""
         return [
             r for r in telemetry_list
-            if r.temperature_c > -40 and r.temperature_c < 150
-            and r.voltage_v > 0
+            if self.is_valid_reading(r.temperature_c, r.voltage_v)
+        ]
+
+    def select_window(self, telemetry_list, start=None, end=None):
+        """Keep only records taken in [start, end). None means unbounded."""
+        if start is None and end is None:
+            return list(telemetry_list)
+        return [
+            r for r in telemetry_list
+            if (start is None or r.timestamp >= start)
+            and (end is None or r.timestamp < end)
         ]
 
     def average_temperature(self, telemetry_list):
@@ -45,19 +62,60 @@ class AnalyticsEngine:
 
     def predict_capacity_fade(self, telemetry_list):
         """
-        Fake example: Predict capacity fade from voltage trend.
-        (Just enough for a class project.)
+        Fake example: Predict capacity fade from voltage trend, in volts
+        per day. (Just enough for a class project.)
         """
-        if len(telemetry_list) < 2:
+        return self.voltage_fade([r.voltage_v for r in telemetry_list],
+                                 [to_micros(r.timestamp) for r in telemetry_list])
+
+    def voltage_fade(self, voltages, timestamps_us):
+        """
+        Capacity fade in volts per day: the voltage trend against the
+        readings' timestamps (microseconds since the epoch, any order).
+        """
+        if len(voltages) < 2:
             return 0
 
-        timestamps = [i for i in range(len(telemetry_list))]
-        voltages = [r.voltage_v for r in telemetry_list]
+        first = timestamps_us[0]
+        days = [(ts - first) / MICROS_PER_DAY for ts in timestamps_us]
 
-        slope, _ = self.run_regression(timestamps, voltages)
+        slope, _ = self.run_regression(days, voltages)
 
         return abs(slope)
 
+    def timestamp_fade(self, telemetry_list):
+        """
+        Capacity fade of the clean readings, in volts per day. Full scan;
+        see fade_by_window() for the incremental version over recent time.
+        """
+        return self.predict_capacity_fade(self.clean_data(telemetry_list))
+
+    def fade_by_window(self, battery):
+        """
+        Fade (volts per day) over the last 24h / 7d / 30d of the battery's
+        readings, from its incrementally maintained sliding windows.
+        """
+        return battery.fade_windows.fades()
+
+    def temperature_series(self, rollups, kind, owner_id, start, end, resolution):
+        """
+        Average temperature of a battery or truck (kind "battery"/"truck")
+        per `resolution` step over [start, end), answered from the
+        pre-aggregated rollups instead of the raw readings.
+        Returns [(step start, average temperature)].
+        """
+        return [
+            (step, bucket.sums[0] / bucket.count)
+            for step, bucket in rollups.series(kind, owner_id, start, end, resolution)
+        ]
+
+    def percentiles(self, sketch, ps=(50, 95, 99)) -> dict:
+        """
+        Approximate percentiles from a quantile sketch (see
+        services.quantiles), e.g. {50: ..., 95: ..., 99: ...}.
+        """
+        return sketch.percentiles(ps)
+
     def predict_remaining_life(self, telemetry_list):
         """
         Example model:
@@ -70,26 +128,143 @@ class AnalyticsEngine:
 
         avg_temp = self.average_temperature(telemetry_list)
 
+        return self.remaining_life(avg_temp)
+
+    def remaining_life(self, avg_temp):
+        """Remaining "health points" for a given average temperature."""
         loss = max(0, avg_temp - 25)
 
         remaining = max(0, 100 - loss)
         return remaining
     
-    def analyze_battery(self, battery):
+    def analyze_battery(self, battery, start=None, end=None):
         """
-        Returns a formatted summary about a battery using telemetry data
+        Returns a formatted summary about a battery using telemetry data.
+        start/end restrict the analysis to readings taken in [start, end).
+        To avoid reading other partitions at all, load the data with
+        database_manager.load_all(start=..., end=...) instead.
+
+        Without a window the battery's running stats are used, so repeated
+        runs cost O(1) per battery instead of a pass over its readings.
         """
 
-        telemetry = battery.telemetry
-        telemetry = self.clean_data(telemetry)
+        if start is None and end is None:
+            avg_temp, fade, life = self.summarize_stats(battery.stats)
+            return self.format_analysis(battery.battery_id, avg_temp, fade, life)
+
+        telemetry = self.select_window(battery.telemetry, start, end)
+
+        avg_temp, fade, life = self.summarize_columns(
+            [r.temperature_c for r in telemetry],
+            [r.voltage_v for r in telemetry],
+            [to_micros(r.timestamp) for r in telemetry]
+        )
+
+        return self.format_analysis(battery.battery_id, avg_temp, fade, life)
+
+    def analyze_battery_row(self, battery, start=None, end=None) -> dict:
+        """
+        Same analysis as analyze_battery(), as a structured row:
+        battery_id, truck_id, readings (clean readings used),
+        avg_temperature_c, fade and remaining_life.
+        """
+        if start is None and end is None:
+            stats = battery.stats
+        else:
+            telemetry = self.select_window(battery.telemetry, start, end)
+            stats = RunningStats.from_columns([r.temperature_c for r in telemetry],
+                                              [r.voltage_v for r in telemetry],
+                                              [to_micros(r.timestamp) for r in telemetry])
+        return self.stats_row(battery, stats)
+
+    def stats_row(self, battery, stats) -> dict:
+        """
+        The row of analyze_battery_row() from RunningStats of the battery's
+        readings, e.g. accumulated while streaming the stored telemetry.
+        """
+        avg_temp, fade, life = self.summarize_stats(stats)
+        return {
+            "battery_id": battery.battery_id,
+            "truck_id": battery.truck.truck_id if battery.truck else None,
+            "readings": stats.count,
+            "avg_temperature_c": avg_temp,
+            "fade": fade,
+            "remaining_life": life,
+        }
+
+    def summarize_columns(self, temperatures, voltages, timestamps_us):
+        """
+        Clean one battery's readings and return (avg_temp, fade, life).
+        Works on plain, parallel sequences of temperatures, voltages and
+        timestamps (microseconds since the epoch), so no TelemetryRecord
+        objects are needed. The arithmetic is that of a battery's
+        RunningStats, so both give identical results.
+        """
+        return self.summarize_stats(RunningStats.from_columns(temperatures, voltages, timestamps_us))
+
+    def summarize_stats(self, stats):
+        """Return (avg_temp, fade, life) from a battery's RunningStats."""
+        if stats.count == 0:
+            return 0, 0, 100
+
+        slope, _ = stats.regression()
+        return stats.mean_temp, abs(slope), self.remaining_life(stats.mean_temp)
+
+    def summarize_fleet(self, battery_ids, temperatures, voltages, timestamps_us):
+        """
+        Summarize many batteries at once. The four columns are parallel
+        and grouped by battery (each battery's readings are consecutive),
+        like the rows of a ColumnarTelemetry store.
+        Returns {battery_id: (avg_temp, fade, life)}.
+        """
+        results = {}
+        start = 0
+        n = len(battery_ids)
+        while start < n:
+            end = start
+            while end < n and battery_ids[end] == battery_ids[start]:
+                end += 1
+            results[battery_ids[start]] = self.summarize_columns(
+                temperatures[start:end], voltages[start:end], timestamps_us[start:end]
+            )
+            start = end
+        return results
+
+    def analyze_columns(self, battery_id, temperatures, voltages, timestamps_us):
+        """
+        Same analysis as analyze_battery(), but over plain sequences of
+        temperatures, voltages and timestamps in microseconds (e.g. columns
+        of a ColumnarTelemetry store).
+        """
+        avg_temp, fade, life = self.summarize_columns(temperatures, voltages, timestamps_us)
+        return self.format_analysis(battery_id, avg_temp, fade, life)
+
+    def analyze_store(self, store):
+        """
+        Yield an analysis for every battery in a ColumnarTelemetry store,
+        scanning its memory-mapped columns directly in one batch.
+        """
+        results = self.summarize_fleet(
+            store.column("battery_id"),
+            store.column("temperature_c"),
+            store.column("voltage_v"),
+            store.column("timestamp_us")
+        )
+        for battery_id in store.battery_ids():
+            yield self.format_analysis(battery_id, *results[battery_id])
 
-        avg_temp = self.average_temperature(telemetry)
-        fade = self.predict_capacity_fade(telemetry)
-        life = self.predict_remaining_life(telemetry)
+    def format_fade_windows(self, battery_id, fades):
+        """Format the output of fade_by_window()."""
+        lines = [f"Battery {battery_id} Fade by Window (V/day):"]
+        for name, fade in fades.items():
+            lines.append(f" - Last {name}: {fade:.4f}")
+        return "\n".join(lines) + "\n"
 
+    def format_analysis(self, battery_id, avg_temp, fade, life):
+        """Format the analysis results of one battery."""
         return (
-            f"Battery {battery.battery_id} Analysis:\n"
+            f"Battery {battery_id} Analysis:\n"
             f" - Avg Temperature: {avg_temp:.2f}°C\n"
-            f" - Voltage Trend (fade): {fade:.4f}\n"
+            f" - Voltage Trend (fade): {fade:.4f} V/day\n"
             f" - Estimated Remaining Life: {life:.1f}/100\n"
         )
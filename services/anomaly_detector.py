@@ -0,0 +1,216 @@
+"""
+Streaming anomaly detection on telemetry.
+
+Each battery keeps an exponentially weighted moving average (EWMA) and
+variance of its temperature, voltage and current: a fixed handful of
+floats, however many readings it has. Every new reading is scored
+against them before they are updated, and flagged when it is more than
+`threshold` standard deviations out:
+
+- temperature_spike  temperature far above its average
+- voltage_sag        voltage far below its average
+- current_outlier    current far from its average, either way
+
+Physically impossible readings (see models.telemetry.is_valid_reading) are
+skipped and do not move the averages.
+
+The detector is kept by the storage layer like the rollups (see
+database_manager.DERIVED): every telemetry write scores the new readings
+and its state is saved in data/anomalies.json, so a new process starts
+warm. database_manager.watch_anomalies() reports what each write flags.
+"""
+import math
+from collections import deque, namedtuple
+from datetime import datetime
+
+from models.telemetry import is_valid_reading
+from storage.columnar import NO_ID, from_micros
+
+
+Anomaly = namedtuple("Anomaly", "record_id battery_id timestamp kind value zscore")
+
+# Detector state file inside the data directory
+ANOMALY_FILE = "anomalies.json"
+
+# field index -> (anomaly kind, direction): +1 above, -1 below, 0 either way
+RULES = (
+    ("temperature_spike", 1),
+    ("voltage_sag", -1),
+    ("current_outlier", 0),
+)
+
+
+class _BatteryState:
+    """EWMA mean and variance of temperature, voltage and current."""
+
+    __slots__ = ("count", "means", "variances")
+
+    def __init__(self):
+        self.count = 0
+        self.means = [0.0, 0.0, 0.0]
+        self.variances = [0.0, 0.0, 0.0]
+
+
+class AnomalyDetector:
+    """
+    Flags per-battery temperature spikes, voltage sags and current
+    outliers as readings arrive. Memory is fixed per battery.
+
+    Stored readings are scored through rows_added() as they are written
+    (see storage.derived); backfill()/backfill_store() score history.
+    """
+
+    def __init__(self, alpha: float = 0.05, threshold: float = 4.0,
+                 warmup: int = 30, keep: int = 1000):
+        """
+        Args:
+            alpha (float): EWMA weight of the newest reading (0 < alpha <= 1).
+            threshold (float): z-score above which a reading is flagged.
+            warmup (int): Readings a battery needs before it can be flagged.
+            keep (int): Recent anomalies kept in `recent` by rows_added().
+        """
+        if not 0 < alpha <= 1:
+            raise ValueError("alpha must be between 0 and 1.")
+        if threshold <= 0:
+            raise ValueError("threshold must be positive.")
+
+        self.alpha = alpha
+        self.threshold = threshold
+        self.warmup = warmup
+        self._states = {}   # battery_id -> _BatteryState
+
+        self.recent = deque(maxlen=keep)
+        self.counts = {kind: 0 for kind, _ in RULES}
+
+    def observe_values(self, battery_id, record_id, timestamp,
+                       temperature_c, voltage_v, current_a) -> list:
+        """Score one reading, update the battery's state, return its anomalies."""
+        if not is_valid_reading(temperature_c, voltage_v):
+            return []
+
+        state = self._states.get(battery_id)
+        if state is None:
+            state = self._states[battery_id] = _BatteryState()
+
+        values = (temperature_c, voltage_v, current_a)
+        anomalies = []
+        alpha = self.alpha
+        check = state.count >= self.warmup
+
+        for i, value in enumerate(values):
+            mean = state.means[i]
+            variance = state.variances[i]
+
+            if state.count == 0:
+                state.means[i] = value
+                continue
+
+            diff = value - mean
+            if check and variance > 0:
+                z = diff / math.sqrt(variance)
+                kind, direction = RULES[i]
+                if (direction > 0 and z > self.threshold
+                        or direction < 0 and z < -self.threshold
+                        or direction == 0 and abs(z) > self.threshold):
+                    anomalies.append(Anomaly(record_id, battery_id, timestamp, kind, value, z))
+
+            # EWMA update (West's incremental form)
+            state.means[i] = mean + alpha * diff
+            state.variances[i] = (1 - alpha) * (variance + alpha * diff * diff)
+
+        state.count += 1
+        return anomalies
+
+    def observe(self, record) -> list:
+        """Score a TelemetryRecord. Readings without a battery are skipped."""
+        if record.battery is None:
+            return []
+        return self.observe_values(record.battery.battery_id, record.record_id,
+                                   record.timestamp, record.temperature_c,
+                                   record.voltage_v, record.current_a)
+
+    # ===== Storage data (storage.derived) =====
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Score stored telemetry rows in one pass, without keeping the anomalies."""
+        detector = cls()
+        detector.rows_added(rows)
+        detector.recent.clear()
+        detector.counts = {kind: 0 for kind, _ in RULES}
+        return detector
+
+    def rows_added(self, rows) -> list:
+        """Score stored telemetry rows. Returns the anomalies, also kept in recent."""
+        flagged = []
+        for r in rows:
+            if r["battery_id"] is None:
+                continue
+            for anomaly in self.observe_values(r["battery_id"], r["record_id"], r["timestamp"],
+                                               r["temperature_c"], r["voltage_v"], r["current_a"]):
+                anomaly = anomaly._replace(timestamp=datetime.fromisoformat(anomaly.timestamp))
+                self.recent.append(anomaly)
+                self.counts[anomaly.kind] += 1
+                flagged.append(anomaly)
+        return flagged
+
+    def rows_removed(self, rows):
+        """Moving averages cannot forget a reading; nothing to do."""
+
+    def to_dict(self) -> dict:
+        return {
+            "alpha": self.alpha, "threshold": self.threshold, "warmup": self.warmup,
+            "states": [[battery_id, state.count, state.means, state.variances]
+                       for battery_id, state in self._states.items()],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        detector = cls(data["alpha"], data["threshold"], data["warmup"])
+        for battery_id, count, means, variances in data["states"]:
+            state = detector._states[battery_id] = _BatteryState()
+            state.count = count
+            state.means = means
+            state.variances = variances
+        return detector
+
+    # ===== Backfill =====
+
+    def backfill(self, records):
+        """
+        Score historical readings in one sequential pass, yielding the
+        anomalies. Each battery's readings should come oldest first.
+        """
+        for record in records:
+            yield from self.observe(record)
+
+    def backfill_store(self, store):
+        """
+        Score every reading of a ColumnarTelemetry store in one pass over
+        its columns (sorted by battery, then time) without building records.
+        """
+        c = store.column
+        return self.backfill_columns(c("battery_id"), c("record_id"), c("timestamp_us"),
+                                     c("temperature_c"), c("voltage_v"), c("current_a"))
+
+    def backfill_columns(self, battery_ids, record_ids, timestamps_us,
+                         temperatures, voltages, currents):
+        """
+        Same as backfill_store() over parallel columns; timestamps are
+        microseconds since the epoch.
+        """
+        columns = zip(battery_ids, record_ids, timestamps_us,
+                      temperatures, voltages, currents)
+        for battery_id, record_id, ts, temp, volt, amp in columns:
+            if battery_id == NO_ID:
+                continue
+            for anomaly in self.observe_values(battery_id, record_id, ts, temp, volt, amp):
+                # Timestamps are only converted for the few flagged readings
+                yield anomaly._replace(timestamp=from_micros(ts))
+
+
+def describe(anomaly) -> str:
+    """One line describing an anomaly, for alerts."""
+    return (f"{anomaly.kind} on battery {anomaly.battery_id} "
+            f"(record {anomaly.record_id}, {anomaly.timestamp}): "
+            f"{anomaly.value:g}, z = {anomaly.zscore:+.1f}")
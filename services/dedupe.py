@@ -0,0 +1,140 @@
+"""
+Duplicate detection for telemetry.
+
+A reading is a duplicate if its record_id is already stored, or if its
+battery already has a reading with the same timestamp (a device upload
+that was retried under new record ids). Imports check new readings
+against storage under the write lock (StorageBackend.new_telemetry), and
+FleetRepository looks them up in storage too, so duplicates only reach
+the data through writers that skip those checks, or from before them.
+
+This module removes those with a one-shot pass over the stored data:
+
+    python -m services.dedupe            # report only
+    python -m services.dedupe --apply    # delete duplicates, fix id lists
+
+It streams the telemetry twice and keeps 8 bytes per reading in memory
+(a sorted array of timestamps per battery), not the readings themselves.
+"""
+import argparse
+from array import array
+from datetime import datetime, timedelta
+
+import database_manager
+from models.telemetry import naive_utc
+
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def timestamp_key(timestamp) -> int:
+    """
+    Microseconds since 1970 of a datetime or ISO string, as an int.
+    Offset-aware timestamps count as their UTC time (see naive_utc).
+    """
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp)
+    return (naive_utc(timestamp) - EPOCH) // timedelta(microseconds=1)
+
+
+# ===== One-shot deduplication of stored data =====
+
+
+def _unique(ids) -> list:
+    return list(dict.fromkeys(ids))
+
+
+def _repeated_readings(backend) -> set:
+    """
+    (battery_id, timestamp key) of every reading stored more than once,
+    from one pass over the telemetry that keeps one int64 per reading.
+    """
+    stamps = {}
+    for row in backend.iter_telemetry():
+        if row["battery_id"] is not None:
+            stamps.setdefault(row["battery_id"], array("q")).append(timestamp_key(row["timestamp"]))
+
+    repeated = set()
+    while stamps:
+        battery_id, keys = stamps.popitem()
+        previous = None
+        for key in sorted(keys):
+            if key == previous:
+                repeated.add((battery_id, key))
+            previous = key
+    return repeated
+
+
+def find_duplicates(backend) -> dict:
+    """
+    Scan stored data for duplicates. Returns:
+        telemetry: record_ids of readings repeating an earlier reading of
+            the same battery at the same timestamp (the lowest id is kept)
+        timestamps: kept readings stored with a UTC offset, rewritten to
+            naive UTC like every new reading
+        users, trucks: rows whose id lists (trucks, batteries, telemetry)
+            repeat an id, with the lists fixed
+
+    The telemetry is streamed twice: once to find the repeated readings,
+    once to collect their record_ids and the offset timestamps.
+    """
+    repeated = _repeated_readings(backend)
+    groups = {}
+    offsets = []
+    for row in backend.iter_telemetry():
+        timestamp = datetime.fromisoformat(row["timestamp"])
+        if row["battery_id"] is not None:
+            key = (row["battery_id"], timestamp_key(timestamp))
+            if key in repeated:
+                groups.setdefault(key, []).append(row["record_id"])
+        if timestamp.tzinfo is not None:
+            offsets.append(dict(row, timestamp=naive_utc(timestamp).isoformat()))
+
+    duplicate_ids = sorted(i for ids in groups.values() for i in sorted(ids)[1:])
+    dropped = set(duplicate_ids)
+    offsets = sorted((r for r in offsets if r["record_id"] not in dropped), key=lambda r: r["record_id"])
+
+    fixed = {}
+    for table, fields in (("users", ("trucks",)), ("trucks", ("batteries", "telemetry"))):
+        rows = []
+        for row in backend.read_rows(table):
+            lists = {f: row[f] for f in fields if isinstance(row.get(f), list)}
+            if any(len(_unique(ids)) != len(ids) for ids in lists.values()):
+                rows.append(dict(row, **{f: _unique(ids) for f, ids in lists.items()}))
+        fixed[table] = rows
+
+    return {"telemetry": duplicate_ids, "timestamps": offsets, **fixed}
+
+
+def dedupe(backend) -> dict:
+    """Delete duplicate readings, fix offsets and repeated ids in one write."""
+    found = find_duplicates(backend)
+    upserts = {table: found[table] for table in ("users", "trucks") if found[table]}
+    if found["timestamps"]:
+        upserts["telemetry"] = found["timestamps"]
+    backend.apply(
+        upserts,
+        {"telemetry": found["telemetry"]} if found["telemetry"] else {},
+    )
+    backend.compact()
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find and remove duplicate telemetry.")
+    parser.add_argument("--apply", action="store_true",
+                        help="Delete the duplicates (default: only report them)")
+    args = parser.parse_args()
+
+    backend = database_manager.get_backend()
+    found = dedupe(backend) if args.apply else find_duplicates(backend)
+    verb = "Removed" if args.apply else "Found"
+    print(f"{verb} {len(found['telemetry'])} duplicate readings")
+    fixed = "Rewrote" if args.apply else "Found"
+    print(f"{fixed} {len(found['timestamps'])} timestamps with a UTC offset")
+    for table in ("users", "trucks"):
+        print(f"{verb} repeated ids in {len(found[table])} {table}")
+
+
+if __name__ == "__main__":
+    main()
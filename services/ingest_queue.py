@@ -0,0 +1,213 @@
+"""
+Bounded ingest queue (asyncio).
+
+Sits between the connections receiving readings and the storage writer.
+Its capacity is counted in readings; when a new entry does not fit, the
+overflow policy decides what happens:
+
+    block        the producer waits until the writer frees enough room
+    drop-oldest  the oldest queued entries are dropped to make room
+    reject       the new entry is refused
+
+QueueMetrics tracks depth, enqueue/dequeue rates and time spent in the
+queue, to size writers under real load.
+"""
+import asyncio
+import time
+from collections import deque
+
+
+BLOCK = "block"
+DROP_OLDEST = "drop-oldest"
+REJECT = "reject"
+POLICIES = (BLOCK, DROP_OLDEST, REJECT)
+
+
+class RateMeter:
+    """Events per second over a sliding window."""
+
+    def __init__(self, window: float = 10.0):
+        self.window = window
+        self._events = deque()   # (time, count)
+        self._total = 0
+        self._started = time.monotonic()
+
+    def add(self, count, now=None):
+        now = time.monotonic() if now is None else now
+        self._events.append((now, count))
+        self._total += count
+        self._trim(now)
+
+    def _trim(self, now):
+        while self._events and self._events[0][0] < now - self.window:
+            self._total -= self._events.popleft()[1]
+
+    def rate(self, now=None) -> float:
+        now = time.monotonic() if now is None else now
+        self._trim(now)
+        # Before a full window has passed, divide by the time actually covered
+        span = min(self.window, now - self._started)
+        return self._total / span if span > 0 else 0.0
+
+
+class QueueMetrics:
+    """Counters, rates and time-in-queue of an IngestQueue."""
+
+    def __init__(self, window: float = 10.0, samples: int = 1024):
+        """
+        Args:
+            window (float): Seconds covered by the enqueue/dequeue rates.
+            samples (int): Recent time-in-queue samples kept for avg/p99.
+        """
+        self.enqueued = 0
+        self.dequeued = 0
+        self.dropped = 0
+        self.rejected = 0
+        self.high_water = 0
+        self.enqueue_rate = RateMeter(window)
+        self.dequeue_rate = RateMeter(window)
+        self.waits = deque(maxlen=samples)   # seconds, one per dequeued entry
+
+    def snapshot(self, queue) -> dict:
+        waits = sorted(self.waits)
+        if waits:
+            wait_avg = sum(waits) / len(waits)
+            wait_p99 = waits[min(len(waits) - 1, int(len(waits) * 0.99))]
+        else:
+            wait_avg = wait_p99 = 0.0
+        return {
+            "depth": queue.depth,
+            "capacity": queue.capacity,
+            "policy": queue.policy,
+            "high_water": self.high_water,
+            "enqueued": self.enqueued,
+            "dequeued": self.dequeued,
+            "dropped": self.dropped,
+            "rejected": self.rejected,
+            "enqueue_per_s": round(self.enqueue_rate.rate(), 1),
+            "dequeue_per_s": round(self.dequeue_rate.rate(), 1),
+            "wait_avg_ms": round(wait_avg * 1000, 2),
+            "wait_p99_ms": round(wait_p99 * 1000, 2),
+        }
+
+    def __str__(self):
+        return (f"enqueued {self.enqueued}, dequeued {self.dequeued}, "
+                f"dropped {self.dropped}, rejected {self.rejected}")
+
+
+class IngestQueue:
+    """
+    Bounded FIFO of entries, each holding `size` readings. Used from one
+    event loop: producers put(), the writer takes batches with get_batch().
+    """
+
+    def __init__(self, capacity: int = 50000, policy: str = BLOCK, on_drop=None):
+        """
+        Args:
+            capacity (int): Most readings queued at once.
+            policy (str): What to do when full: "block", "drop-oldest" or "reject".
+            on_drop (callable | None): Called with each entry dropped to make room.
+        """
+        if capacity < 1:
+            raise ValueError("Queue capacity must be at least 1")
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown overflow policy '{policy}'. Must be one of: {', '.join(POLICIES)}")
+
+        self.capacity = capacity
+        self.policy = policy
+        self.on_drop = on_drop
+        self.metrics = QueueMetrics()
+        self.depth = 0
+
+        self._entries = deque()   # (item, size, enqueued at)
+        self._not_empty = asyncio.Event()
+        self._space = asyncio.Event()
+        self._filled = asyncio.Event()
+        self._wanted = None       # depth get_batch() is waiting for
+
+    async def put(self, item, size: int = 1) -> bool:
+        """
+        Queue an entry of `size` readings. Returns False if it was refused
+        (reject policy); with the block policy waits for room instead.
+        """
+        if size > self.capacity:
+            raise ValueError(f"Entry of {size} readings exceeds the queue capacity ({self.capacity})")
+
+        if self.depth + size > self.capacity:
+            if self.policy == REJECT:
+                self.metrics.rejected += size
+                return False
+            if self.policy == DROP_OLDEST:
+                while self.depth + size > self.capacity:
+                    self._drop_oldest()
+            else:
+                while self.depth + size > self.capacity:
+                    self._space.clear()
+                    await self._space.wait()
+
+        self._entries.append((item, size, time.monotonic()))
+        self.depth += size
+        self.metrics.enqueued += size
+        self.metrics.enqueue_rate.add(size)
+        self.metrics.high_water = max(self.metrics.high_water, self.depth)
+
+        self._not_empty.set()
+        if self._wanted is not None and self.depth >= self._wanted:
+            self._filled.set()
+        return True
+
+    def _drop_oldest(self):
+        item, size, _ = self._entries.popleft()
+        self.depth -= size
+        self.metrics.dropped += size
+        if self.on_drop is not None:
+            self.on_drop(item)
+
+    async def get_batch(self, max_size: int, max_delay: float) -> list:
+        """
+        Wait for at least one entry, then up to max_delay seconds for
+        max_size readings, and take the entries (oldest first, at least
+        one, at most max_size readings unless a single entry is larger).
+        """
+        while not self._entries:
+            self._not_empty.clear()
+            await self._not_empty.wait()
+
+        if self.depth < max_size:
+            self._wanted = max_size
+            self._filled.clear()
+            try:
+                await asyncio.wait_for(self._filled.wait(), max_delay)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                self._wanted = None
+
+        return self._take(max_size)
+
+    def drain(self) -> list:
+        """Take every queued entry without waiting."""
+        return self._take(None)
+
+    def _take(self, max_size) -> list:
+        now = time.monotonic()
+        items = []
+        taken = 0
+        while self._entries:
+            item, size, enqueued_at = self._entries[0]
+            if max_size is not None and items and taken + size > max_size:
+                break
+            self._entries.popleft()
+            items.append(item)
+            taken += size
+            self.metrics.waits.append(now - enqueued_at)
+
+        self.depth -= taken
+        self.metrics.dequeued += taken
+        self.metrics.dequeue_rate.add(taken, now)
+        self._space.set()
+        return items
+
+    def snapshot(self) -> dict:
+        """Live metrics as a dict."""
+        return self.metrics.snapshot(self)
@@ -0,0 +1,332 @@
+"""
+Telemetry ingestion server (asyncio, stdlib only).
+
+Trucks connect over TCP on localhost and send newline-delimited JSON:
+each line is one reading (an object) or a batch of readings (an array),
+with the same fields as the bulk import (see services.telemetry_import).
+Readings are validated as they arrive and wait in a bounded queue
+(services.ingest_queue) shared by all connections; the writer takes them
+in micro-batches of up to max_batch readings, at most max_delay seconds
+apart. Each line is answered once its readings are stored:
+
+    {"accepted": 2, "duplicates": 0, "rejected": [{"index": 1, "reason": "..."}]}
+
+Ingest is idempotent: readings already stored (same record_id, or same
+battery and timestamp) are not written again and are counted under
+"duplicates", so a client can resend a line whose answer it never got.
+The writer checks them against storage under the lock of each write
+(see storage.write_queue), so several servers and importers can share
+the data folder.
+
+When the queue is full the overflow policy applies: "block" stops reading
+from the connection until there is room, "drop-oldest" and "reject"
+answer the affected lines with an "error" so the client can resend them.
+The line {"metrics": true} is answered with the live queue metrics.
+A line longer than max_line bytes is skipped and answered with an
+"error"; split the batch and resend it.
+
+Stored readings are scored by the anomaly detector
+(services.anomaly_detector): the metrics count what it flags per kind,
+and the command line prints each alert to stderr.
+
+    python -m services.ingest_server --port 8765 --max-queue 50000 --overflow block
+"""
+import argparse
+import asyncio
+import json
+import sys
+import database_manager
+from services.anomaly_detector import describe
+from services.ingest_queue import BLOCK, POLICIES, IngestQueue
+from services.telemetry_import import TelemetryImporter
+from storage.write_queue import WriteQueue
+
+
+DEFAULT_PORT = 8765
+
+# Longest line accepted, in bytes (a full batch of 5000 readings is ~1 MB)
+DEFAULT_MAX_LINE = 4 << 20
+
+
+class IngestServer:
+    """Accepts readings from many connections and writes them in micro-batches."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = DEFAULT_PORT,
+                 max_batch: int = 5000, max_delay: float = 0.05,
+                 max_queue: int = 50000, overflow: str = BLOCK, on_anomaly=None,
+                 max_line: int = DEFAULT_MAX_LINE):
+        """
+        Args:
+            host (str): Interface to listen on (localhost by default).
+            port (int): TCP port.
+            max_batch (int): Flush as soon as this many readings are waiting.
+            max_delay (float): Flush at least this often (seconds).
+            max_queue (int): Most readings waiting to be stored.
+            overflow (str): Policy when the queue is full: "block",
+                "drop-oldest" or "reject".
+            on_anomaly (callable | None): Called with each Anomaly flagged
+                in the stored readings, on the writer thread.
+            max_line (int): Longest line accepted, in bytes.
+        """
+        if max_batch < 1:
+            raise ValueError("max_batch must be at least 1")
+        if max_delay <= 0:
+            raise ValueError("max_delay must be positive")
+        if max_queue < max_batch:
+            raise ValueError("max_queue must be at least max_batch")
+        if max_line < 1:
+            raise ValueError("max_line must be at least 1")
+
+        self.host = host
+        self.port = port
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.max_queue = max_queue
+        self.overflow = overflow
+        self.on_anomaly = on_anomaly
+        self.max_line = max_line
+
+        self._importer = None   # validates readings; its backend is only read
+        self._writes = None     # WriteQueue that stores the batches
+        self._queue = None      # IngestQueue of (rows, future) per line
+        self._server = None
+        self._flusher = None
+        self._connections = set()   # handler tasks of open connections
+
+        self.accepted = 0
+        self.duplicates = 0
+        self.rejected = 0
+        self.flushes = 0
+        self.oversized = 0      # lines skipped for being longer than max_line
+        self.anomalies = {}     # anomaly kind -> readings flagged
+
+    # ===== Lifecycle =====
+
+    async def start(self):
+        self._importer = TelemetryImporter(self._open_backend())
+        self._writes = WriteQueue(self._open_writer)
+        self._queue = IngestQueue(self.max_queue, self.overflow, self._dropped)
+        self._flusher = asyncio.create_task(self._flush_loop())
+        self._server = await asyncio.start_server(self._handle, self.host, self.port,
+                                                  limit=self.max_line)
+        # Port 0 picks a free port
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self, ready=None):
+        """Serve until cancelled. ready() is called once connections are accepted."""
+        await self.start()
+        if ready is not None:
+            ready()
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.stop()
+
+    async def stop(self):
+        """Stop accepting connections and flush what is pending."""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if self._flusher is not None:
+            self._flusher.cancel()
+        if self._queue is not None:
+            await self._flush(self._queue.drain())
+        for task in list(self._connections):
+            task.cancel()
+        if self._connections:
+            await asyncio.wait(self._connections)
+        if self._writes is not None:
+            self._writes.close()
+        if self._importer is not None:
+            self._importer.backend.close()
+
+    @staticmethod
+    def _open_backend():
+        # Through open_storage, so the writes keep the derived data current
+        backend, _ = database_manager.open_storage()
+        return backend
+
+    def _open_writer(self):
+        backend, views = database_manager.open_storage()
+        views["anomalies"].watch(self._flagged)
+        return backend
+
+    def _flagged(self, anomalies):
+        for anomaly in anomalies:
+            self.anomalies[anomaly.kind] = self.anomalies.get(anomaly.kind, 0) + 1
+            if self.on_anomaly is not None:
+                self.on_anomaly(anomaly)
+
+    def metrics(self) -> dict:
+        """Server counters and live queue metrics."""
+        metrics = {"accepted": self.accepted, "duplicates": self.duplicates,
+                   "rejected": self.rejected, "flushes": self.flushes,
+                   "oversized": self.oversized,
+                   "anomalies": dict(self.anomalies)}
+        if self._queue is not None:
+            metrics["queue"] = self._queue.snapshot()
+        return metrics
+
+    # ===== Connections =====
+
+    async def _handle(self, reader, writer):
+        task = asyncio.current_task()
+        self._connections.add(task)
+        try:
+            while True:
+                try:
+                    line = await reader.readuntil(b"\n")
+                except asyncio.IncompleteReadError as e:
+                    line = e.partial    # last line without a newline, or EOF
+                    if not line:
+                        break
+                except asyncio.LimitOverrunError as e:
+                    await self._skip_line(reader, e.consumed)
+                    line = None
+                if line is None:
+                    self.oversized += 1
+                    reply = {"accepted": 0,
+                             "error": f"Line longer than {self.max_line} bytes, split the batch"}
+                else:
+                    reply = await self._ingest_line(line)
+                writer.write((json.dumps(reply) + "\n").encode())
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            # Client went away, or the server is stopping
+            pass
+        finally:
+            self._connections.discard(task)
+            writer.close()
+
+    @staticmethod
+    async def _skip_line(reader, consumed):
+        """Discard the rest of an oversized line, without buffering it."""
+        while True:
+            await reader.readexactly(consumed)
+            try:
+                await reader.readuntil(b"\n")
+                return
+            except asyncio.LimitOverrunError as e:
+                consumed = e.consumed
+
+    async def _ingest_line(self, line) -> dict:
+        try:
+            readings = json.loads(line)
+        except json.JSONDecodeError as e:
+            return {"accepted": 0, "rejected": [{"index": None, "reason": f"Invalid JSON: {e}"}]}
+        if readings == {"metrics": True}:
+            return self.metrics()
+        if isinstance(readings, dict):
+            readings = [readings]
+        if not isinstance(readings, list):
+            return {"accepted": 0, "rejected": [{"index": None, "reason": "Expected an object or array"}]}
+
+        rejected = []
+        rows = []
+        for i, raw in enumerate(readings):
+            try:
+                rows.append(self._importer.validate(raw))
+            except ValueError as e:
+                rejected.append({"index": i, "reason": str(e)})
+
+        self.rejected += len(rejected)
+        if not rows:
+            return {"accepted": 0, "duplicates": 0, "rejected": rejected}
+
+        done = asyncio.get_running_loop().create_future()
+        try:
+            queued = await self._queue.put((rows, done), len(rows))
+        except ValueError as e:
+            queued = False
+            error = str(e)
+        else:
+            error = "Ingest queue full, resend later"
+        if not queued:
+            return {"accepted": 0, "duplicates": 0, "rejected": rejected, "error": error}
+
+        try:
+            stored = await done
+        except Exception as e:
+            return {"accepted": 0, "duplicates": 0, "rejected": rejected, "error": str(e)}
+
+        duplicates = len(rows) - stored
+        self.accepted += stored
+        self.duplicates += duplicates
+        return {"accepted": stored, "duplicates": duplicates, "rejected": rejected}
+
+    def _dropped(self, entry):
+        _, done = entry
+        if not done.done():
+            done.set_exception(RuntimeError("Dropped from a full ingest queue, resend later"))
+
+    # ===== Flushing =====
+
+    async def _flush_loop(self):
+        while True:
+            entries = await self._queue.get_batch(self.max_batch, self.max_delay)
+            await self._flush(entries)
+
+    async def _flush(self, entries):
+        if not entries:
+            return
+        rows = [row for line_rows, _ in entries for row in line_rows]
+
+        try:
+            stored = await asyncio.wrap_future(self._writes.submit(inserts=rows))
+        except Exception as e:
+            for _, done in entries:
+                if not done.done():
+                    done.set_exception(RuntimeError(f"Storage write failed: {e}"))
+            return
+
+        self.flushes += 1
+        stored = {id(row) for row in stored}
+        for line_rows, done in entries:
+            if not done.done():
+                done.set_result(sum(id(row) in stored for row in line_rows))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Telemetry ingestion server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--max-batch", type=int, default=5000)
+    parser.add_argument("--max-delay-ms", type=float, default=50)
+    parser.add_argument("--max-queue", type=int, default=50000,
+                        help="Most readings waiting to be stored")
+    parser.add_argument("--overflow", choices=POLICIES, default=BLOCK,
+                        help="What to do when the queue is full")
+    parser.add_argument("--metrics-every", type=float, default=0,
+                        help="Print queue metrics to stderr every N seconds")
+    parser.add_argument("--max-line-bytes", type=int, default=DEFAULT_MAX_LINE,
+                        help="Longest line accepted; longer ones are answered with an error")
+    args = parser.parse_args()
+
+    def alert(anomaly):
+        print(f"ALERT: {describe(anomaly)}", file=sys.stderr, flush=True)
+
+    try:
+        server = IngestServer(args.host, args.port, args.max_batch, args.max_delay_ms / 1000,
+                              args.max_queue, args.overflow, alert, args.max_line_bytes)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    async def report_metrics():
+        while True:
+            await asyncio.sleep(args.metrics_every)
+            print(json.dumps(server.metrics()), file=sys.stderr, flush=True)
+
+    def ready():
+        print(f"Listening on {server.host}:{server.port}", flush=True)
+        if args.metrics_every > 0:
+            asyncio.get_running_loop().create_task(report_metrics())
+
+    try:
+        asyncio.run(server.serve_forever(ready))
+    except KeyboardInterrupt:
+        print("Stopped.")
+
+
+if __name__ == "__main__":
+    main()
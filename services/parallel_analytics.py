@@ -0,0 +1,176 @@
+"""
+Fleet-wide analytics on a process pool.
+
+Batteries are split into contiguous chunks and analyzed by worker
+processes. Workers do not receive TelemetryRecord objects. Batteries
+whose readings are not loaded yet are sent as their id only, and the
+worker reads their columns itself from the memory-mapped columnar store
+(storage.columnar), so neither process builds records for them. Other
+batteries are sent as their id plus the raw bytes of three arrays
+(temperatures, voltages and timestamps), which is much smaller and
+faster to pickle than the object graph of records, batteries and trucks.
+
+Workers compute exactly what the in-process path computes: without a
+time window a battery's RunningStats arithmetic, with one the engine's
+summarize_columns(), so a fleet's results do not depend on its size or
+on the worker count.
+"""
+import os
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+from models.running_stats import RunningStats
+from models.telemetry import to_micros
+from services.analytics_engine import AnalyticsEngine
+from storage.columnar import ColumnarTelemetry
+
+
+# Worker count when none is given; defaults to the number of CPUs
+WORKERS_ENV = "FLEET_ANALYTICS_WORKERS"
+
+# Fleets smaller than this are analyzed in-process; starting a pool
+# would cost more than it saves.
+MIN_PARALLEL_BATTERIES = 64
+
+
+def default_workers() -> int:
+    value = os.environ.get(WORKERS_ENV)
+    if value:
+        workers = int(value)
+        if workers < 1:
+            raise ValueError(f"{WORKERS_ENV} must be at least 1")
+        return workers
+    return os.cpu_count() or 1
+
+
+def pack_battery(battery, engine, start=None, end=None):
+    """
+    Serialize one battery's readings in [start, end) as
+    (battery_id, temperature bytes, voltage bytes, timestamp bytes).
+    """
+    records = engine.select_window(battery.telemetry, start, end)
+    temps = array("d", [r.temperature_c for r in records])
+    volts = array("d", [r.voltage_v for r in records])
+    stamps = array("q", [to_micros(r.timestamp) for r in records])
+    return battery.battery_id, temps.tobytes(), volts.tobytes(), stamps.tobytes()
+
+
+def _analyze_chunk(engine_class, chunk, start, end, columns_path):
+    """
+    Worker entry point: analyze a list of packed batteries, in order.
+    Batteries packed without readings are read from the columnar store
+    at columns_path. Without a window the readings are summarized through
+    RunningStats, as engine.analyze_battery() does with the battery's
+    own stats.
+    """
+    engine = engine_class()
+    windowed = start is not None or end is not None
+    store = ColumnarTelemetry(columns_path) if columns_path is not None else None
+    try:
+        return [_analyze_packed(engine, store, packed, start, end, windowed) for packed in chunk]
+    finally:
+        if store is not None:
+            store.close()
+
+
+def _analyze_packed(engine, store, packed, start, end, windowed):
+    battery_id, temp_bytes, volt_bytes, stamp_bytes = packed
+    if temp_bytes is None:
+        temp_bytes, volt_bytes, stamp_bytes = (
+            column.tobytes() for column in store.battery_columns(
+                battery_id, "temperature_c", "voltage_v", "timestamp_us", start=start, end=end)
+        )
+    temps = array("d")
+    temps.frombytes(temp_bytes)
+    volts = array("d")
+    volts.frombytes(volt_bytes)
+    stamps = array("q")
+    stamps.frombytes(stamp_bytes)
+    if windowed:
+        return engine.analyze_columns(battery_id, temps, volts, stamps)
+    summary = engine.summarize_stats(RunningStats.from_columns(temps, volts, stamps))
+    return engine.format_analysis(battery_id, *summary)
+
+
+class ParallelAnalyticsRunner:
+    """
+    Runs AnalyticsEngine analyses for many batteries across a process pool.
+    Results come back in the order of the batteries given, like a serial
+    loop over engine.analyze_battery().
+    """
+
+    def __init__(self, workers: int = None, engine_class=AnalyticsEngine, cache=None,
+                 columns=None):
+        """
+        Args:
+            workers (int | None): Number of worker processes. Defaults to
+                $FLEET_ANALYTICS_WORKERS, or the number of CPUs.
+            engine_class (type): AnalyticsEngine (sub)class used by the
+                workers; must be importable by the worker processes.
+            cache (AnalyticsCache | None): Results of batteries whose
+                telemetry did not change are taken from here.
+            columns (callable | None): Returns the path of a columnar store
+                holding the stored telemetry (e.g.
+                database_manager.current_telemetry_columns); called only
+                when the pool is used. Batteries whose lazy telemetry is
+                still untouched (see TelemetryList.untouched) are then read
+                from it by the workers. Their telemetry must not have been
+                loaded with a narrower window than that of run().
+        """
+        if workers is None:
+            workers = default_workers()
+        if workers < 1:
+            raise ValueError("Worker count must be at least 1")
+
+        self.workers = workers
+        self.engine_class = engine_class
+        self.engine = engine_class()
+        self.cache = cache
+        self.columns = columns
+
+    def _chunks(self, packed):
+        """Split into contiguous chunks, a few per worker to even out load."""
+        n_chunks = self.workers * 4
+        size = max(1, -(-len(packed) // n_chunks))
+        return [packed[i:i + size] for i in range(0, len(packed), size)]
+
+    def run(self, batteries, start=None, end=None) -> list:
+        """Return the formatted analysis of every battery, in order."""
+        batteries = list(batteries)
+        results = [None] * len(batteries)
+
+        todo = []
+        for i, battery in enumerate(batteries):
+            cached = self.cache.get(battery, start, end) if self.cache is not None else None
+            if cached is None:
+                todo.append(i)
+            else:
+                results[i] = cached
+
+        if self.workers == 1 or len(todo) < MIN_PARALLEL_BATTERIES:
+            computed = [self.engine.analyze_battery(batteries[i], start, end) for i in todo]
+        else:
+            columns_path = self.columns() if self.columns is not None else None
+            packed = [
+                (batteries[i].battery_id, None, None, None)
+                if columns_path is not None and batteries[i].telemetry.untouched
+                else pack_battery(batteries[i], self.engine, start, end)
+                for i in todo
+            ]
+            chunks = self._chunks(packed)
+            computed = []
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                # map() yields chunk results in submission order
+                for chunk_results in pool.map(_analyze_chunk,
+                                              [self.engine_class] * len(chunks),
+                                              chunks,
+                                              [start] * len(chunks),
+                                              [end] * len(chunks),
+                                              [columns_path] * len(chunks)):
+                    computed.extend(chunk_results)
+
+        for i, result in zip(todo, computed):
+            results[i] = result
+            if self.cache is not None:
+                self.cache.put(batteries[i], result, start, end)
+        return results
@@ -0,0 +1,231 @@
+"""
+Approximate percentiles of temperature and voltage.
+
+Every battery keeps a KLL quantile sketch per field. A sketch holds a
+bounded number of samples (set by k) however many readings it has seen,
+and sketches merge, so truck, make/model and fleet percentiles are
+merges of the battery sketches. They are kept by the storage layer like
+the rollups (see database_manager.DERIVED): every telemetry write adds
+its readings and they are saved in data/sketches.json, so percentile
+queries need neither the raw readings nor a rescan.
+
+Sketches cannot forget a reading: a write that removes or replaces
+readings marks the sketches of those batteries stale, and the next load
+rebuilds just them from their own rows. The snapshot keeps one entry per
+battery, so a battery or truck query reads only its batteries' sketches
+(see database_manager.sketches()).
+"""
+import math
+import random
+
+from models.telemetry import is_valid_reading
+
+
+# Sketch file inside the data directory
+SKETCH_FILE = "sketches.json"
+
+# Above this many stale batteries, refresh() rebuilds them in one pass
+# over the telemetry instead of one read per battery
+REFRESH_BY_BATTERY = 8
+
+FIELDS = ("temperature_c", "voltage_v")
+
+
+class KLLSketch:
+    """
+    KLL quantile sketch (Karnin, Lang, Liberty 2016). Values sit in a
+    stack of compactors; a full compactor sorts itself and promotes every
+    other value to the next level, where each value counts twice as much.
+    Rank error is roughly 1.7 / k with high probability.
+    """
+
+    __slots__ = ("k", "compactors", "count", "_size", "_max_size")
+
+    def __init__(self, k: int = 128):
+        """
+        Args:
+            k (int): Accuracy/size trade-off; a sketch holds about 3k values.
+        """
+        if k < 8:
+            raise ValueError("k must be at least 8.")
+        self.k = k
+        self.compactors = []
+        self.count = 0
+        self._size = 0
+        self._max_size = 0
+        self._grow()
+
+    def _capacity(self, level):
+        depth = len(self.compactors) - level - 1
+        return int(math.ceil((2 / 3) ** depth * self.k)) + 1
+
+    def _grow(self):
+        self.compactors.append([])
+        self._max_size = sum(self._capacity(h) for h in range(len(self.compactors)))
+
+    def _compress(self):
+        for h, compactor in enumerate(self.compactors):
+            if len(compactor) >= self._capacity(h):
+                if h + 1 == len(self.compactors):
+                    self._grow()
+                compactor.sort()
+                offset = random.getrandbits(1)
+                self.compactors[h + 1].extend(compactor[offset::2])
+                compactor.clear()
+                self._size = sum(len(c) for c in self.compactors)
+                return
+
+    def add(self, value):
+        self.compactors[0].append(value)
+        self.count += 1
+        self._size += 1
+        if self._size >= self._max_size:
+            self._compress()
+
+    def merge(self, other):
+        """Fold another sketch into this one."""
+        while len(self.compactors) < len(other.compactors):
+            self._grow()
+        for h, compactor in enumerate(other.compactors):
+            self.compactors[h].extend(compactor)
+        self.count += other.count
+        self._size = sum(len(c) for c in self.compactors)
+        while self._size >= self._max_size:
+            self._compress()
+
+    def quantile(self, q: float):
+        """Approximate value at quantile q (0..1), or None if empty."""
+        if not 0 <= q <= 1:
+            raise ValueError("Quantile must be between 0 and 1.")
+        weighted = sorted(
+            (value, 1 << h)
+            for h, compactor in enumerate(self.compactors)
+            for value in compactor
+        )
+        if not weighted:
+            return None
+
+        total = sum(w for _, w in weighted)
+        target = q * total
+        seen = 0
+        for value, weight in weighted:
+            seen += weight
+            if seen >= target:
+                return value
+        return weighted[-1][0]
+
+    def percentiles(self, ps=(50, 95, 99)) -> dict:
+        """{p: value} for percentiles given as 0..100."""
+        return {p: self.quantile(p / 100) for p in ps}
+
+    def to_dict(self) -> dict:
+        return {"k": self.k, "count": self.count, "compactors": self.compactors}
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data["k"])
+        sketch.compactors = [list(c) for c in data["compactors"]]
+        sketch.count = data["count"]
+        sketch._size = sum(len(c) for c in sketch.compactors)
+        sketch._max_size = sum(sketch._capacity(h) for h in range(len(sketch.compactors)))
+        return sketch
+
+
+class QuantileSketches:
+    """Per-battery KLL sketches of temperature and voltage."""
+
+    # Snapshot entries (see storage.derived): one per battery
+    ENTRIES = ("batteries", "battery_id")
+
+    def __init__(self, k: int = 128):
+        self.k = k
+        self._stale = set()   # batteries with removed readings; need a rebuild
+        self._sketches = {}   # battery_id -> {field: KLLSketch}
+
+    @property
+    def stale(self) -> bool:
+        return bool(self._stale)
+
+    # ===== Storage data (storage.derived) =====
+
+    @classmethod
+    def from_rows(cls, rows, k: int = 128):
+        """Build sketches from stored telemetry rows (one full scan)."""
+        sketches = cls(k)
+        sketches.rows_added(rows)
+        return sketches
+
+    def rows_added(self, rows):
+        for r in rows:
+            battery_id = r["battery_id"]
+            if battery_id is None or not is_valid_reading(r["temperature_c"], r["voltage_v"]):
+                continue
+            fields = self._sketches.get(battery_id)
+            if fields is None:
+                fields = self._sketches[battery_id] = {f: KLLSketch(self.k) for f in FIELDS}
+            fields["temperature_c"].add(r["temperature_c"])
+            fields["voltage_v"].add(r["voltage_v"])
+
+    def rows_removed(self, rows):
+        """Sketches cannot forget a reading: mark the battery for a rebuild."""
+        for r in rows:
+            if r["battery_id"] is not None and is_valid_reading(r["temperature_c"], r["voltage_v"]):
+                self._stale.add(r["battery_id"])
+
+    def refresh(self, backend):
+        """Rebuild the stale batteries' sketches from their own rows."""
+        stale, self._stale = self._stale, set()
+        for battery_id in stale:
+            self._sketches.pop(battery_id, None)
+        if len(stale) <= REFRESH_BY_BATTERY:
+            for battery_id in stale:
+                self.rows_added(backend.read_telemetry(battery_id=battery_id))
+        else:
+            self.rows_added(r for r in backend.iter_telemetry() if r["battery_id"] in stale)
+
+    def to_dict(self) -> dict:
+        return {
+            "k": self.k,
+            "stale_batteries": sorted(self._stale),
+            "batteries": [[battery_id, {f: s.to_dict() for f, s in fields.items()}]
+                          for battery_id, fields in self._sketches.items()],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        sketches = cls(data["k"])
+        sketches._stale = set(data["stale_batteries"])
+        for battery_id, fields in data["batteries"]:
+            sketches._sketches[battery_id] = {f: KLLSketch.from_dict(d) for f, d in fields.items()}
+        return sketches
+
+    # ===== Queries =====
+
+    def battery(self, battery_id, field="temperature_c") -> KLLSketch:
+        """The battery's sketch for a field (empty if it has no readings)."""
+        fields = self._sketches.get(battery_id)
+        return fields[field] if fields else KLLSketch(self.k)
+
+    def merged(self, battery_ids, field="temperature_c") -> KLLSketch:
+        """One sketch covering the readings of all the given batteries."""
+        result = KLLSketch(self.k)
+        for battery_id in battery_ids:
+            fields = self._sketches.get(battery_id)
+            if fields:
+                result.merge(fields[field])
+        return result
+
+    def truck(self, truck, field="temperature_c") -> KLLSketch:
+        return self.merged((b.battery_id for b in truck.batteries), field)
+
+    def make_model(self, trucks, make, model, field="temperature_c") -> KLLSketch:
+        """Merged sketch of the batteries of every truck of this make and model."""
+        make, model = make.strip().title(), model.strip().title()
+        return self.merged(
+            (b.battery_id for t in trucks if t.make == make and t.model == model
+             for b in t.batteries),
+            field
+        )
+
+    def fleet(self, field="temperature_c") -> KLLSketch:
+        return self.merged(self._sketches, field)
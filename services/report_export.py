@@ -0,0 +1,197 @@
+"""
+Non-interactive fleet report export.
+
+Streams one analytics row per battery to CSV or JSONL, followed by a
+summary row for each truck and one for the whole fleet, all computed in
+the same pass. Rows are written as they are produced, so the report
+never has to be held in memory, and the command line streams the stored
+telemetry once into per-battery running stats instead of loading the
+readings: memory grows with the number of batteries, not of readings
+(see benchmarks/bench_report_memory.py).
+
+    python -m services.report_export --out report.csv
+    python -m services.report_export --out report.jsonl --start 2025-01-01
+"""
+import argparse
+import csv
+import json
+from datetime import datetime
+
+from models.running_stats import RunningStats
+from models.telemetry import to_micros
+from services.analytics_engine import AnalyticsEngine
+
+
+# Columns of every report row, in CSV order
+REPORT_COLUMNS = (
+    "level", "truck_id", "battery_id", "batteries", "readings",
+    "avg_temperature_c", "fade", "remaining_life", "min_remaining_life",
+)
+
+FORMATS = ("csv", "jsonl")
+
+
+class _Summary:
+    """Running totals behind a truck or fleet summary row."""
+
+    def __init__(self):
+        self.batteries = 0
+        self.readings = 0
+        self.temp_sum = 0.0      # avg temperature weighted by readings
+        self.fade_sum = 0.0
+        self.life_sum = 0.0
+        self.min_life = None
+
+    def add(self, row):
+        self.batteries += 1
+        self.readings += row["readings"]
+        self.temp_sum += row["avg_temperature_c"] * row["readings"]
+        self.fade_sum += row["fade"]
+        self.life_sum += row["remaining_life"]
+        if self.min_life is None or row["remaining_life"] < self.min_life:
+            self.min_life = row["remaining_life"]
+
+    def row(self, level, truck_id=None) -> dict:
+        n = self.batteries
+        return {
+            "level": level,
+            "truck_id": truck_id,
+            "battery_id": None,
+            "batteries": n,
+            "readings": self.readings,
+            "avg_temperature_c": self.temp_sum / self.readings if self.readings else 0,
+            "fade": self.fade_sum / n if n else 0,
+            "remaining_life": self.life_sum / n if n else 100,
+            "min_remaining_life": self.min_life if n else 100,
+        }
+
+
+def telemetry_stats(rows) -> dict:
+    """
+    battery_id -> RunningStats of its readings, from one pass over stored
+    telemetry rows (oldest first, as read_telemetry() returns them).
+    """
+    stats = {}
+    for r in rows:
+        battery_id = r["battery_id"]
+        if battery_id is None:
+            continue
+        battery_stats = stats.get(battery_id)
+        if battery_stats is None:
+            battery_stats = stats[battery_id] = RunningStats()
+        battery_stats.add_values(r["temperature_c"], r["voltage_v"],
+                                 to_micros(datetime.fromisoformat(r["timestamp"])))
+    return stats
+
+
+def report_rows(batteries, engine=None, start=None, end=None, stats=None):
+    """
+    Yield the report rows: each truck's battery rows followed by that
+    truck's summary row, then one fleet row. Batteries are grouped by
+    truck id (batteries without a truck come last, under truck_id None).
+
+    Truck rows average fade and remaining life over the batteries; their
+    avg_temperature_c is weighted by each battery's readings.
+
+    With stats (see telemetry_stats()) the battery rows come from them and
+    the batteries' own telemetry is never loaded.
+    """
+    engine = engine or AnalyticsEngine()
+    ordered = sorted(batteries, key=lambda b: (b.truck is None,
+                                               b.truck.truck_id if b.truck else 0,
+                                               b.battery_id))
+
+    fleet = _Summary()
+    truck = None
+    truck_id = None
+
+    for battery in ordered:
+        if stats is not None:
+            row = engine.stats_row(battery, stats.get(battery.battery_id) or RunningStats())
+        else:
+            row = engine.analyze_battery_row(battery, start, end)
+        if truck is None or row["truck_id"] != truck_id:
+            if truck is not None:
+                yield truck.row("truck", truck_id)
+            truck = _Summary()
+            truck_id = row["truck_id"]
+
+        row = dict(row, level="battery", batteries=1,
+                   min_remaining_life=row["remaining_life"])
+        truck.add(row)
+        fleet.add(row)
+        yield row
+
+    if truck is not None:
+        yield truck.row("truck", truck_id)
+    yield fleet.row("fleet")
+
+
+def write_csv(rows, f) -> int:
+    """Write rows to an open text file as CSV. Returns the row count."""
+    writer = csv.DictWriter(f, fieldnames=REPORT_COLUMNS)
+    writer.writeheader()
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+    return count
+
+
+def write_jsonl(rows, f) -> int:
+    """Write rows to an open text file as JSON lines. Returns the row count."""
+    count = 0
+    for row in rows:
+        f.write(json.dumps({c: row[c] for c in REPORT_COLUMNS}) + "\n")
+        count += 1
+    return count
+
+
+def export_report(path, batteries, fmt=None, engine=None, start=None, end=None,
+                  stats=None) -> int:
+    """
+    Stream the report for the batteries to path. fmt is "csv" or "jsonl";
+    by default it follows the file extension. stats is passed on to
+    report_rows(). Returns the number of rows.
+    """
+    fmt = fmt or ("jsonl" if path.endswith((".jsonl", ".json")) else "csv")
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown report format '{fmt}'. Must be one of: {', '.join(FORMATS)}")
+
+    rows = report_rows(batteries, engine, start, end, stats)
+    with open(path, "w", newline="") as f:
+        if fmt == "csv":
+            return write_csv(rows, f)
+        return write_jsonl(rows, f)
+
+
+def export_stored(path, fmt=None, engine=None, start=None, end=None) -> int:
+    """
+    Export the report of the stored fleet. Trucks and batteries are
+    loaded without their telemetry, which is streamed once into running
+    stats. Returns the number of rows.
+    """
+    import database_manager
+
+    trucks = database_manager.load_trucks()
+    batteries = database_manager.load_batteries(trucks)
+    stats = telemetry_stats(database_manager.get_backend().iter_telemetry(start, end))
+    return export_report(path, batteries, fmt, engine, start, end, stats)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the fleet analytics report.")
+    parser.add_argument("--out", required=True, help="Output file (.csv or .jsonl)")
+    parser.add_argument("--format", choices=FORMATS)
+    parser.add_argument("--start", type=datetime.fromisoformat,
+                        help="Only use readings taken at or after this time")
+    parser.add_argument("--end", type=datetime.fromisoformat,
+                        help="Only use readings taken before this time")
+    args = parser.parse_args()
+
+    count = export_stored(args.out, args.format, start=args.start, end=args.end)
+    print(f"Wrote {count} rows to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
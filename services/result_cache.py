@@ -0,0 +1,144 @@
+"""
+Cache of analytics results.
+
+Results are keyed on the battery id, the battery's telemetry version
+(Battery.telemetry_version, bumped on every add/delete) and the analysis
+window, so a cached result can never describe older data than the
+battery holds now. The cache is a bounded LRU and can be saved to disk
+between sessions; a saved file is only used if it was written by the
+same CACHE_VERSION and the stored data has not changed since.
+"""
+import json
+import os
+from collections import OrderedDict
+
+
+# Cache file inside the data directory
+CACHE_FILE = "analytics_cache.json"
+
+# Bumped whenever the computation behind the results changes, so files
+# holding results of the old computation are discarded. 2: running stats
+# renumber the readings after a delete. 3: fade in volts per day.
+CACHE_VERSION = 3
+
+
+def _iso(value):
+    return value.isoformat() if value is not None else None
+
+
+class AnalyticsCache:
+    """Bounded LRU cache of formatted analysis results."""
+
+    def __init__(self, max_entries: int = 4096, path: str = None):
+        """
+        Args:
+            max_entries (int): Entries kept before the least recently used
+                one is evicted.
+            path (str | None): File used by load() and save().
+        """
+        if max_entries < 1:
+            raise ValueError("Cache size must be at least 1")
+        self.max_entries = max_entries
+        self.path = path
+        self._entries = OrderedDict()   # (battery_id, version, start, end) -> result
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(battery, start=None, end=None) -> tuple:
+        return (battery.battery_id, battery.telemetry_version, _iso(start), _iso(end))
+
+    def get(self, battery, start=None, end=None):
+        """Return the cached result for this battery's current data, or None."""
+        key = self.key(battery, start, end)
+        result = self._entries.get(key)
+        if result is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return result
+
+    def put(self, battery, result, start=None, end=None):
+        key = self.key(battery, start, end)
+        self._entries[key] = result
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        """Counters for inspection: hits, misses, evictions, size, hit_rate."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self._entries),
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def __len__(self):
+        return len(self._entries)
+
+    # ===== Persistence =====
+
+    def _read_saved(self, stamp) -> list:
+        """Entries of the saved file if it is still valid for `stamp`, else []."""
+        if self.path is None or not os.path.exists(self.path):
+            return []
+        try:
+            with open(self.path, "r") as f:
+                saved = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return []
+        if saved.get("version") != CACHE_VERSION or saved.get("stamp") != stamp:
+            return []
+        return saved["entries"]
+
+    def load(self, stamp, batteries) -> int:
+        """
+        Read entries saved by save() for the just loaded batteries. They are
+        only used if the stored data is unchanged since then, i.e. the saved
+        stamp equals `stamp`. Returns the number of entries loaded.
+        """
+        current = {b.battery_id: b.telemetry_version for b in batteries}
+        loaded = 0
+        for battery_id, start, end, result in self._read_saved(stamp):
+            if battery_id in current:
+                self._entries[(battery_id, current[battery_id], start, end)] = result
+                loaded += 1
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return loaded
+
+    def save(self, stamp, batteries):
+        """
+        Write the entries that describe the batteries' current data, tagged
+        with `stamp` (see database_manager.data_stamp()). Call it after the
+        changes are committed, so the stored data matches memory.
+
+        Saved entries of other batteries are kept if the file is still
+        valid for `stamp`, so saving after analyzing one battery does not
+        drop the rest of the cache.
+        """
+        if self.path is None:
+            return
+        current = {b.battery_id: b.telemetry_version for b in batteries}
+        entries = [
+            [battery_id, start, end, result]
+            for (battery_id, version, start, end), result in self._entries.items()
+            if current.get(battery_id) == version
+        ]
+        kept = [e for e in self._read_saved(stamp) if e[0] not in current]
+        entries = (kept + entries)[-self.max_entries:]
+
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"version": CACHE_VERSION, "stamp": stamp, "entries": entries}, f)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,219 @@
+"""
+Pre-aggregated telemetry rollups.
+
+For every battery and truck, readings are summarized into minute, hour
+and day buckets holding the count and the min/max/sum of temperature,
+voltage and current. database_manager.rollups() keeps them in
+data/rollups.json, updated by every telemetry write (see
+storage.derived), so questions over long time ranges read a few hundred
+buckets instead of every TelemetryRecord.
+
+Deleting a reading lowers the count and sums of its buckets but does not
+narrow their min/max.
+"""
+from datetime import datetime, timedelta
+
+from models.telemetry import is_valid_reading
+
+
+# Rollup file inside the data directory
+ROLLUP_FILE = "rollups.json"
+
+# Tier name -> bucket width, finest first
+TIERS = {
+    "minute": timedelta(minutes=1),
+    "hour": timedelta(hours=1),
+    "day": timedelta(days=1),
+}
+
+FIELDS = ("temperature_c", "voltage_v", "current_a")
+
+
+def bucket_start(timestamp, tier):
+    """Start of the bucket of the given tier that contains timestamp."""
+    if tier == "minute":
+        return timestamp.replace(second=0, microsecond=0)
+    if tier == "hour":
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+class RollupBucket:
+    """count and per-field min/max/sum of the readings in one time bucket."""
+
+    __slots__ = ("count", "mins", "maxs", "sums")
+
+    def __init__(self, count=0, mins=None, maxs=None, sums=None):
+        self.count = count
+        self.mins = mins or [float("inf")] * len(FIELDS)
+        self.maxs = maxs or [float("-inf")] * len(FIELDS)
+        self.sums = sums or [0.0] * len(FIELDS)
+
+    def add(self, values, sign=1):
+        self.count += sign
+        for i, value in enumerate(values):
+            self.sums[i] += sign * value
+            if sign > 0:
+                if value < self.mins[i]:
+                    self.mins[i] = value
+                if value > self.maxs[i]:
+                    self.maxs[i] = value
+
+    def merge(self, other):
+        self.count += other.count
+        for i in range(len(FIELDS)):
+            self.sums[i] += other.sums[i]
+            self.mins[i] = min(self.mins[i], other.mins[i])
+            self.maxs[i] = max(self.maxs[i], other.maxs[i])
+
+    def summary(self) -> dict:
+        """{"count": n, field: {"min", "max", "mean"}} for each field."""
+        result = {"count": self.count}
+        for i, field in enumerate(FIELDS):
+            result[field] = {
+                "min": self.mins[i] if self.count else None,
+                "max": self.maxs[i] if self.count else None,
+                "mean": self.sums[i] / self.count if self.count else None,
+            }
+        return result
+
+
+class TelemetryRollups:
+    """
+    Minute/hour/day rollups of every battery and truck.
+    Owners are addressed as ("battery", battery_id) or ("truck", truck_id).
+    """
+
+    def __init__(self):
+        # (kind, owner_id, tier) -> {bucket start: RollupBucket}
+        self._buckets = {}
+
+    @classmethod
+    def build(cls, records):
+        """Build rollups from existing readings (one full scan)."""
+        rollups = cls()
+        for record in records:
+            rollups.telemetry_added(record)
+        return rollups
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Build rollups from stored telemetry rows (one full scan)."""
+        rollups = cls()
+        rollups.rows_added(rows)
+        return rollups
+
+    def _update(self, battery_id, truck_id, timestamp, values, sign):
+        if not is_valid_reading(values[0], values[1]):
+            return
+        owners = []
+        if battery_id is not None:
+            owners.append(("battery", battery_id))
+        if truck_id is not None:
+            owners.append(("truck", truck_id))
+        for kind, owner_id in owners:
+            for tier in TIERS:
+                buckets = self._buckets.setdefault((kind, owner_id, tier), {})
+                start = bucket_start(timestamp, tier)
+                bucket = buckets.get(start)
+                if bucket is None:
+                    if sign < 0:
+                        continue
+                    bucket = buckets[start] = RollupBucket()
+                bucket.add(values, sign)
+                if bucket.count <= 0:
+                    del buckets[start]
+
+    def _update_record(self, record, sign):
+        self._update(record.battery.battery_id if record.battery is not None else None,
+                     record.truck.truck_id if record.truck is not None else None,
+                     record.timestamp,
+                     (record.temperature_c, record.voltage_v, record.current_a), sign)
+
+    def _update_rows(self, rows, sign):
+        for r in rows:
+            self._update(r["battery_id"], r["truck_id"], datetime.fromisoformat(r["timestamp"]),
+                         (r["temperature_c"], r["voltage_v"], r["current_a"]), sign)
+
+    # ===== Storage listener (see storage.derived) =====
+
+    def rows_added(self, rows):
+        self._update_rows(rows, 1)
+
+    def rows_removed(self, rows):
+        self._update_rows(rows, -1)
+
+    # ===== Repository listener =====
+
+    def telemetry_added(self, record):
+        self._update_record(record, 1)
+
+    def telemetry_removed(self, record):
+        self._update_record(record, -1)
+
+    # ===== Queries =====
+
+    def tier_for(self, resolution: timedelta) -> str:
+        """The coarsest tier whose buckets are no wider than resolution."""
+        chosen = None
+        for tier, width in TIERS.items():
+            if width <= resolution:
+                chosen = tier
+        if chosen is None:
+            raise ValueError("Resolution must be at least one minute.")
+        return chosen
+
+    def series(self, kind, owner_id, start, end, resolution=TIERS["day"]) -> list:
+        """
+        Aggregates over [start, end) in steps of `resolution`, read from
+        the coarsest tier that fits. Returns [(step start, RollupBucket)]
+        for the steps that have readings, oldest first. Steps are aligned
+        to midnight of start's day.
+        """
+        tier = self.tier_for(resolution)
+        origin = bucket_start(start, "day")
+        steps = {}
+        for ts, bucket in self._buckets.get((kind, owner_id, tier), {}).items():
+            if not (bucket_start(start, tier) <= ts < end):
+                continue
+            step = origin + ((ts - origin) // resolution) * resolution
+            steps.setdefault(step, RollupBucket()).merge(bucket)
+        return sorted(steps.items())
+
+    def summary(self, kind, owner_id, start, end) -> RollupBucket:
+        """
+        One aggregate over [start, end), covering the range with as many
+        day buckets as fit, then hours, then minutes at the edges. The
+        range is rounded to whole minutes.
+        """
+        total = RollupBucket()
+        cursor = bucket_start(start, "minute")
+        coarse_first = list(reversed(TIERS.items()))
+        while cursor < end:
+            for tier, width in coarse_first:
+                if tier != "minute" and (bucket_start(cursor, tier) != cursor
+                                         or cursor + width > end):
+                    continue
+                bucket = self._buckets.get((kind, owner_id, tier), {}).get(cursor)
+                if bucket is not None:
+                    total.merge(bucket)
+                cursor += width
+                break
+        return total
+
+    # ===== Persistence =====
+
+    def to_dict(self) -> dict:
+        return {"buckets": [
+            [kind, owner_id, tier, ts.isoformat(), b.count, b.mins, b.maxs, b.sums]
+            for (kind, owner_id, tier), buckets in self._buckets.items()
+            for ts, b in buckets.items()
+        ]}
+
+    @classmethod
+    def from_dict(cls, data):
+        rollups = cls()
+        for kind, owner_id, tier, ts, count, mins, maxs, sums in data["buckets"]:
+            buckets = rollups._buckets.setdefault((kind, owner_id, tier), {})
+            buckets[datetime.fromisoformat(ts)] = RollupBucket(count, mins, maxs, sums)
+        return rollups
@@ -0,0 +1,260 @@
+"""
+Bulk telemetry import.
+
+Streams readings from a CSV or JSONL file, validates them in batches with
+the same rules as TelemetryRecord's setters, resolves truck and battery
+ids through in-memory id indexes and writes each batch of valid rows with
+one storage operation.
+
+Imports are idempotent: a reading whose record_id is already stored, or
+whose battery already has a reading at the same timestamp, is skipped
+and counted as a duplicate (see services.dedupe), so a file can safely
+be imported again after an interruption. Each batch is checked against
+storage under the same lock as its write (StorageBackend.insert_telemetry),
+so importers running side by side never store a reading twice.
+
+Imported readings are scored by the anomaly detector as they are stored
+(services.anomaly_detector); the result counts and lists what it flags.
+
+    python -m services.telemetry_import readings.csv
+    python -m services.telemetry_import readings.jsonl --batch-size 10000 --rejects bad.jsonl
+
+Input columns: record_id, truck_id, battery_id, temperature_c, voltage_v,
+current_a and an optional ISO timestamp (defaults to the import time).
+Timestamps are stored as naive UTC: those with an offset are converted,
+those without one are taken to be UTC already.
+"""
+import argparse
+import csv
+import json
+import sys
+import time
+from datetime import datetime
+from itertools import islice
+
+import database_manager
+from models.telemetry import TelemetryRecord, utc_now
+from services.anomaly_detector import describe
+
+
+FORMATS = ("csv", "jsonl")
+
+# Rejected rows (and anomalies) whose details are kept on the result
+MAX_REJECT_DETAILS = 100
+
+
+class ImportResult:
+    """Counts, rejected-row details and anomalies of one import."""
+
+    def __init__(self):
+        self.imported = 0
+        self.rejected = 0
+        self.duplicates = 0
+        self.anomalies = 0
+        self.batches = 0
+        self.seconds = 0.0
+        self.rejects = []   # (line number, reason, raw row), first MAX_REJECT_DETAILS
+        self.alerts = []    # flagged Anomaly tuples, first MAX_REJECT_DETAILS
+
+    @property
+    def rows_per_second(self) -> float:
+        total = self.imported + self.rejected + self.duplicates
+        return total / self.seconds if self.seconds else 0.0
+
+    def reject(self, line, reason, raw):
+        self.rejected += 1
+        if len(self.rejects) < MAX_REJECT_DETAILS:
+            self.rejects.append((line, reason, raw))
+
+    def flag(self, anomalies):
+        self.anomalies += len(anomalies)
+        self.alerts.extend(anomalies[:MAX_REJECT_DETAILS - len(self.alerts)])
+
+    def __str__(self):
+        return (f"Imported {self.imported} rows, skipped {self.duplicates} duplicates, "
+                f"rejected {self.rejected}, flagged {self.anomalies} anomalies "
+                f"in {self.batches} batches ({self.seconds:.2f}s, "
+                f"{self.rows_per_second:,.0f} rows/s)")
+
+
+def read_rows(f, fmt):
+    """Yield (line number, raw row dict) from an open CSV or JSONL file."""
+    if fmt == "csv":
+        for line, row in enumerate(csv.DictReader(f), start=2):
+            yield line, row
+        return
+    for line, text in enumerate(f, start=1):
+        if not text.strip():
+            continue
+        try:
+            yield line, json.loads(text)
+        except json.JSONDecodeError as e:
+            yield line, {"_error": f"Invalid JSON: {e}"}
+
+
+def _optional_int(value):
+    if value is None or value == "":
+        return None
+    return int(value)
+
+
+class TelemetryImporter:
+    """Imports telemetry rows straight into the active storage backend."""
+
+    def __init__(self, backend=None, batch_size: int = 5000):
+        """
+        Args:
+            backend (StorageBackend | None): Defaults to the active backend;
+                anomalies are only counted for imports into it.
+            batch_size (int): Rows validated and written per storage operation.
+        """
+        if batch_size < 1:
+            raise ValueError("Batch size must be at least 1")
+        self.batch_size = batch_size
+        self._flagged = []  # anomalies flagged by the last write
+        if backend is None:
+            backend = database_manager.get_backend()
+            database_manager.watch_anomalies(self._flagged.extend)
+        self.backend = backend
+
+        # Id indexes used to resolve and check references (see _exists)
+        self.truck_ids = {r["truck_id"] for r in self.backend.read_rows("trucks")}
+        self.battery_ids = {r["battery_id"] for r in self.backend.read_rows("batteries")}
+
+    def validate(self, raw) -> dict:
+        """
+        Turn one raw row into a storage row, or raise ValueError.
+        Values go through TelemetryRecord's setters, so the rules are the
+        same as for readings entered by hand.
+        """
+        if not isinstance(raw, dict):
+            raise ValueError("Expected an object")
+        if "_error" in raw:
+            raise ValueError(raw["_error"])
+        try:
+            record_id = int(raw["record_id"])
+            truck_id = _optional_int(raw.get("truck_id"))
+            battery_id = _optional_int(raw.get("battery_id"))
+            temperature = float(raw["temperature_c"])
+            voltage = float(raw["voltage_v"])
+            current = float(raw["current_a"])
+            timestamp = raw.get("timestamp")
+            timestamp = datetime.fromisoformat(timestamp) if timestamp else utc_now()
+        except KeyError as e:
+            raise ValueError(f"Missing column {e}")
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Invalid value: {e}")
+
+        if truck_id is not None and not self._exists("trucks", "truck_id", truck_id, self.truck_ids):
+            raise ValueError(f"Truck {truck_id} not found")
+        if battery_id is not None and not self._exists("batteries", "battery_id", battery_id,
+                                                       self.battery_ids):
+            raise ValueError(f"Battery {battery_id} not found")
+
+        # Not linked to any truck or battery: only the setters run
+        record = TelemetryRecord(record_id, None, None, temperature, voltage, current, timestamp)
+        return {
+            "record_id": record.record_id,
+            "truck_id": truck_id,
+            "battery_id": battery_id,
+            "temperature_c": record.temperature_c,
+            "voltage_v": record.voltage_v,
+            "current_a": record.current_a,
+            "timestamp": record.timestamp.isoformat(),
+        }
+
+    def _exists(self, table, column, value, known) -> bool:
+        """
+        Whether the id is stored: looked up in storage when it is not in
+        the known ids, since a long-running importer (the ingestion
+        server) outlives trucks and batteries added after it started.
+        """
+        if value in known:
+            return True
+        if self.backend.read_rows_where(table, column, [value]):
+            known.add(value)
+            return True
+        return False
+
+    def import_rows(self, rows, result=None, on_reject=None) -> ImportResult:
+        """
+        Import (line number, raw row) pairs batch by batch.
+        on_reject(line, reason, raw) is called for every rejected row.
+        """
+        result = result or ImportResult()
+        start = time.perf_counter()
+        rows = iter(rows)
+
+        while True:
+            batch = list(islice(rows, self.batch_size))
+            if not batch:
+                break
+
+            valid = []
+            for line, raw in batch:
+                try:
+                    row = self.validate(raw)
+                except ValueError as e:
+                    result.reject(line, str(e), raw)
+                    if on_reject is not None:
+                        on_reject(line, str(e), raw)
+                    continue
+                valid.append(row)
+
+            # Duplicates are checked against storage under the lock of the write
+            stored = self.backend.insert_telemetry(valid) if valid else []
+            result.flag(self._flagged)
+            self._flagged.clear()
+            result.imported += len(stored)
+            result.duplicates += len(valid) - len(stored)
+            result.batches += 1
+
+        result.seconds = time.perf_counter() - start
+        return result
+
+    def import_file(self, path, fmt=None, on_reject=None) -> ImportResult:
+        """Import a CSV or JSONL file (format from the extension by default)."""
+        fmt = fmt or ("jsonl" if path.endswith((".jsonl", ".json")) else "csv")
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown format '{fmt}'. Must be one of: {', '.join(FORMATS)}")
+        with open(path, "r", newline="") as f:
+            return self.import_rows(read_rows(f, fmt), on_reject=on_reject)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import telemetry readings.")
+    parser.add_argument("path", help="CSV or JSONL file of readings")
+    parser.add_argument("--format", choices=FORMATS)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--rejects", help="Write every rejected row with its reason to this JSONL file")
+    args = parser.parse_args()
+
+    rejects_file = open(args.rejects, "w") if args.rejects else None
+
+    def on_reject(line, reason, raw):
+        if rejects_file is not None:
+            rejects_file.write(json.dumps({"line": line, "reason": reason, "row": raw}) + "\n")
+
+    try:
+        importer = TelemetryImporter(batch_size=args.batch_size)
+        result = importer.import_file(args.path, args.format, on_reject)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    finally:
+        if rejects_file is not None:
+            rejects_file.close()
+
+    print(result)
+    for line, reason, _ in result.rejects[:10]:
+        print(f"  line {line}: {reason}")
+    if result.rejected > 10:
+        print(f"  ... {result.rejected - 10} more")
+    for anomaly in result.alerts[:10]:
+        print(f"  ALERT: {describe(anomaly)}")
+    if result.anomalies > 10:
+        print(f"  ... {result.anomalies - 10} more anomalies")
+
+
+if __name__ == "__main__":
+    main()
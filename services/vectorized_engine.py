@@ -0,0 +1,133 @@
+"""
+NumPy-backed analytics.
+
+VectorizedAnalyticsEngine runs the same computations as AnalyticsEngine on
+array columns instead of lists of TelemetryRecord objects. NumPy is
+optional: without it (or with use_numpy=False) every method falls back to
+the pure Python implementation.
+"""
+from models.telemetry import MICROS_PER_DAY
+from services.analytics_engine import AnalyticsEngine
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is an optional dependency
+    np = None
+
+
+HAS_NUMPY = np is not None
+
+
+class VectorizedAnalyticsEngine(AnalyticsEngine):
+    """AnalyticsEngine whose column and fleet summaries run on NumPy arrays."""
+
+    def __init__(self, use_numpy: bool = True):
+        """
+        Args:
+            use_numpy (bool): Set to False to force the pure Python path.
+        """
+        self.use_numpy = use_numpy and HAS_NUMPY
+
+    def _valid_mask(self, temps, volts):
+        """Array version of models.telemetry.is_valid_reading()."""
+        return (temps > -40) & (temps < 150) & (volts > 0)
+
+    def run_regression(self, x_values, y_values):
+        """Linear regression on arrays. Returns slope and intercept."""
+        if not self.use_numpy:
+            return super().run_regression(x_values, y_values)
+
+        x = np.asarray(x_values, dtype=np.float64)
+        y = np.asarray(y_values, dtype=np.float64)
+        n = len(x)
+        if n < 2:
+            return 0, 0
+
+        sum_x = x.sum()
+        sum_y = y.sum()
+        denominator = n * np.dot(x, x) - sum_x ** 2
+        if denominator == 0:
+            return 0, 0
+
+        slope = (n * np.dot(x, y) - sum_x * sum_y) / denominator
+        intercept = (sum_y - slope * sum_x) / n
+        return float(slope), float(intercept)
+
+    def voltage_fade(self, voltages, timestamps_us):
+        if not self.use_numpy:
+            return super().voltage_fade(voltages, timestamps_us)
+        if len(voltages) < 2:
+            return 0
+        stamps = np.asarray(timestamps_us, dtype=np.int64)
+        days = (stamps - stamps[0]) / MICROS_PER_DAY
+        return abs(self.run_regression(days, voltages)[0])
+
+    def summarize_columns(self, temperatures, voltages, timestamps_us):
+        if not self.use_numpy:
+            return super().summarize_columns(temperatures, voltages, timestamps_us)
+
+        temps = np.asarray(temperatures, dtype=np.float64)
+        volts = np.asarray(voltages, dtype=np.float64)
+        stamps = np.asarray(timestamps_us, dtype=np.int64)
+        mask = self._valid_mask(temps, volts)
+        if not mask.any():
+            return 0, 0, 100
+
+        avg_temp = float(temps[mask].mean())
+        fade = self.voltage_fade(volts[mask], stamps[mask])
+        return avg_temp, fade, self.remaining_life(avg_temp)
+
+    def summarize_fleet(self, battery_ids, temperatures, voltages, timestamps_us):
+        """
+        Summarize every battery in one vectorized pass: the regression sums
+        of all batteries are computed together with np.add.reduceat over
+        the battery groups. Same contract as AnalyticsEngine.summarize_fleet.
+        """
+        if not self.use_numpy:
+            return super().summarize_fleet(battery_ids, temperatures, voltages, timestamps_us)
+
+        ids = np.asarray(battery_ids)
+        temps = np.asarray(temperatures, dtype=np.float64)
+        volts = np.asarray(voltages, dtype=np.float64)
+        stamps = np.asarray(timestamps_us, dtype=np.int64)
+        if len(ids) == 0:
+            return {}
+
+        # Batteries whose readings are all invalid still get a result
+        results = {int(b): (0, 0, 100) for b in ids[_group_starts(ids)]}
+
+        mask = self._valid_mask(temps, volts)
+        ids, temps, volts, stamps = ids[mask], temps[mask], volts[mask], stamps[mask]
+        if len(ids) == 0:
+            return results
+
+        starts = _group_starts(ids)
+        counts = np.diff(np.append(starts, len(ids)))
+
+        # x is each reading's time in days since its battery's first
+        # reading, as in voltage_fade()
+        x = (stamps - np.repeat(stamps[starts], counts)) / MICROS_PER_DAY
+
+        n = counts.astype(np.float64)
+        sum_t = np.add.reduceat(temps, starts)
+        sum_x = np.add.reduceat(x, starts)
+        sum_y = np.add.reduceat(volts, starts)
+        sum_xy = np.add.reduceat(x * volts, starts)
+        sum_x2 = np.add.reduceat(x * x, starts)
+
+        avg_temp = sum_t / n
+        denominator = n * sum_x2 - sum_x ** 2
+        fit = (counts >= 2) & (denominator != 0)
+        slope = np.zeros(len(starts))
+        slope[fit] = (n[fit] * sum_xy[fit] - sum_x[fit] * sum_y[fit]) / denominator[fit]
+        life = np.maximum(0, 100 - np.maximum(0, avg_temp - 25))
+
+        for battery_id, t, f, l in zip(ids[starts].tolist(), avg_temp.tolist(),
+                                       np.abs(slope).tolist(), life.tolist()):
+            results[battery_id] = (t, f, l)
+        return results
+
+
+def _group_starts(ids):
+    """Indices where a new run of equal ids begins."""
+    return np.concatenate(([0], np.flatnonzero(ids[1:] != ids[:-1]) + 1))
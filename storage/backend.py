@@ -0,0 +1,239 @@
+"""
+Common interface for the storage backends used by database_manager.
+
+Backends work with plain row dictionaries (the same shape as the JSON
+files), never with model objects. Converting rows to objects and back is
+database_manager's job.
+"""
+import hashlib
+import os
+
+from storage.locking import LOCK_FILE, data_dir_lock
+
+
+# Table name -> primary key column
+TABLES = {
+    "users": "user_id",
+    "trucks": "truck_id",
+    "batteries": "battery_id",
+    "telemetry": "record_id",
+}
+
+BACKENDS = ("json", "sqlite")
+
+# Parents are written before children and deleted after them
+WRITE_ORDER = ("users", "trucks", "batteries", "telemetry")
+
+
+class StorageBackend:
+    """
+    Base class for storage backends.
+    Every write method works on individual rows, so callers only pay for
+    the rows they actually changed.
+
+    Writes hold self.lock, an exclusive lock on the data directory shared
+    with other processes (see storage.locking); reads take no lock.
+
+    Every write that changes telemetry bumps telemetry_version(), a counter
+    stored with the data, and is reported to the listeners (add_listener),
+    so derived data such as rollups can follow it.
+    """
+
+    name = None
+
+    # True if read_telemetry() can fetch one truck's or battery's rows
+    # without reading all telemetry.
+    indexed_telemetry = False
+
+    def __init__(self, data_dir: str):
+        self.data_dir = data_dir
+        self.lock = data_dir_lock(data_dir)
+        self._listeners = []
+
+    # ===== Listeners =====
+
+    def add_listener(self, listener):
+        """
+        Register an object whose telemetry_written(added, removed, version)
+        is called after every telemetry write, still holding the lock:
+        added are the rows written, removed the stored rows they replaced
+        or that were deleted, version the new telemetry_version().
+        """
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        self._listeners.remove(listener)
+
+    def telemetry_version(self) -> int:
+        """Number of telemetry writes so far, stored with the data."""
+        raise NotImplementedError
+
+    def _stored_telemetry(self, record_ids) -> list:
+        """Stored rows of these record_ids, only read if a listener needs them."""
+        if not self._listeners or not record_ids:
+            return []
+        return self.read_rows_where("telemetry", "record_id", record_ids)
+
+    def _telemetry_written(self, added, removed):
+        """Tell the listeners about a telemetry write. Callers hold the lock."""
+        if not self._listeners:
+            return
+        version = self.telemetry_version()
+        for listener in self._listeners:
+            listener.telemetry_written(added, removed, version)
+
+    def read_rows(self, table: str) -> list:
+        """Return every row of a table as a list of dicts."""
+        raise NotImplementedError
+
+    def read_rows_where(self, table: str, column: str, values) -> list:
+        """Return the rows of a table whose column is one of values."""
+        values = set(values)
+        return [r for r in self.read_rows(table) if r[column] in values]
+
+    def read_telemetry(self, truck_id=None, battery_id=None, start=None, end=None) -> list:
+        """
+        Return the telemetry rows of one truck and/or battery, limited to
+        readings taken in [start, end) when those datetimes are given.
+        """
+        start = start.isoformat() if start is not None else None
+        end = end.isoformat() if end is not None else None
+        return [
+            r for r in self.read_rows("telemetry")
+            if (truck_id is None or r["truck_id"] == truck_id)
+            and (battery_id is None or r["battery_id"] == battery_id)
+            and (start is None or r["timestamp"] >= start)
+            and (end is None or r["timestamp"] < end)
+        ]
+
+    def iter_telemetry(self, start=None, end=None):
+        """
+        Yield the telemetry rows of [start, end) in the order of
+        read_telemetry(), without holding them all in memory at once.
+        """
+        yield from self.read_telemetry(start=start, end=end)
+
+    # ===== Idempotent telemetry inserts =====
+
+    def stored_telemetry_keys(self, rows) -> tuple:
+        """
+        (record_ids, (battery_id, timestamp) pairs) of stored readings
+        that the given telemetry rows would repeat. Timestamps are
+        compared as stored, i.e. as naive UTC ISO strings.
+        """
+        record_ids = {r["record_id"] for r in rows}
+        readings = {(r["battery_id"], r["timestamp"]) for r in rows if r["battery_id"] is not None}
+        found_ids = set()
+        found_readings = set()
+        for r in self.read_rows("telemetry"):
+            if r["record_id"] in record_ids:
+                found_ids.add(r["record_id"])
+            if (r["battery_id"], r["timestamp"]) in readings:
+                found_readings.add((r["battery_id"], r["timestamp"]))
+        return found_ids, found_readings
+
+    def new_telemetry(self, rows, taken_ids=()) -> list:
+        """
+        The telemetry rows that are not duplicates: neither their
+        record_id nor their battery and timestamp are stored, in
+        taken_ids or in an earlier row (see services.dedupe). Callers
+        that write the result hold self.lock from the check to the write.
+        """
+        stored_ids, stored_readings = self.stored_telemetry_keys(rows)
+        stored_ids.update(taken_ids)
+        new = []
+        for r in rows:
+            reading = (r["battery_id"], r["timestamp"])
+            if r["record_id"] in stored_ids or reading in stored_readings:
+                continue
+            stored_ids.add(r["record_id"])
+            if r["battery_id"] is not None:
+                stored_readings.add(reading)
+            new.append(r)
+        return new
+
+    def insert_telemetry(self, rows) -> list:
+        """
+        Store the telemetry rows that are not duplicates (new_telemetry())
+        with one write, checking and writing under the lock so concurrent
+        importers cannot both store a reading. Returns the rows stored.
+        """
+        with self.lock:
+            new = self.new_telemetry(rows)
+            self.upsert("telemetry", new)
+        return new
+
+    # ===== Writes =====
+
+    def upsert(self, table: str, rows: list):
+        """Insert the given rows, replacing existing rows with the same id."""
+        raise NotImplementedError
+
+    def delete(self, table: str, ids: list):
+        """Delete the rows with the given ids. Unknown ids are ignored."""
+        raise NotImplementedError
+
+    def replace_all(self, table: str, rows: list):
+        """
+        Make the table contain exactly the given rows.
+        Implemented as upserts plus deletes of the ids that disappeared.
+        (Both backends override it, so telemetry counts as one write.)
+        """
+        key = TABLES[table]
+        new_ids = {r[key] for r in rows}
+        with self.lock:
+            stale = [r[key] for r in self.read_rows(table) if r[key] not in new_ids]
+            self.upsert(table, rows)
+            if stale:
+                self.delete(table, stale)
+
+    def apply(self, upserts: dict, deletes: dict):
+        """
+        Apply a batch of changes: upserts maps table -> rows and deletes
+        maps table -> ids. Backends that can, apply it atomically.
+        """
+        with self.lock:
+            for table in WRITE_ORDER:
+                self.upsert(table, upserts.get(table, []))
+            for table in reversed(WRITE_ORDER):
+                self.delete(table, deletes.get(table, []))
+
+    def drop_telemetry_before(self, cutoff):
+        """Delete telemetry taken before cutoff (retention)."""
+        raise NotImplementedError
+
+    def data_stamp(self, ignore=()) -> str:
+        """
+        Fingerprint of the stored data (name, size and mtime of every file
+        in the data directory). It changes whenever anything is written.
+        ignore lists file names that are not part of the data.
+        """
+        entries = []
+        for root, _, files in os.walk(self.data_dir):
+            for name in files:
+                if name in ignore or name == LOCK_FILE or name.endswith(".tmp"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append(f"{os.path.relpath(path, self.data_dir)}:{st.st_size}:{st.st_mtime_ns}")
+        return hashlib.sha256("\n".join(sorted(entries)).encode()).hexdigest()
+
+    def compact(self):
+        """Reclaim space used by deleted or overwritten rows."""
+
+    def close(self):
+        """Release any open files or connections."""
+
+
+def open_backend(name: str, data_dir: str) -> StorageBackend:
+    """Create the backend called `name` storing its files in data_dir."""
+    if name == "json":
+        from storage.json_backend import JsonBackend
+        return JsonBackend(data_dir)
+    if name == "sqlite":
+        from storage.sqlite_backend import SqliteBackend
+        return SqliteBackend(data_dir)
+    raise ValueError(f"Unknown storage backend '{name}'. Must be one of: {', '.join(BACKENDS)}")
@@ -0,0 +1,217 @@
+"""
+Columnar, memory-mapped telemetry store.
+
+Layout of a store file (all integers/floats in native byte order):
+
+    header   magic (8 bytes), row count (int64), index length (int64)
+    columns  one array per column, `row count` entries of 8 bytes each
+    index    JSON with the row ranges per battery and per truck, and the
+             version of the telemetry the file was written from
+
+Rows are sorted by (battery_id, timestamp), so every battery occupies one
+contiguous range of rows. The truck_order column holds row numbers sorted
+by (truck_id, timestamp); each truck occupies a contiguous range of it.
+"""
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+from datetime import datetime, timedelta
+
+from models.telemetry import EPOCH, TelemetryRecord, to_micros
+
+
+MAGIC = b"FLTCOL1\0"
+HEADER = struct.Struct("=8sqq")
+
+# Column name -> array typecode. Timestamps are microseconds since the epoch.
+COLUMNS = (
+    ("record_id", "q"),
+    ("truck_id", "q"),
+    ("battery_id", "q"),
+    ("timestamp_us", "q"),
+    ("temperature_c", "d"),
+    ("voltage_v", "d"),
+    ("current_a", "d"),
+    ("truck_order", "q"),
+)
+
+# Stored in place of a missing truck or battery id
+NO_ID = -1
+
+def from_micros(us: int) -> datetime:
+    return EPOCH + timedelta(microseconds=us)
+
+
+class ColumnarTelemetry:
+    """
+    Read-only view over a columnar telemetry file.
+    Columns are exposed as memoryviews straight over the mmap, so scanning
+    them never creates TelemetryRecord objects.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+
+        magic, rows, index_len = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a columnar telemetry file.")
+
+        self._rows = rows
+        self._columns = {}
+        offset = HEADER.size
+        for name, code in COLUMNS:
+            self._columns[name] = self._view[offset:offset + rows * 8].cast(code)
+            offset += rows * 8
+
+        index = json.loads(bytes(self._view[offset:offset + index_len]))
+        if index["byteorder"] != sys.byteorder:
+            self.close()
+            raise ValueError(f"{path} was written on a machine with different byte order.")
+
+        self._battery_ranges = {int(k): v for k, v in index["battery"].items()}
+        self._truck_ranges = {int(k): v for k, v in index["truck"].items()}
+        self.version = index.get("version")
+
+    # ===== Writing =====
+
+    @staticmethod
+    def write(path: str, rows, version=None):
+        """
+        Write telemetry rows (dicts in the storage row format) to a new
+        columnar file. The file is written next to `path` and swapped in.
+        version (any JSON value) identifies the telemetry the rows were
+        read at; it is kept as the `version` attribute of the store.
+        """
+        rows = sorted(
+            ((r["battery_id"] if r["battery_id"] is not None else NO_ID,
+              to_micros(datetime.fromisoformat(r["timestamp"])), r) for r in rows),
+            key=lambda item: (item[0], item[1])
+        )
+
+        cols = {name: array(code) for name, code in COLUMNS}
+        battery_ranges = {}
+        for i, (battery_id, ts, r) in enumerate(rows):
+            cols["record_id"].append(r["record_id"])
+            cols["truck_id"].append(r["truck_id"] if r["truck_id"] is not None else NO_ID)
+            cols["battery_id"].append(battery_id)
+            cols["timestamp_us"].append(ts)
+            cols["temperature_c"].append(r["temperature_c"])
+            cols["voltage_v"].append(r["voltage_v"])
+            cols["current_a"].append(r["current_a"])
+
+            span = battery_ranges.setdefault(battery_id, [i, i])
+            span[1] = i + 1
+
+        truck_ids = cols["truck_id"]
+        timestamps = cols["timestamp_us"]
+        order = sorted(range(len(rows)), key=lambda i: (truck_ids[i], timestamps[i]))
+        cols["truck_order"].extend(order)
+
+        truck_ranges = {}
+        for pos, i in enumerate(order):
+            span = truck_ranges.setdefault(truck_ids[i], [pos, pos])
+            span[1] = pos + 1
+
+        index = json.dumps({
+            "byteorder": sys.byteorder,
+            "battery": battery_ranges,
+            "truck": truck_ranges,
+            "version": version,
+        }).encode()
+
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, len(rows), len(index)))
+            for name, _ in COLUMNS:
+                cols[name].tofile(f)
+            f.write(index)
+        os.replace(tmp_path, path)
+
+    # ===== Column access =====
+
+    def __len__(self):
+        return self._rows
+
+    def column(self, name: str) -> memoryview:
+        """Return a whole column, e.g. column("voltage_v")."""
+        return self._columns[name]
+
+    def battery_ids(self) -> list:
+        return [b for b in self._battery_ranges if b != NO_ID]
+
+    def truck_ids(self) -> list:
+        return [t for t in self._truck_ranges if t != NO_ID]
+
+    def battery_range(self, battery_id: int, start=None, end=None):
+        """
+        Return (first, last + 1) of the rows of one battery, or (0, 0).
+        With datetimes start/end, only its rows taken in [start, end).
+        """
+        lo, hi = self._battery_ranges.get(battery_id, (0, 0))
+        # A battery's rows are sorted by timestamp
+        timestamps = self._columns["timestamp_us"]
+        if start is not None:
+            lo = bisect_left(timestamps, to_micros(start), lo, hi)
+        if end is not None:
+            hi = bisect_left(timestamps, to_micros(end), lo, hi)
+        return lo, hi
+
+    def battery_columns(self, battery_id: int, *names, start=None, end=None) -> tuple:
+        """Return slices of the named columns covering one battery's rows in [start, end)."""
+        lo, hi = self.battery_range(battery_id, start, end)
+        return tuple(self._columns[n][lo:hi] for n in names)
+
+    def truck_rows(self, truck_id: int) -> memoryview:
+        """Return the row numbers of one truck's readings, oldest first."""
+        start, end = self._truck_ranges.get(truck_id, (0, 0))
+        return self._columns["truck_order"][start:end]
+
+    # ===== Materializing records =====
+
+    def record(self, row: int, truck_map=None, battery_map=None) -> TelemetryRecord:
+        """
+        Build a TelemetryRecord for one row. Trucks and batteries are looked
+        up in the given id maps; the record is not added to their lists.
+        """
+        c = self._columns
+        return TelemetryRecord.from_trusted(
+            c["record_id"][row],
+            truck_map.get(c["truck_id"][row]) if truck_map is not None else None,
+            battery_map.get(c["battery_id"][row]) if battery_map is not None else None,
+            c["temperature_c"][row],
+            c["voltage_v"][row],
+            c["current_a"][row],
+            from_micros(c["timestamp_us"][row])
+        )
+
+    def battery_records(self, battery_id: int, truck_map=None, battery_map=None):
+        """Yield one battery's readings as TelemetryRecords, oldest first."""
+        start, end = self.battery_range(battery_id)
+        for row in range(start, end):
+            yield self.record(row, truck_map, battery_map)
+
+    # ===== Cleanup =====
+
+    def close(self):
+        for col in getattr(self, "_columns", {}).values():
+            col.release()
+        self._columns = {}
+        if getattr(self, "_view", None) is not None:
+            self._view.release()
+            self._view = None
+        self._mmap.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
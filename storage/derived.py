@@ -0,0 +1,296 @@
+"""
+Data derived from the telemetry (rollups, quantile sketches), kept in
+step with the stored telemetry across writes and processes.
+
+A DerivedView registers itself as a listener on a storage backend. Every
+telemetry write, by any process that registered the view, appends the
+changed rows to the view's log (<name>.log.jsonl) tagged with the
+backend's new telemetry_version(), and updates the data in memory if it
+is loaded. Loading reads the snapshot (<name>.json) and replays the log
+entries written after it; they must lead to the current version one by
+one. A gap (a write by a process without the view, a failed append,
+data of the other backend) means the data is rebuilt with one scan of
+the telemetry. Loads and log appends hold the data directory lock, and a
+log that grew long is folded into a new snapshot by the writer.
+
+Data with many independent parts (e.g. the sketches of each battery)
+can keep them as snapshot entries, written with a byte range index in
+<name>.index.json like the grouped tables of the JSON backend, so
+get_part() reads only the entries a query needs.
+
+A write made while the loaded data is behind (another process wrote in
+between) first replays the log up to it, so watchers (see watch()) see
+the effect of every write made through the backend, as long as the log
+has no gap.
+"""
+import json
+import os
+import tempfile
+
+
+# Log size in bytes past which the writer folds it into the snapshot
+COMPACT_LOG_BYTES = 4 << 20
+
+
+class DerivedView:
+    """
+    One kind of derived data, persisted next to the telemetry.
+
+    The data class provides from_rows(rows), rows_added(rows),
+    rows_removed(rows), to_dict() and from_dict(data); rows are telemetry
+    rows in the storage format. rows_added() may return a result, which
+    is passed to the watchers. Data that cannot undo a row in
+    rows_removed() sets its `stale` attribute instead (and keeps it in
+    to_dict()), and is rebuilt on the next get(); if it also provides
+    refresh(backend), that is called instead and should bring the stale
+    parts up to date from the backend.
+
+    Data classes may set ENTRIES = (name, column): to_dict()[name] is a
+    list of [key, value] entries, each derived from the rows whose
+    `column` equals its key only. Those are saved as separate entries of
+    the snapshot (see get_part()).
+    """
+
+    def __init__(self, backend, filename: str, data_class):
+        """
+        Args:
+            backend (StorageBackend): The telemetry it is derived from.
+            filename (str): Snapshot file in the data directory, e.g. "rollups.json".
+            data_class (type): Class of the derived data (see above).
+        """
+        self.backend = backend
+        self.path = os.path.join(backend.data_dir, filename)
+        self.log_path = os.path.splitext(self.path)[0] + ".log.jsonl"
+        self.index_path = os.path.splitext(self.path)[0] + ".index.json"
+        self._data_class = data_class
+        self._data = None
+        self._version = None
+        self._watchers = []
+        backend.add_listener(self)
+
+    @property
+    def files(self) -> tuple:
+        """Names of the view's files in the data directory."""
+        return tuple(os.path.basename(p) for p in (self.path, self.log_path, self.index_path))
+
+    def get(self):
+        """The derived data as of the stored telemetry now."""
+        with self.backend.lock:
+            version = self.backend.telemetry_version()
+            if self._data is None or self._version != version:
+                self._load(version)
+            if getattr(self._data, "stale", False):
+                if hasattr(self._data, "refresh"):
+                    self._data.refresh(self.backend)
+                    self._save()
+                else:
+                    self._rebuild(version)
+            return self._data
+
+    def get_part(self, keys):
+        """
+        The derived data holding only the ENTRIES with these keys (e.g.
+        the sketches of some batteries), read through the snapshot index
+        without parsing the other entries. Query it only for those keys.
+        Falls back to get() if the data is already loaded, or the index
+        is out of date, or the entries cannot be brought up to date from
+        the log.
+        """
+        keys = set(keys)
+        with self.backend.lock:
+            if self._data is None:
+                version = self.backend.telemetry_version()
+                data, at = self._read_entries(keys)
+                if (data is not None and self._replay(data, at, version, keys)
+                        and not getattr(data, "stale", False)):
+                    return data
+            return self.get()
+
+    def watch(self, callback, build: bool = True) -> bool:
+        """
+        Call callback(result) with what rows_added() returned for every
+        telemetry write made through this backend from now on. Loads the
+        data, so the first write is already applied to it.
+
+        With build=False nothing is watched if there is no snapshot yet,
+        since loading would mean a scan of all telemetry. Returns whether
+        the callback was registered.
+        """
+        if not build and not os.path.exists(self.path):
+            return False
+        self.get()
+        self._watchers.append(callback)
+        return True
+
+    def unwatch(self, callback):
+        self._watchers.remove(callback)
+
+    def rebuild(self):
+        """Recompute the data from the telemetry and save it."""
+        with self.backend.lock:
+            self._rebuild(self.backend.telemetry_version())
+            return self._data
+
+    # ===== Loading =====
+
+    def _read_snapshot(self, data_class):
+        try:
+            with open(self.path, "r") as f:
+                saved = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None, None
+        if saved.get("backend") != self.backend.name:
+            return None, None
+        if "entries" in saved:
+            saved["data"][data_class.ENTRIES[0]] = saved["entries"]
+        try:
+            return data_class.from_dict(saved["data"]), saved["version"]
+        except (KeyError, TypeError, ValueError):
+            # Saved by an older version of the data class
+            return None, None
+
+    def _read_entries(self, keys):
+        """
+        (data, version) of the snapshot with only the entries of these
+        keys, or (None, None) if the index is missing or out of date.
+        """
+        name, _ = self._data_class.ENTRIES
+        try:
+            # The open file is the one checked against the index, even if
+            # a writer replaces it meanwhile
+            with open(self.path, "rb") as f:
+                stat = os.fstat(f.fileno())
+                with open(self.index_path, "r") as index_file:
+                    index = json.load(index_file)
+                if (index["size"], index["mtime_ns"]) != (stat.st_size, stat.st_mtime_ns):
+                    return None, None
+                saved = json.loads(f.read(index["head"]) + b"}")
+                entries = []
+                for key in keys:
+                    byte_range = index["ranges"].get(json.dumps(key))
+                    if byte_range is not None:
+                        f.seek(byte_range[0])
+                        entries.append(json.loads(f.read(byte_range[1] - byte_range[0])))
+            if saved.get("backend") != self.backend.name:
+                return None, None
+            saved["data"][name] = entries
+            return self._data_class.from_dict(saved["data"]), saved["version"]
+        except (OSError, ValueError, KeyError, TypeError):
+            return None, None
+
+    def _load(self, version):
+        data, at = self._read_snapshot(self._data_class)
+        if data is None or not self._replay(data, at, version):
+            self._rebuild(version)
+        else:
+            self._data, self._version = data, version
+
+    def _replay(self, data, at, version, keys=None) -> bool:
+        """
+        Apply the logged writes after version `at` to data, only the rows
+        of the entries with these keys if given. Returns True if they
+        lead to version; otherwise data is left part-way.
+        """
+        if at != version and os.path.exists(self.log_path):
+            with open(self.log_path, "r") as f:
+                for line in f:
+                    if not line.endswith("\n"):
+                        break
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        break
+                    if entry["version"] <= at:
+                        continue
+                    if entry["version"] != at + 1 or entry["backend"] != self.backend.name:
+                        break
+                    removed, added = entry["removed"], entry["added"]
+                    if keys is not None:
+                        column = self._data_class.ENTRIES[1]
+                        removed = [r for r in removed if r[column] in keys]
+                        added = [r for r in added if r[column] in keys]
+                    data.rows_removed(removed)
+                    data.rows_added(added)
+                    at = entry["version"]
+                    if at == version:
+                        break
+        return at == version
+
+    def _rebuild(self, version):
+        self._data = self._data_class.from_rows(self.backend.read_rows("telemetry"))
+        self._version = version
+        self._save()
+
+    def _save(self):
+        """Write the snapshot and empty the log. Callers hold the lock."""
+        data = self._data.to_dict()
+        entries = None
+        if hasattr(self._data_class, "ENTRIES"):
+            entries = data.pop(self._data_class.ENTRIES[0])
+        head = json.dumps({"backend": self.backend.name, "version": self._version, "data": data})
+
+        ranges = {}
+        if entries is not None:
+            # {...head..., "entries": [[key, value], ...]}; json.dumps
+            # output is ASCII, so characters are bytes
+            parts = []
+            pos = len(head) - 1 + len(', "entries": [')
+            for entry in entries:
+                text = json.dumps(entry)
+                ranges[json.dumps(entry[0])] = [pos, pos + len(text)]
+                parts.append(text)
+                pos += len(text) + 2
+            text = head[:-1] + ', "entries": [' + ", ".join(parts) + "]}"
+        else:
+            text = head
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.backend.data_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(text)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        if os.path.exists(self.log_path):
+            os.remove(self.log_path)
+
+        if entries is not None:
+            stat = os.stat(self.path)
+            index = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+                     "head": len(head) - 1, "ranges": ranges}
+            with open(self.index_path + ".tmp", "w") as f:
+                json.dump(index, f)
+            os.replace(self.index_path + ".tmp", self.index_path)
+
+    # ===== Backend listener =====
+
+    def telemetry_written(self, added, removed, version):
+        """Called by the backend after each telemetry write, holding the lock."""
+        if self._data is not None and self._version != version - 1:
+            # Catch up with the writes of other processes first
+            if not self._replay(self._data, self._version, version - 1):
+                self._data = None
+        if self._data is not None:
+            self._data.rows_removed(removed)
+            result = self._data.rows_added(added)
+            self._version = version
+            for callback in self._watchers:
+                callback(result)
+
+        # Without a snapshot the next load rebuilds anyway
+        if not os.path.exists(self.path):
+            return
+        entry = {"backend": self.backend.name, "version": version,
+                 "added": added, "removed": removed}
+        try:
+            with open(self.log_path, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+            if os.path.getsize(self.log_path) > COMPACT_LOG_BYTES:
+                if self._data is None:
+                    self._load(version)
+                self._save()
+        except OSError:
+            # The version is missing from the log: the next load rebuilds
+            self._data = None
@@ -0,0 +1,259 @@
+import json
+import os
+from storage.backend import StorageBackend, TABLES, WRITE_ORDER
+from storage.partitions import PartitionedTelemetry
+
+
+# Directory of day partitions holding the telemetry
+TELEMETRY_DIR = "telemetry"
+
+# Telemetry files used before partitioning; migrated on first open
+LEGACY_TELEMETRY = "telemetry.json"
+LEGACY_TELEMETRY_LOG = "telemetry.log.jsonl"
+
+# Tables whose file is written grouped by a column, with the byte range
+# of each group in <table>.index.json, so read_rows_where() on that column
+# parses only the matching rows (e.g. `fleet.py batteries list --truck`)
+GROUPED_BY = {"trucks": "truck_id", "batteries": "truck_id"}
+
+
+class JsonBackend(StorageBackend):
+    """
+    Stores each table in data/<table>.json, except telemetry, which is
+    kept in time partitions under data/telemetry/ (see storage.partitions).
+    Set FLEET_PARTITION_BY_TRUCK=1 before the first run to also split
+    each day by truck.
+
+    Table files are rewritten while holding the data directory lock, after
+    re-reading them, so concurrent writers never lose each other's rows.
+    The trucks and batteries files are written grouped by truck, with a
+    byte range index (see GROUPED_BY) that is only used while the file is
+    the one it was written for.
+    """
+
+    name = "json"
+
+    def __init__(self, data_dir):
+        super().__init__(data_dir)
+        self.telemetry = PartitionedTelemetry(
+            self._path(TELEMETRY_DIR),
+            by_truck=os.environ.get("FLEET_PARTITION_BY_TRUCK") == "1"
+        )
+        with self.lock:
+            self._migrate_legacy_telemetry()
+
+    # ===== Raw JSON helpers =====
+
+    def _path(self, filename):
+        return os.path.join(self.data_dir, filename)
+
+    def load_json(self, filename):
+        path = self._path(filename)
+        if not os.path.exists(path):
+            with open(path, "w") as f:
+                f.write("[]")
+        with open(path, "r") as f:
+            return json.load(f)
+
+    def save_json(self, filename, data):
+        """
+        Write data to a temp file first and swap it in, so a crash mid-write
+        never leaves a half written JSON file behind.
+        """
+        path = self._path(filename)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f, indent=4)
+        os.replace(tmp_path, path)
+
+    def _save_grouped(self, table, rows):
+        """
+        Write a GROUPED_BY table with the same text json.dumps(rows,
+        indent=4) would give for the grouped rows, then its group index.
+        """
+        groups = {}
+        for r in rows:
+            groups.setdefault(json.dumps(r[GROUPED_BY[table]]), []).append(r)
+
+        parts = []
+        ranges = {}
+        pos = 2     # after "[\n"; rows are ASCII, so characters are bytes
+        for value, group in groups.items():
+            start = pos
+            for r in group:
+                text = "    " + json.dumps(r, indent=4).replace("\n", "\n    ")
+                parts.append(text)
+                pos += len(text) + 2
+            ranges[value] = [start, pos - 2]
+
+        path = self._path(f"{table}.json")
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write("[\n" + ",\n".join(parts) + "\n]" if parts else "[]")
+        os.replace(tmp_path, path)
+
+        stat = os.stat(path)
+        index = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "ranges": ranges}
+        index_path = self._path(f"{table}.index.json")
+        with open(index_path + ".tmp", "w") as f:
+            json.dump(index, f)
+        os.replace(index_path + ".tmp", index_path)
+
+    def _read_groups(self, table, values):
+        """
+        Rows of a GROUPED_BY table whose group value is in values, read
+        through the index, or None if the index is missing or out of date.
+        """
+        try:
+            # The open file is the one checked against the index, even if
+            # a writer replaces it meanwhile
+            with open(self._path(f"{table}.json"), "rb") as f:
+                stat = os.fstat(f.fileno())
+                with open(self._path(f"{table}.index.json"), "r") as index_file:
+                    index = json.load(index_file)
+                if (index["size"], index["mtime_ns"]) != (stat.st_size, stat.st_mtime_ns):
+                    return None
+                rows = []
+                for value in set(values):
+                    byte_range = index["ranges"].get(json.dumps(value))
+                    if byte_range is not None:
+                        f.seek(byte_range[0])
+                        rows.extend(json.loads(b"[" + f.read(byte_range[1] - byte_range[0]) + b"]"))
+                return rows
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _save_table(self, table, rows):
+        if table in GROUPED_BY:
+            self._save_grouped(table, rows)
+        else:
+            self.save_json(f"{table}.json", rows)
+
+    def _migrate_legacy_telemetry(self):
+        """Move telemetry.json (+ its log) into partitions, then remove them."""
+        snapshot = self._path(LEGACY_TELEMETRY)
+        if not os.path.exists(snapshot):
+            return
+
+        rows = {r["record_id"]: r for r in self.load_json(LEGACY_TELEMETRY)}
+
+        log_path = self._path(LEGACY_TELEMETRY_LOG)
+        if os.path.exists(log_path):
+            with open(log_path, "r") as f:
+                for line in f:
+                    if not line.endswith("\n"):
+                        break
+                    op = json.loads(line)
+                    if op.pop("op", "put") == "del":
+                        rows.pop(op["record_id"], None)
+                    else:
+                        rows[op["record_id"]] = op
+
+        self.telemetry.write(list(rows.values()))
+
+        os.remove(snapshot)
+        if os.path.exists(log_path):
+            os.remove(log_path)
+
+    # ===== StorageBackend interface =====
+
+    def read_rows(self, table):
+        if table == "telemetry":
+            return self.telemetry.read()
+        return self.load_json(f"{table}.json")
+
+    def read_rows_where(self, table, column, values):
+        if table == "telemetry" and column == "record_id":
+            return self.telemetry.read_ids(values)
+        if GROUPED_BY.get(table) == column:
+            rows = self._read_groups(table, values)
+            if rows is not None:
+                return rows
+        return super().read_rows_where(table, column, values)
+
+    def read_telemetry(self, truck_id=None, battery_id=None, start=None, end=None):
+        return self.telemetry.read(start, end, truck_id, battery_id)
+
+    def iter_telemetry(self, start=None, end=None):
+        return self.telemetry.iter(start, end)
+
+    def stored_telemetry_keys(self, rows):
+        # Through the partitions' id ranges and key files, without parsing
+        # the partitions (see storage.partitions)
+        readings = {(r["battery_id"], r["timestamp"]) for r in rows if r["battery_id"] is not None}
+        return self.telemetry.find_keys({r["record_id"] for r in rows}, readings)
+
+    def telemetry_version(self):
+        self.telemetry.refresh()
+        return self.telemetry.version
+
+    def _write_telemetry(self, rows, ids):
+        """One partition write, reported to the listeners. Callers hold the lock."""
+        removed = self._stored_telemetry([r["record_id"] for r in rows] + list(ids))
+        self.telemetry.write(rows, ids)
+        self._telemetry_written(rows, removed)
+
+    def _rewrite(self, table, rows, ids):
+        """Upsert rows and delete ids in a table's file with one rewrite."""
+        key = TABLES[table]
+        current = {r[key]: r for r in self.load_json(f"{table}.json")}
+        for r in rows:
+            current[r[key]] = r
+        for i in ids:
+            current.pop(i, None)
+        self._save_table(table, list(current.values()))
+
+    def upsert(self, table, rows):
+        if not rows:
+            return
+        with self.lock:
+            if table == "telemetry":
+                self._write_telemetry(rows, [])
+            else:
+                self._rewrite(table, rows, [])
+
+    def delete(self, table, ids):
+        if not ids:
+            return
+        with self.lock:
+            if table == "telemetry":
+                self._write_telemetry([], ids)
+            else:
+                self._rewrite(table, [], ids)
+
+    def apply(self, upserts, deletes):
+        # Each touched file is rewritten once; telemetry is one append per
+        # touched partition.
+        with self.lock:
+            for table in WRITE_ORDER:
+                rows = upserts.get(table, [])
+                ids = deletes.get(table, [])
+                if not rows and not ids:
+                    continue
+                if table == "telemetry":
+                    self._write_telemetry(rows, ids)
+                else:
+                    self._rewrite(table, rows, ids)
+
+    def replace_all(self, table, rows):
+        with self.lock:
+            if table == "telemetry":
+                removed = self.telemetry.read() if self._listeners else []
+                self.telemetry.replace_all(rows)
+                self._telemetry_written(rows, removed)
+            else:
+                self._save_table(table, rows)
+
+    def drop_telemetry_before(self, cutoff):
+        with self.lock:
+            # Whole days before the cutoff's day are dropped
+            day = cutoff.replace(hour=0, minute=0, second=0, microsecond=0)
+            removed = self.telemetry.read(end=day) if self._listeners else []
+            dropped = self.telemetry.drop_before(cutoff)
+            if dropped:
+                self._telemetry_written([], removed)
+            return dropped
+
+    def compact(self):
+        with self.lock:
+            self.telemetry.compact()
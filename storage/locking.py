@@ -0,0 +1,76 @@
+"""
+Inter-process write lock for a data directory.
+
+Every backend write runs while holding an exclusive lock on data/.lock,
+so several processes (the menu, an import, ingest workers) never
+interleave their read-modify-write cycles. Reads take no lock: every file
+is replaced atomically or appended to, and SQLite runs in WAL mode, so
+readers always see a consistent snapshot.
+"""
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+LOCK_FILE = ".lock"
+
+
+class FileLock:
+    """
+    Exclusive lock on a file, shared by the threads of one process.
+    Re-entrant: nested `with lock:` blocks in the same thread are fine.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._file = None
+
+    def acquire(self):
+        self._thread_lock.acquire()
+        if self._depth == 0:
+            try:
+                self._file = open(self.path, "a+")
+                if fcntl is not None:
+                    fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+                else:
+                    self._file.seek(0)
+                    msvcrt.locking(self._file.fileno(), msvcrt.LK_LOCK, 1)
+            except BaseException:
+                if self._file is not None:
+                    self._file.close()
+                    self._file = None
+                self._thread_lock.release()
+                raise
+        self._depth += 1
+
+    def release(self):
+        self._depth -= 1
+        if self._depth == 0:
+            if fcntl is not None:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            else:
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+            self._file.close()
+            self._file = None
+        self._thread_lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+
+def data_dir_lock(data_dir: str) -> FileLock:
+    """The write lock of a data directory."""
+    os.makedirs(data_dir, exist_ok=True)
+    return FileLock(os.path.join(data_dir, LOCK_FILE))
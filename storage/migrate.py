@@ -0,0 +1,50 @@
+"""
+One-shot migration between storage backends.
+
+    python -m storage.migrate --from json --to sqlite
+    python -m storage.migrate --from sqlite --to json --data-dir data
+"""
+import argparse
+
+from storage.backend import BACKENDS, TABLES, open_backend
+
+
+def migrate(source_name: str, target_name: str, data_dir: str) -> dict:
+    """
+    Copy every table from one backend into another.
+    The target ends up with exactly the rows of the source.
+    Returns the number of rows copied per table.
+    """
+    if source_name == target_name:
+        raise ValueError("Source and target backend must be different.")
+
+    source = open_backend(source_name, data_dir)
+    target = open_backend(target_name, data_dir)
+    counts = {}
+
+    try:
+        for table in TABLES:
+            rows = source.read_rows(table)
+            target.replace_all(table, rows)
+            counts[table] = len(rows)
+    finally:
+        source.close()
+        target.close()
+
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Copy all fleet data between storage backends.")
+    parser.add_argument("--from", dest="source", choices=BACKENDS, required=True)
+    parser.add_argument("--to", dest="target", choices=BACKENDS, required=True)
+    parser.add_argument("--data-dir", default="data")
+    args = parser.parse_args()
+
+    counts = migrate(args.source, args.target, args.data_dir)
+    for table, count in counts.items():
+        print(f"{table}: {count} rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,513 @@
+"""
+Time-partitioned telemetry storage used by the JSON backend.
+
+Telemetry lives in data/telemetry/, one append-only JSONL log per day
+(optionally per day and truck). Each line is a "put" of a full row or a
+"del" of a record_id. manifest.json lists every partition with the time
+range it covers, so readers only open the partitions that overlap the
+requested window, and old data is dropped by deleting whole files.
+
+The manifest also records the range of record_ids put in each partition,
+so an update or delete only appends a "del" to the partitions that may
+hold the id, without knowing where the row was written, and a version
+bumped by every write (see StorageBackend.telemetry_version).
+
+Next to each partition log is a key file (<partition>.keys) with one
+short line per operation: "<battery_id> <timestamp> <record_id>" for a
+put, "del <record_id>" for a delete, and "@<log size>" after each
+append. Duplicate checks (find_keys) search its bytes for the few keys
+they need instead of parsing the partition, and trust it only while the
+log still has the size it records; otherwise they read the partition and
+the next write rebuilds the key file.
+
+Reads never modify files. Partitions whose logs are mostly dead
+operations are rewritten by the next write (which holds the data lock),
+or by compact().
+"""
+import json
+import os
+import tempfile
+from datetime import date, datetime, timedelta
+
+
+MANIFEST = "manifest.json"
+
+# A partition read with at least this many operations and more dead
+# operations than live rows is rewritten by the next write.
+COMPACT_MIN_OPS = 1000
+
+
+def _iso(value):
+    """Datetimes are compared as ISO strings, like they are stored."""
+    return value.isoformat() if value is not None else None
+
+
+def _key_line(entry) -> str:
+    """The key file line of one log operation."""
+    if entry.get("op") == "del":
+        return f"del {entry['record_id']}\n"
+    return f"{entry['battery_id']} {entry['timestamp']} {entry['record_id']}\n"
+
+
+def _last_op(keys: bytes, record_id):
+    """(line start, end of the line's key part) of the last operation on record_id, or None."""
+    end = keys.rfind(b" %d\n" % record_id)
+    if end < 0:
+        return None
+    return keys.rfind(b"\n", 0, end) + 1, end
+
+
+def _has_id(keys: bytes, record_id) -> bool:
+    op = _last_op(keys, record_id)
+    return op is not None and keys[op[0]:op[1]] != b"del"
+
+
+def _covered_size(keys: bytes):
+    """The log size recorded by the last line of a key file (or its tail), or None."""
+    if not keys.endswith(b"\n"):
+        return None
+    last = keys[keys.rfind(b"\n", 0, len(keys) - 1) + 1:-1]
+    return int(last[1:]) if last.startswith(b"@") else None
+
+
+def _line_starts(keys: bytes, prefix: bytes):
+    """Yield the start of every line of keys that begins with prefix."""
+    if keys.startswith(prefix):
+        yield 0
+    pos = keys.find(b"\n" + prefix)
+    while pos >= 0:
+        yield pos + 1
+        pos = keys.find(b"\n" + prefix, pos + 1)
+
+
+def _has_reading(keys: bytes, battery_id, timestamp) -> bool:
+    """True if a live put of this battery and timestamp is in the key file."""
+    prefix = f"{battery_id} {timestamp} ".encode()
+    for start in _line_starts(keys, prefix):
+        id_start = start + len(prefix)
+        record_id = int(keys[id_start:keys.index(b"\n", id_start)])
+        # Live if no later operation touched the record
+        if _last_op(keys, record_id)[0] == start:
+            return True
+    return False
+
+
+class PartitionedTelemetry:
+    """
+    Telemetry rows split into day (or day + truck) partitions.
+    Rows are plain dicts in the storage row format.
+    """
+
+    def __init__(self, root: str, by_truck: bool = False):
+        """
+        Args:
+            root (str): Directory holding the partitions and the manifest.
+            by_truck (bool): Also split each day by truck. Only used when the
+                directory is new; existing data keeps its layout.
+        """
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+        self._manifest = self._read_json(MANIFEST) or {
+            "by_truck": by_truck,
+            "partitions": {}
+        }
+        # Partitions that reads found mostly dead, compacted by the next write
+        self._needs_compaction = set()
+        # Partitions whose key file was missing or behind, rebuilt by the next write
+        self._needs_keys = set()
+
+    # ===== Manifest =====
+
+    def _path(self, filename):
+        return os.path.join(self.root, filename)
+
+    def _read_json(self, filename):
+        path = self._path(filename)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r") as f:
+            return json.load(f)
+
+    def refresh(self):
+        """
+        Re-read the manifest from disk, since other processes may have
+        added or dropped partitions. Writers call it under the data lock.
+        """
+        manifest = self._read_json(MANIFEST)
+        if manifest is not None:
+            self._manifest = manifest
+
+    def _replace_file(self, filename, text):
+        """
+        Write text to a uniquely named temp file and swap it in, so readers
+        see the old or the new file, never a partial one.
+        """
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(text)
+            os.replace(tmp_path, self._path(filename))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _save_manifest(self):
+        self._replace_file(MANIFEST, json.dumps(self._manifest, indent=4))
+
+    @property
+    def version(self) -> int:
+        return self._manifest.get("version", 0)
+
+    def _bump_version(self):
+        self._manifest["version"] = self.version + 1
+
+    @property
+    def by_truck(self) -> bool:
+        return self._manifest["by_truck"]
+
+    def _key(self, row):
+        day = row["timestamp"][:10]
+        if not self.by_truck:
+            return day
+        truck = row["truck_id"] if row["truck_id"] is not None else "none"
+        return f"{day}.truck-{truck}"
+
+    def _add_partition(self, key, row):
+        day = row["timestamp"][:10]
+        next_day = date.fromisoformat(day) + timedelta(days=1)
+        self._manifest["partitions"][key] = {
+            "file": f"{key}.jsonl",
+            "truck_id": row["truck_id"] if self.by_truck else None,
+            "start": f"{day}T00:00:00",
+            "end": f"{next_day.isoformat()}T00:00:00",
+            "ids": [],
+        }
+
+    def _holders(self, record_ids) -> dict:
+        """
+        record_id -> keys of the partitions that may hold it, going by the
+        id range of each partition. Partitions written before ranges were
+        recorded may hold any id.
+        """
+        bounded = []
+        unbounded = []
+        for key, p in self._manifest["partitions"].items():
+            ids = p.get("ids")
+            if ids is None:
+                unbounded.append(key)
+            elif ids:
+                bounded.append((key, ids[0], ids[1]))
+        top = max((hi for _, _, hi in bounded), default=None)
+
+        holders = {}
+        for record_id in record_ids:
+            keys = list(unbounded)
+            # New ids are usually above every range: skip the scan
+            if top is not None and record_id <= top:
+                keys.extend(key for key, lo, hi in bounded if lo <= record_id <= hi)
+            holders[record_id] = keys
+        return holders
+
+    def _record_id_ranges(self) -> bool:
+        """
+        Give partitions written before id ranges were kept their range, so
+        writes stop sending them every "del". Returns True if any changed.
+        """
+        missing = [k for k, p in self._manifest["partitions"].items() if "ids" not in p]
+        for key in missing:
+            ids = list(self._read_partition(key))
+            self._manifest["partitions"][key]["ids"] = [min(ids), max(ids)] if ids else []
+        return bool(missing)
+
+    def _extend_ids(self, key, record_id) -> bool:
+        """Widen a partition's id range to cover record_id. Returns True if it changed."""
+        p = self._manifest["partitions"][key]
+        ids = p.get("ids")
+        if ids is None or (ids and ids[0] <= record_id <= ids[1]):
+            return False
+        p["ids"] = [min(ids[0], record_id), max(ids[1], record_id)] if ids else [record_id, record_id]
+        return True
+
+    def partitions(self, start=None, end=None, truck_id=None) -> list:
+        """
+        Return the keys of the partitions overlapping [start, end),
+        oldest first. With per-truck partitions, truck_id prunes too.
+        """
+        start, end = _iso(start), _iso(end)
+        keys = []
+        for key, p in sorted(self._manifest["partitions"].items()):
+            if start is not None and p["end"] <= start:
+                continue
+            if end is not None and p["start"] >= end:
+                continue
+            if truck_id is not None and self.by_truck and p["truck_id"] != truck_id:
+                continue
+            keys.append(key)
+        return keys
+
+    # ===== Reading =====
+
+    def _read_partition(self, key):
+        """
+        Replay one partition's log. Returns its live rows by record_id.
+        Never writes: a mostly dead log is only noted for compaction.
+        """
+        path = self._path(self._manifest["partitions"][key]["file"])
+        rows = {}
+        ops = 0
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                for line in f:
+                    # A torn last line (crash mid-append) is ignored
+                    if not line.endswith("\n"):
+                        break
+                    try:
+                        op = json.loads(line)
+                    except json.JSONDecodeError:
+                        break
+                    ops += 1
+                    if op.pop("op", "put") == "del":
+                        rows.pop(op["record_id"], None)
+                    else:
+                        rows[op["record_id"]] = op
+
+        if ops >= COMPACT_MIN_OPS and ops - len(rows) > len(rows):
+            self._needs_compaction.add(key)
+        return rows
+
+    def read(self, start=None, end=None, truck_id=None, battery_id=None) -> list:
+        """Return the rows in [start, end), opening only overlapping partitions."""
+        return list(self.iter(start, end, truck_id, battery_id))
+
+    def iter(self, start=None, end=None, truck_id=None, battery_id=None):
+        """Yield the rows of read(), holding one partition in memory at a time."""
+        self.refresh()
+        start_iso, end_iso = _iso(start), _iso(end)
+        for key in self.partitions(start, end, truck_id):
+            for r in self._read_partition(key).values():
+                if start_iso is not None and r["timestamp"] < start_iso:
+                    continue
+                if end_iso is not None and r["timestamp"] >= end_iso:
+                    continue
+                if truck_id is not None and r["truck_id"] != truck_id:
+                    continue
+                if battery_id is not None and r["battery_id"] != battery_id:
+                    continue
+                yield r
+
+    def read_ids(self, record_ids) -> list:
+        """Return the rows with the given record_ids, opening only the partitions that may hold them."""
+        self.refresh()
+        holders = self._holders(set(record_ids))
+        keys = sorted({key for keys in holders.values() for key in keys})
+        found = {}
+        for key in keys:
+            rows = self._read_partition(key)
+            for record_id in holders:
+                if record_id in rows:
+                    found[record_id] = rows[record_id]
+        return list(found.values())
+
+    # ===== Key files =====
+
+    def _keys_file(self, key):
+        return os.path.splitext(self._manifest["partitions"][key]["file"])[0] + ".keys"
+
+    def _log_size(self, key):
+        path = self._path(self._manifest["partitions"][key]["file"])
+        return os.path.getsize(path) if os.path.exists(path) else 0
+
+    def _read_keys(self, key):
+        """A partition's key file, or None if it does not cover the log as it is now."""
+        try:
+            with open(self._path(self._keys_file(key)), "rb") as f:
+                keys = f.read()
+        except FileNotFoundError:
+            return b"" if self._log_size(key) == 0 else None
+        return keys if _covered_size(keys) == self._log_size(key) else None
+
+    def _keys_current(self, key) -> bool:
+        """Like _read_keys() is not None, reading only the end of the key file."""
+        try:
+            with open(self._path(self._keys_file(key)), "rb") as f:
+                f.seek(max(0, os.fstat(f.fileno()).st_size - 32))
+                tail = f.read()
+        except FileNotFoundError:
+            return self._log_size(key) == 0
+        return _covered_size(tail) == self._log_size(key)
+
+    def find_keys(self, record_ids, readings) -> tuple:
+        """
+        The record_ids and (battery_id, timestamp) pairs among the given
+        ones that stored rows hold, found by searching the key files of
+        the partitions that may hold them. A partition whose key file is
+        missing or behind its log is read instead, and its key file is
+        rebuilt by the next write.
+        """
+        self.refresh()
+        wanted = {}     # partition key -> (record_ids, readings) to look for
+        for record_id, keys in self._holders(set(record_ids)).items():
+            for key in keys:
+                wanted.setdefault(key, ([], []))[0].append(record_id)
+        days = {}
+        for battery_id, timestamp in readings:
+            days.setdefault(timestamp[:10], []).append((battery_id, timestamp))
+        for day, day_readings in days.items():
+            start = datetime.fromisoformat(day)
+            for key in self.partitions(start, start + timedelta(days=1)):
+                wanted.setdefault(key, ([], []))[1].extend(day_readings)
+
+        found_ids = set()
+        found_readings = set()
+        for key, (ids, pairs) in sorted(wanted.items()):
+            keys = self._read_keys(key)
+            if keys is not None:
+                found_ids.update(i for i in ids if _has_id(keys, i))
+                found_readings.update(p for p in pairs if _has_reading(keys, *p))
+                continue
+            self._needs_keys.add(key)
+            rows = self._read_partition(key)
+            found_ids.update(i for i in ids if i in rows)
+            stored = {(r["battery_id"], r["timestamp"]) for r in rows.values()}
+            found_readings.update(p for p in pairs if p in stored)
+        return found_ids, found_readings
+
+    # ===== Writing =====
+
+    def _append(self, key, entries):
+        """
+        Append operations to a partition log, then their lines to its key
+        file, or mark the key file for a rebuild if it was already behind.
+        """
+        keys_current = key not in self._needs_keys and self._keys_current(key)
+        with open(self._path(self._manifest["partitions"][key]["file"]), "a") as f:
+            f.write("".join(json.dumps(e) + "\n" for e in entries))
+        if not keys_current:
+            self._needs_keys.add(key)
+            return
+        with open(self._path(self._keys_file(key)), "a") as f:
+            f.write("".join(_key_line(e) for e in entries) + f"@{self._log_size(key)}\n")
+
+    def _write_keys(self, key, rows):
+        """Rewrite a partition's key file from its live rows."""
+        text = "".join(_key_line(r) for r in rows)
+        self._replace_file(self._keys_file(key), text + f"@{self._log_size(key)}\n")
+
+    def _write_partition(self, key, rows):
+        """Rewrite a partition with only the given rows. Callers hold the data lock."""
+        rows = list(rows)
+        p = self._manifest["partitions"][key]
+        self._replace_file(p["file"], "".join(json.dumps(dict(r, op="put")) + "\n" for r in rows))
+        self._write_keys(key, rows)
+        self._needs_keys.discard(key)
+        ids = [r["record_id"] for r in rows]
+        p["ids"] = [min(ids), max(ids)] if ids else []
+
+    def write(self, rows, ids=()):
+        """
+        Append puts for rows and deletes for ids. Each touched partition
+        gets one append. A row that may already live in another partition
+        (its timestamp changed) gets a "del" there, as do deleted ids in
+        every partition that may hold them. Callers hold the data lock.
+        """
+        self.refresh()
+        batches = {}
+        manifest_changed = self._record_id_ranges()
+
+        keys = {}
+        for r in rows:
+            key = keys[r["record_id"]] = self._key(r)
+            if key not in self._manifest["partitions"]:
+                self._add_partition(key, r)
+                manifest_changed = True
+
+        holders = self._holders(set(keys) | set(ids))
+        for r in rows:
+            record_id = r["record_id"]
+            key = keys[record_id]
+            for old_key in holders[record_id]:
+                if old_key != key:
+                    batches.setdefault(old_key, []).append({"op": "del", "record_id": record_id})
+            batches.setdefault(key, []).append(dict(r, op="put"))
+            manifest_changed |= self._extend_ids(key, record_id)
+
+        for i in ids:
+            for key in holders[i]:
+                batches.setdefault(key, []).append({"op": "del", "record_id": i})
+
+        # The manifest goes first: a crash before the appends leaves a
+        # version no derived data has seen and id ranges that are too wide,
+        # never rows the manifest does not know about
+        if rows or ids:
+            self._bump_version()
+            manifest_changed = True
+        if manifest_changed:
+            self._save_manifest()
+
+        for key, entries in batches.items():
+            self._append(key, entries)
+
+        # Partitions that reads found mostly dead are rewritten here, under
+        # the lock, after re-reading them so no append is lost
+        compacted = [k for k in sorted(self._needs_compaction) if k in self._manifest["partitions"]]
+        for key in compacted:
+            self._write_partition(key, self._read_partition(key).values())
+        self._needs_compaction.clear()
+        if compacted:
+            self._save_manifest()
+
+        # Key files found missing or behind are rebuilt from their partition
+        for key in sorted(self._needs_keys):
+            if key in self._manifest["partitions"]:
+                self._write_keys(key, self._read_partition(key).values())
+        self._needs_keys.clear()
+
+    def replace_all(self, rows):
+        """Drop every partition and store exactly the given rows."""
+        self.refresh()
+        for key in list(self._manifest["partitions"]):
+            self._drop(key)
+        self._needs_compaction.clear()
+        self._bump_version()
+        self._save_manifest()
+        self.write(rows)
+
+    def compact(self):
+        """
+        Rewrite every partition with only its live rows, and record the id
+        range of partitions written before ranges were kept. Callers hold
+        the data lock.
+        """
+        self.refresh()
+        for key in self.partitions():
+            self._write_partition(key, self._read_partition(key).values())
+        self._needs_compaction.clear()
+        self._needs_keys.clear()
+        self._save_manifest()
+
+    # ===== Retention =====
+
+    def _drop(self, key):
+        keys_file = self._keys_file(key)
+        p = self._manifest["partitions"].pop(key)
+        for filename in (p["file"], keys_file):
+            path = self._path(filename)
+            if os.path.exists(path):
+                os.remove(path)
+
+    def drop_before(self, cutoff) -> int:
+        """
+        Delete every partition that ends at or before cutoff.
+        Returns the number of partitions dropped.
+        """
+        self.refresh()
+        cutoff = _iso(cutoff)
+        old = [k for k, p in self._manifest["partitions"].items() if p["end"] <= cutoff]
+        for key in old:
+            self._drop(key)
+        if old:
+            self._bump_version()
+            self._save_manifest()
+        return len(old)
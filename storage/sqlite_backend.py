@@ -0,0 +1,267 @@
+import json
+import os
+import sqlite3
+
+from storage.backend import StorageBackend, TABLES, WRITE_ORDER
+
+
+DB_FILE = "fleet.db"
+
+# Seconds a writer waits for another connection's write to finish
+BUSY_TIMEOUT = 30
+
+# Column order for each table. The first column is the primary key.
+COLUMNS = {
+    "users": ["user_id", "name", "email", "role", "password_hash", "trucks"],
+    "trucks": ["truck_id", "VIN", "make", "model", "year"],
+    "batteries": ["battery_id", "truck_id", "capacity_ah", "voltage_v", "status"],
+    "telemetry": ["record_id", "truck_id", "battery_id", "temperature_c",
+                  "voltage_v", "current_a", "timestamp"],
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    email TEXT NOT NULL,
+    role TEXT NOT NULL,
+    password_hash TEXT NOT NULL,
+    trucks TEXT NOT NULL DEFAULT '[]'
+);
+
+CREATE TABLE IF NOT EXISTS trucks (
+    truck_id INTEGER PRIMARY KEY,
+    VIN TEXT NOT NULL,
+    make TEXT NOT NULL,
+    model TEXT NOT NULL,
+    year INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS batteries (
+    battery_id INTEGER PRIMARY KEY,
+    truck_id INTEGER,
+    capacity_ah REAL NOT NULL,
+    voltage_v REAL NOT NULL,
+    status TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS telemetry (
+    record_id INTEGER PRIMARY KEY,
+    truck_id INTEGER,
+    battery_id INTEGER,
+    temperature_c REAL NOT NULL,
+    voltage_v REAL NOT NULL,
+    current_a REAL NOT NULL,
+    timestamp TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_batteries_truck ON batteries (truck_id);
+CREATE INDEX IF NOT EXISTS idx_telemetry_truck ON telemetry (truck_id);
+CREATE INDEX IF NOT EXISTS idx_telemetry_battery ON telemetry (battery_id);
+-- Duplicate checks (see StorageBackend.new_telemetry)
+CREATE INDEX IF NOT EXISTS idx_telemetry_reading ON telemetry (battery_id, timestamp);
+CREATE INDEX IF NOT EXISTS idx_telemetry_timestamp ON telemetry (timestamp);
+
+-- Counters kept with the data, such as telemetry_version
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('telemetry_version', 0);
+"""
+
+
+class SqliteBackend(StorageBackend):
+    """
+    Stores every table in a single SQLite database (data/fleet.db).
+    Writes are per-row upserts and deletes inside one transaction, which
+    also bumps telemetry_version in the meta table when telemetry changes.
+    The database runs in WAL mode, so readers see a consistent snapshot
+    while a writer is busy, and writers wait for each other (busy timeout)
+    instead of failing.
+    """
+
+    name = "sqlite"
+    indexed_telemetry = True
+
+    def __init__(self, data_dir):
+        super().__init__(data_dir)
+        self.conn = sqlite3.connect(os.path.join(data_dir, DB_FILE), timeout=BUSY_TIMEOUT)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        with self.lock:
+            self.conn.executescript(SCHEMA)
+
+    # ===== Row conversion =====
+
+    def _to_params(self, table, row):
+        params = [row.get(c) for c in COLUMNS[table]]
+        if table == "users":
+            params[-1] = json.dumps(row.get("trucks", []))
+        return params
+
+    def _from_db(self, table, db_row):
+        row = dict(db_row)
+        if table == "users":
+            row["trucks"] = json.loads(row["trucks"])
+        return row
+
+    # ===== StorageBackend interface =====
+
+    def read_rows(self, table):
+        cols = ", ".join(COLUMNS[table])
+        cursor = self.conn.execute(f"SELECT {cols} FROM {table} ORDER BY rowid")
+        return [self._from_db(table, r) for r in cursor]
+
+    def read_rows_where(self, table, column, values):
+        if column not in COLUMNS[table]:
+            raise ValueError(f"Unknown column '{column}' in table '{table}'")
+        values = list(values)
+        cols = ", ".join(COLUMNS[table])
+        rows = []
+        # Stay under SQLite's limit on query parameters
+        for i in range(0, len(values), 500):
+            chunk = values[i:i + 500]
+            marks = ", ".join("?" * len(chunk))
+            cursor = self.conn.execute(
+                f"SELECT {cols} FROM {table} WHERE {column} IN ({marks}) ORDER BY rowid", chunk
+            )
+            rows.extend(self._from_db(table, r) for r in cursor)
+        return rows
+
+    def read_telemetry(self, truck_id=None, battery_id=None, start=None, end=None):
+        return list(self._query_telemetry(truck_id, battery_id, start, end))
+
+    def iter_telemetry(self, start=None, end=None):
+        return self._query_telemetry(None, None, start, end)
+
+    def _query_telemetry(self, truck_id, battery_id, start, end):
+        where = []
+        params = []
+        if truck_id is not None:
+            where.append("truck_id = ?")
+            params.append(truck_id)
+        if battery_id is not None:
+            where.append("battery_id = ?")
+            params.append(battery_id)
+        if start is not None:
+            where.append("timestamp >= ?")
+            params.append(start.isoformat())
+        if end is not None:
+            where.append("timestamp < ?")
+            params.append(end.isoformat())
+
+        sql = f"SELECT {', '.join(COLUMNS['telemetry'])} FROM telemetry"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY rowid"
+        return (dict(r) for r in self.conn.execute(sql, params))
+
+    def stored_telemetry_keys(self, rows):
+        # Primary key and (battery_id, timestamp) index lookups
+        record_ids = list({r["record_id"] for r in rows})
+        readings = list({(r["battery_id"], r["timestamp"]) for r in rows
+                         if r["battery_id"] is not None})
+        found_ids = set()
+        for i in range(0, len(record_ids), 500):
+            chunk = record_ids[i:i + 500]
+            marks = ", ".join("?" * len(chunk))
+            found_ids.update(record_id for (record_id,) in self.conn.execute(
+                f"SELECT record_id FROM telemetry WHERE record_id IN ({marks})", chunk))
+        found_readings = set()
+        for i in range(0, len(readings), 250):
+            chunk = readings[i:i + 250]
+            where = " OR ".join("(battery_id = ? AND timestamp = ?)" for _ in chunk)
+            params = [value for reading in chunk for value in reading]
+            found_readings.update(tuple(r) for r in self.conn.execute(
+                f"SELECT battery_id, timestamp FROM telemetry WHERE {where}", params))
+        return found_ids, found_readings
+
+    def telemetry_version(self):
+        (version,) = self.conn.execute(
+            "SELECT value FROM meta WHERE key = 'telemetry_version'").fetchone()
+        return version
+
+    def _bump_telemetry_version(self):
+        self.conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'telemetry_version'")
+
+    def _upsert(self, table, rows):
+        cols = COLUMNS[table]
+        key = TABLES[table]
+        updates = ", ".join(f"{c} = excluded.{c}" for c in cols if c != key)
+        sql = (f"INSERT INTO {table} ({', '.join(cols)}) "
+               f"VALUES ({', '.join('?' for _ in cols)}) "
+               f"ON CONFLICT({key}) DO UPDATE SET {updates}")
+        self.conn.executemany(sql, (self._to_params(table, r) for r in rows))
+
+    def _delete(self, table, ids):
+        key = TABLES[table]
+        self.conn.executemany(f"DELETE FROM {table} WHERE {key} = ?",
+                              ((i,) for i in ids))
+
+    def upsert(self, table, rows):
+        if not rows:
+            return
+        self.apply({table: rows}, {})
+
+    def delete(self, table, ids):
+        if not ids:
+            return
+        self.apply({}, {table: ids})
+
+    def apply(self, upserts, deletes):
+        rows = upserts.get("telemetry") or []
+        ids = deletes.get("telemetry") or []
+        with self.lock:
+            removed = self._stored_telemetry([r["record_id"] for r in rows] + list(ids))
+            # One transaction for the whole batch
+            with self.conn:
+                for table in WRITE_ORDER:
+                    if upserts.get(table):
+                        self._upsert(table, upserts[table])
+                for table in reversed(WRITE_ORDER):
+                    if deletes.get(table):
+                        self._delete(table, deletes[table])
+                if rows or ids:
+                    self._bump_telemetry_version()
+            if rows or ids:
+                self._telemetry_written(rows, removed)
+
+    def replace_all(self, table, rows):
+        # Only fetch the ids, not full rows, to find what was removed.
+        key = TABLES[table]
+        new_ids = {r[key] for r in rows}
+        with self.lock:
+            removed = self.read_rows("telemetry") if table == "telemetry" and self._listeners else []
+            with self.conn:
+                stale = [i for (i,) in self.conn.execute(f"SELECT {key} FROM {table}")
+                         if i not in new_ids]
+                if rows:
+                    self._upsert(table, rows)
+                if stale:
+                    self._delete(table, stale)
+                if table == "telemetry":
+                    self._bump_telemetry_version()
+            if table == "telemetry":
+                self._telemetry_written(rows, removed)
+
+    def drop_telemetry_before(self, cutoff):
+        with self.lock:
+            removed = []
+            if self._listeners:
+                removed = self.read_telemetry(end=cutoff)
+            with self.conn:
+                cursor = self.conn.execute("DELETE FROM telemetry WHERE timestamp < ?",
+                                           (cutoff.isoformat(),))
+                if cursor.rowcount:
+                    self._bump_telemetry_version()
+            if cursor.rowcount:
+                self._telemetry_written([], removed)
+        return cursor.rowcount
+
+    def compact(self):
+        with self.lock:
+            self.conn.execute("VACUUM")
+
+    def close(self):
+        self.conn.close()
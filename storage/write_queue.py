@@ -0,0 +1,150 @@
+"""
+Single-writer queue.
+
+Threads submit mutations (row upserts and id deletes per table) to a
+WriteQueue instead of writing to the backend themselves. One writer
+thread owns the backend: it takes everything queued so far, coalesces it
+(the last change to an id wins) and writes it with one backend.apply(),
+holding the data directory lock. Each submit() returns a Future that
+completes once its changes are stored.
+
+Telemetry can also be submitted as inserts: rows stored only if they do
+not repeat a stored reading (StorageBackend.new_telemetry), checked by
+the writer under the same lock as the write, so concurrent writers
+cannot both store one reading.
+"""
+import queue
+import threading
+from concurrent.futures import Future
+
+from storage.backend import TABLES
+
+
+# Most submissions coalesced into one write
+MAX_COALESCE = 1000
+
+_STOP = object()
+
+
+def coalesce(mutations) -> tuple:
+    """
+    Merge (upserts, deletes) pairs, in order, into one pair. An upsert
+    after a delete of the same id wins, and so does a delete after an upsert.
+    """
+    upserts = {}
+    deletes = {}
+    for table_upserts, table_deletes in mutations:
+        for table, rows in table_upserts.items():
+            key = TABLES[table]
+            pending = upserts.setdefault(table, {})
+            gone = deletes.get(table, set())
+            for row in rows:
+                pending[row[key]] = row
+                gone.discard(row[key])
+        for table, ids in table_deletes.items():
+            pending = upserts.get(table, {})
+            gone = deletes.setdefault(table, set())
+            for i in ids:
+                pending.pop(i, None)
+                gone.add(i)
+    return (
+        {t: list(rows.values()) for t, rows in upserts.items() if rows},
+        {t: list(ids) for t, ids in deletes.items() if ids},
+    )
+
+
+class WriteQueue:
+    """Serializes and coalesces writes from many threads onto one backend."""
+
+    def __init__(self, open_backend, max_pending: int = 0):
+        """
+        Args:
+            open_backend (callable): Returns the backend to write to. Called
+                on the writer thread, which then owns it (SQLite connections
+                must stay on the thread that opened them).
+            max_pending (int): Submissions that may wait before submit()
+                blocks; 0 means no limit.
+        """
+        self._queue = queue.Queue(max_pending)
+        self._opened = Future()
+        self._thread = threading.Thread(target=self._run, args=(open_backend,),
+                                        name="fleet-writer", daemon=True)
+        self._thread.start()
+        # Surface errors opening the backend right away
+        self._opened.result()
+
+        self.writes = 0
+        self.submitted = 0
+
+    def submit(self, upserts=None, deletes=None, inserts=None) -> Future:
+        """
+        Queue changes: upserts maps table -> rows, deletes maps table -> ids
+        and inserts lists telemetry rows to store unless they are
+        duplicates. Returns a Future resolved when they are stored, with
+        the inserted rows that were stored (None without inserts).
+        """
+        future = Future()
+        self.submitted += 1
+        self._queue.put((upserts or {}, deletes or {}, inserts, future))
+        return future
+
+    def close(self):
+        """Write everything queued, then stop the writer thread."""
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _run(self, open_backend):
+        try:
+            backend = open_backend()
+        except BaseException as e:
+            self._opened.set_exception(e)
+            return
+        self._opened.set_result(None)
+
+        stopping = False
+        try:
+            while not stopping:
+                items = [self._queue.get()]
+                while len(items) < MAX_COALESCE:
+                    try:
+                        items.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+
+                if _STOP in items:
+                    stopping = True
+                    items = [item for item in items if item is not _STOP]
+                if not items:
+                    continue
+
+                upserts, deletes = coalesce((u, d) for u, d, _, _ in items)
+                inserts = [row for _, _, rows, _ in items if rows for row in rows]
+                try:
+                    stored = self._write(backend, upserts, deletes, inserts)
+                except Exception as e:
+                    for _, _, _, future in items:
+                        future.set_exception(e)
+                    continue
+
+                self.writes += 1
+                for _, _, rows, future in items:
+                    future.set_result(None if rows is None else [r for r in rows if id(r) in stored])
+        finally:
+            backend.close()
+
+    @staticmethod
+    def _write(backend, upserts, deletes, inserts) -> set:
+        """One locked write. Returns the id() of every inserted row stored."""
+        with backend.lock:
+            if inserts:
+                pending = upserts.get("telemetry", [])
+                new = backend.new_telemetry(inserts, {r["record_id"] for r in pending})
+                upserts = dict(upserts, telemetry=pending + new)
+            backend.apply(upserts, deletes)
+        return {id(r) for r in new} if inserts else set()
@@ -0,0 +1,95 @@
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+
+# The project is run from its folder, not installed: make its modules importable
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database_manager  # noqa: E402
+from models.battery import Battery  # noqa: E402
+from models.telemetry import TelemetryRecord  # noqa: E402
+from models.truck import Truck  # noqa: E402
+from storage.backend import BACKENDS, open_backend  # noqa: E402
+
+
+# ===== Helpers =====
+
+
+def row(record_id, battery_id=1, truck_id=1, day=1, hour=0, temperature=20.0, voltage=48.0):
+    """A stored telemetry row, taken at hour:30 on 2025-01-<day>."""
+    return {
+        "record_id": record_id, "truck_id": truck_id, "battery_id": battery_id,
+        "temperature_c": temperature, "voltage_v": voltage, "current_a": 10.0,
+        "timestamp": f"2025-01-{day:02d}T{hour:02d}:30:00",
+    }
+
+
+def add_fleet(backend, trucks=1, batteries=1):
+    """Store trucks 1..trucks and batteries 1..batteries, spread over the trucks."""
+    backend.replace_all("trucks", [{
+        "truck_id": i, "VIN": f"TEST{i:013d}", "make": "Ford", "model": "F150", "year": 2020,
+    } for i in range(1, trucks + 1)])
+    backend.replace_all("batteries", [{
+        "battery_id": i, "truck_id": (i - 1) % trucks + 1,
+        "capacity_ah": 350.0, "voltage_v": 72.0, "status": "active",
+    } for i in range(1, batteries + 1)])
+
+
+def make_battery(n=20):
+    """A truck and battery linked to n hourly readings, every 7th one invalid."""
+    truck = Truck(1, "TESTVIN0001", "Ford", "F150", 2020)
+    battery = Battery(1, truck, 350.0, 72.0, "active")
+    start = datetime(2025, 1, 1)
+    records = []
+    for i in range(n):
+        temperature = 200.0 if i % 7 == 3 else 20.0 + (i * 37 % 11)
+        voltage = 48.0 - 0.05 * i + (i % 3) * 0.2
+        # Trusted construction: the setters would refuse the invalid readings
+        record = TelemetryRecord.from_trusted(i + 1, truck, battery, temperature, voltage,
+                                              10.0, start + timedelta(hours=i))
+        truck.add_telemetry(record)
+        battery.add_telemetry(record)
+        records.append(record)
+    return truck, battery, records
+
+
+# ===== Fixtures =====
+
+
+@pytest.fixture(params=BACKENDS)
+def storage(request, tmp_path):
+    """
+    open_storage() -> (backend, derived views) on one data directory per
+    test. Each call opens it again, as another process would.
+    """
+    opened = []
+
+    def open_storage():
+        backend, views = database_manager.open_storage(request.param, str(tmp_path))
+        opened.append(backend)
+        return backend, views
+
+    yield open_storage
+    for backend in opened:
+        backend.close()
+
+
+@pytest.fixture(params=BACKENDS)
+def backend(request, tmp_path):
+    """A backend holding truck 1 and battery 1 and no telemetry."""
+    backend = open_backend(request.param, str(tmp_path))
+    add_fleet(backend)
+    yield backend
+    backend.close()
+
+
+@pytest.fixture(params=BACKENDS)
+def active_backend(request, tmp_path, monkeypatch):
+    """The backend database_manager uses, on an empty data directory."""
+    monkeypatch.setattr(database_manager, "STORAGE_BACKEND", request.param)
+    monkeypatch.setattr(database_manager, "DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(database_manager, "_backend", None)
+    yield database_manager.get_backend()
+    database_manager.get_backend().close()
@@ -0,0 +1,67 @@
+"""
+The anomaly detector runs on the storage write path: every telemetry
+write is scored, its state survives the process, and the writers report
+what it flags.
+"""
+import pytest
+
+from services.anomaly_detector import AnomalyDetector
+from services.telemetry_import import TelemetryImporter
+from tests.conftest import add_fleet, row
+
+WARM = AnomalyDetector().warmup + 10
+
+
+def normal(record_id, battery_id=1):
+    return row(record_id, battery_id=battery_id, day=1 + record_id // 24, hour=record_id % 24,
+               temperature=20.0 + record_id % 3 * 0.5)
+
+
+def spike(record_id, battery_id=1):
+    return row(record_id, battery_id=battery_id, day=1 + record_id // 24, hour=record_id % 24,
+               temperature=90.0)
+
+
+@pytest.fixture
+def storage(storage):
+    """open_storage() -> (backend, anomalies view)."""
+    def open_storage():
+        backend, views = storage()
+        return backend, views["anomalies"]
+    return open_storage
+
+
+def test_writes_are_scored_with_state_from_earlier_processes(storage):
+    backend, _ = storage()
+    backend.upsert("telemetry", [normal(i) for i in range(WARM)])
+
+    # A new process starts from the saved state: no warm-up needed
+    other, view = storage()
+    flagged = []
+    view.watch(flagged.extend)
+    other.upsert("telemetry", [spike(WARM)])
+    assert [(a.record_id, a.kind) for a in flagged] == [(WARM, "temperature_spike")]
+    assert view.get().counts["temperature_spike"] == 1
+
+
+def test_writes_of_other_processes_are_replayed_before_scoring(storage):
+    backend, view = storage()
+    flagged = []
+    view.watch(flagged.extend)
+
+    # Another process warms battery 2 up in between
+    other, _ = storage()
+    other.upsert("telemetry", [normal(i, battery_id=2) for i in range(WARM)])
+
+    backend.upsert("telemetry", [spike(WARM, battery_id=2)])
+    assert [a.record_id for a in flagged] == [WARM]
+
+
+def test_import_counts_anomalies(active_backend):
+    add_fleet(active_backend)
+
+    rows = [normal(i) for i in range(WARM)] + [spike(WARM), normal(WARM + 1)]
+    result = TelemetryImporter(batch_size=10).import_rows(enumerate(rows, start=1))
+    assert result.imported == WARM + 2
+    assert result.anomalies == 1
+    assert result.alerts[0].record_id == WARM
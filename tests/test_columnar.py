@@ -0,0 +1,159 @@
+"""
+The columnar telemetry store (storage.columnar) against the rows it was
+written from: layout, per-battery and per-truck ranges, time windows,
+records, and analytics straight over its columns.
+"""
+import os
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+import database_manager
+from models.telemetry import to_micros
+from services.analytics_engine import AnalyticsEngine
+from storage.columnar import NO_ID, ColumnarTelemetry, from_micros
+from tests.conftest import add_fleet, row
+
+START = datetime(2025, 1, 1)
+
+
+def shuffled_rows(n=90, seed=3):
+    """Rows of 3 trucks and 5 batteries, some unlinked, at distinct hours, in random order."""
+    rows = []
+    for i in range(1, n + 1):
+        battery_id = None if i % 17 == 0 else i % 5 + 1
+        truck_id = None if i % 23 == 0 else i % 3 + 1
+        hour = i * 7 % 96
+        rows.append(row(i, battery_id=battery_id, truck_id=truck_id, day=hour // 24 + 1,
+                        hour=hour % 24, temperature=20.0 + i % 13, voltage=48.0 - i / 100))
+    random.Random(seed).shuffle(rows)
+    return rows
+
+
+def stamp(r):
+    return datetime.fromisoformat(r["timestamp"])
+
+
+@pytest.fixture
+def store(tmp_path):
+    rows = shuffled_rows()
+    path = str(tmp_path / "telemetry.cols")
+    ColumnarTelemetry.write(path, rows, version=["json", 7])
+    with ColumnarTelemetry(path) as store:
+        yield store, rows
+
+
+def test_battery_rows_are_contiguous_and_in_time_order(store):
+    store, rows = store
+    assert len(store) == len(rows)
+    assert store.version == ["json", 7]
+    assert sorted(store.battery_ids()) == [1, 2, 3, 4, 5]
+
+    for battery_id in (1, 2, 3, 4, 5, None):
+        expected = sorted((r for r in rows if r["battery_id"] == battery_id), key=stamp)
+        key = battery_id if battery_id is not None else NO_ID
+        ids, temps, stamps = store.battery_columns(key, "record_id", "temperature_c", "timestamp_us")
+        assert list(ids) == [r["record_id"] for r in expected]
+        assert list(temps) == [r["temperature_c"] for r in expected]
+        assert [from_micros(us) for us in stamps] == [stamp(r) for r in expected]
+
+    assert store.battery_range(99) == (0, 0)
+    assert store.battery_columns(99, "voltage_v") == (store.column("voltage_v")[0:0],)
+
+
+def test_battery_windows_match_a_filter(store):
+    store, rows = store
+    rng = random.Random(5)
+    for _ in range(50):
+        battery_id = rng.randrange(1, 6)
+        start, end = sorted(START + timedelta(hours=rng.randrange(-2, 100)) for _ in range(2))
+        for window in ((start, end), (start, None), (None, end)):
+            (ids,) = store.battery_columns(battery_id, "record_id", start=window[0], end=window[1])
+            assert sorted(ids) == sorted(
+                r["record_id"] for r in rows
+                if r["battery_id"] == battery_id
+                and (window[0] is None or stamp(r) >= window[0])
+                and (window[1] is None or stamp(r) < window[1])
+            )
+
+
+def test_truck_rows_are_in_time_order(store):
+    store, rows = store
+    assert sorted(store.truck_ids()) == [1, 2, 3]
+    record_ids = store.column("record_id")
+    stamps = store.column("timestamp_us")
+    for truck_id in (1, 2, 3):
+        order = store.truck_rows(truck_id)
+        assert sorted(record_ids[i] for i in order) == sorted(
+            r["record_id"] for r in rows if r["truck_id"] == truck_id)
+        times = [stamps[i] for i in order]
+        assert times == sorted(times)
+    assert len(store.truck_rows(NO_ID)) == sum(r["truck_id"] is None for r in rows)
+
+
+def test_records_carry_the_stored_values(store):
+    store, rows = store
+    by_id = {r["record_id"]: r for r in rows}
+    records = list(store.battery_records(2))
+    assert len(records) == sum(r["battery_id"] == 2 for r in rows)
+    for record in records:
+        r = by_id[record.record_id]
+        assert (record.temperature_c, record.voltage_v, record.current_a) == (
+            r["temperature_c"], r["voltage_v"], r["current_a"])
+        assert record.timestamp == stamp(r)
+        assert record.battery is None and record.truck is None
+
+    battery = object()
+    first = store.record(store.battery_range(2)[0], battery_map={2: battery})
+    assert first.battery is battery
+
+
+def test_analyze_store_matches_the_engine_on_rows(store):
+    store, rows = store
+    engine = AnalyticsEngine()
+    by_battery = {}
+    for r in sorted(rows, key=stamp):
+        if r["battery_id"] is not None:
+            by_battery.setdefault(r["battery_id"], []).append(r)
+
+    results = dict(zip(store.battery_ids(), engine.analyze_store(store)))
+    assert results.keys() == by_battery.keys()
+    for battery_id, battery_rows in by_battery.items():
+        assert results[battery_id] == engine.analyze_columns(
+            battery_id,
+            [r["temperature_c"] for r in battery_rows],
+            [r["voltage_v"] for r in battery_rows],
+            [to_micros(stamp(r)) for r in battery_rows],
+        )
+
+
+def test_empty_and_foreign_files(tmp_path):
+    path = str(tmp_path / "empty.cols")
+    ColumnarTelemetry.write(path, [])
+    with ColumnarTelemetry(path) as store:
+        assert len(store) == 0
+        assert store.battery_ids() == [] and store.version is None
+
+    other = tmp_path / "other.cols"
+    other.write_bytes(b"NOTCOLS\0" + bytes(16))
+    with pytest.raises(ValueError):
+        ColumnarTelemetry(str(other))
+
+
+def test_current_columns_are_rebuilt_after_writes(active_backend):
+    add_fleet(active_backend, batteries=2)
+    active_backend.upsert("telemetry", [row(1), row(2, battery_id=2)])
+    path = database_manager.current_telemetry_columns()
+    with ColumnarTelemetry(path) as store:
+        assert len(store) == 2
+
+    # Current: not rewritten
+    written = os.stat(path).st_mtime_ns
+    assert os.stat(database_manager.current_telemetry_columns()).st_mtime_ns == written
+
+    active_backend.delete("telemetry", [1])
+    active_backend.upsert("telemetry", [row(3, hour=5)])
+    with ColumnarTelemetry(database_manager.current_telemetry_columns()) as store:
+        assert sorted(store.column("record_id")) == [2, 3]
+        assert store.version == [active_backend.name, active_backend.telemetry_version()]
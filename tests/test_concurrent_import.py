@@ -0,0 +1,52 @@
+"""
+Duplicate checks and writes happen under one lock, so importers and
+writers running side by side store every reading exactly once.
+"""
+import multiprocessing
+
+from services.telemetry_import import TelemetryImporter
+from storage.backend import open_backend
+from storage.write_queue import WriteQueue
+from tests.conftest import row
+
+READINGS = 400
+
+
+def readings():
+    """(line, raw row) pairs, as read from an import file."""
+    return [(i, row(i, hour=i % 24, day=1 + i // 24)) for i in range(1, READINGS + 1)]
+
+
+def import_all(name, data_dir, results):
+    backend = open_backend(name, data_dir)
+    result = TelemetryImporter(backend, batch_size=20).import_rows(readings())
+    backend.close()
+    results.put((result.imported, result.duplicates))
+
+
+def test_parallel_importers_store_each_reading_once(backend):
+    results = multiprocessing.Queue()
+    workers = [multiprocessing.Process(target=import_all, args=(backend.name, backend.data_dir, results))
+               for _ in range(3)]
+    for worker in workers:
+        worker.start()
+    counts = [results.get(timeout=60) for _ in workers]
+    for worker in workers:
+        worker.join()
+
+    assert sum(imported for imported, _ in counts) == READINGS
+    assert sum(duplicates for _, duplicates in counts) == 2 * READINGS
+    assert len(backend.read_rows("telemetry")) == READINGS
+
+
+def test_write_queue_inserts_skip_duplicates(backend):
+    with WriteQueue(lambda: open_backend(backend.name, backend.data_dir)) as writes:
+        first = writes.submit(inserts=[row(1), row(2, hour=1)]).result()
+        # Same record_id, and same battery and timestamp under a new id
+        again = [row(2, hour=5), row(3, hour=1), row(4, hour=2)]
+        second = writes.submit(inserts=again).result()
+        assert writes.submit(upserts={"telemetry": [row(5, hour=3)]}).result() is None
+
+    assert [r["record_id"] for r in first] == [1, 2]
+    assert second == [again[2]]
+    assert sorted(r["record_id"] for r in backend.read_rows("telemetry")) == [1, 2, 4, 5]
@@ -0,0 +1,118 @@
+"""
+Telemetry duplicates: the one-shot scan of stored data (services.dedupe)
+and the repository's checks against storage.
+"""
+from datetime import datetime
+
+import pytest
+
+import database_manager
+from fleet_repository import FleetRepository
+from models.telemetry import TelemetryRecord
+from services.dedupe import find_duplicates
+from tests.conftest import add_fleet, row
+
+
+def no_full_reads(monkeypatch, backend):
+    """Make reading all telemetry at once fail: only streams and lookups are allowed."""
+    read_rows = backend.read_rows
+
+    def guarded(table):
+        assert table != "telemetry", "read all telemetry"
+        return read_rows(table)
+
+    def read_telemetry(*args, **kwargs):
+        raise AssertionError("read the telemetry")
+
+    monkeypatch.setattr(backend, "read_rows", guarded)
+    monkeypatch.setattr(backend, "read_telemetry", read_telemetry)
+
+
+def test_find_duplicates_streams_and_keeps_the_lowest_id(backend, monkeypatch):
+    backend.upsert("telemetry", [
+        row(5, hour=1), row(2, hour=1), row(9, hour=1),     # one reading, three ids
+        row(3, battery_id=2, hour=1),                       # another battery
+        row(4, hour=2), row(1, hour=2), row(6, hour=3), row(7, battery_id=None, hour=3),
+    ])
+    no_full_reads(monkeypatch, backend)
+    assert find_duplicates(backend)["telemetry"] == [4, 5, 9]
+
+
+@pytest.fixture
+def repo(active_backend):
+    add_fleet(active_backend)
+    active_backend.replace_all("telemetry", [row(1, hour=1), row(2, hour=2)])
+    return FleetRepository.load()
+
+
+def reading(repo, record_id, hour):
+    return TelemetryRecord(record_id, repo.get_truck(1), repo.get_battery(1),
+                           20.0, 48.0, 10.0, datetime(2025, 1, 1, hour, 30))
+
+
+def test_repository_rejects_stored_and_pending_duplicates(repo, monkeypatch):
+    no_full_reads(monkeypatch, database_manager.get_backend())
+    with pytest.raises(ValueError, match="ID 1 already exists"):
+        repo.add_telemetry(reading(repo, 1, 5))
+    with pytest.raises(ValueError, match="already has a reading"):
+        repo.add_telemetry(reading(repo, 10, 2))
+
+    repo.add_telemetry(reading(repo, 10, 5))
+    with pytest.raises(ValueError, match="ID 10 already exists"):
+        repo.add_telemetry(reading(repo, 10, 6))
+    with pytest.raises(ValueError, match="already has a reading"):
+        repo.add_telemetry(reading(repo, 11, 5))
+
+
+def test_repository_allows_readd_after_delete(repo):
+    repo.delete_telemetry(2)
+    repo.add_telemetry(reading(repo, 2, 2))
+
+    repo.add_telemetry(reading(repo, 10, 5))
+    repo.delete_telemetry(10)
+    repo.add_telemetry(reading(repo, 11, 5))
+    repo.commit()
+
+    stored = database_manager.get_backend().read_telemetry(battery_id=1)
+    assert sorted(r["record_id"] for r in stored) == [1, 2, 11]
+
+
+CLI_ADD = ["telemetry", "add", "--truck", "1", "--battery", "1",
+           "--temperature", "20", "--voltage", "48", "--current", "10"]
+
+
+def test_cli_add_checks_duplicates_without_scanning(repo, monkeypatch, capsys):
+    import fleet
+
+    backend = database_manager.get_backend()
+    read_rows = backend.read_rows
+
+    def no_scan(table):
+        raise AssertionError(f"telemetry add read all of {table}")
+
+    monkeypatch.setattr(backend, "read_rows", no_scan)
+    assert fleet.main(CLI_ADD + ["--record-id", "10", "--timestamp", "2025-01-01T05:30:00"]) == 0
+    # No detector state saved yet: building it would scan all telemetry
+    assert "Not scored for anomalies" in capsys.readouterr().out
+    assert fleet.main(CLI_ADD + ["--record-id", "10", "--timestamp", "2025-01-01T06:30:00"]) == 1
+    assert "ID 10 already exists" in capsys.readouterr().out
+    assert fleet.main(CLI_ADD + ["--record-id", "11", "--timestamp", "2025-01-01T02:30:00"]) == 1
+    assert "already has a reading" in capsys.readouterr().out
+    assert fleet.main(CLI_ADD + ["--record-id", "11", "--timestamp", "2025-01-01T06:30:00"]) == 0
+
+    # Only a battery missing from the truck is looked up in the whole table
+    monkeypatch.setattr(backend, "read_rows", read_rows)
+    assert fleet.main(CLI_ADD + ["--battery", "2", "--record-id", "12",
+                                 "--timestamp", "2025-01-01T07:30:00"]) == 1
+    assert "Battery 2 not found" in capsys.readouterr().out
+    stored = backend.read_telemetry(battery_id=1)
+    assert sorted(r["record_id"] for r in stored) == [1, 2, 10, 11]
+
+
+def test_cli_add_scores_against_saved_detector_state(repo, capsys):
+    import fleet
+
+    # Saves data/anomalies.json
+    assert database_manager.watch_anomalies(lambda anomalies: None)
+    assert fleet.main(CLI_ADD + ["--record-id", "10", "--timestamp", "2025-01-01T05:30:00"]) == 0
+    assert "Not scored" not in capsys.readouterr().out
@@ -0,0 +1,117 @@
+"""
+Derived data (storage.derived) must follow every telemetry write: in the
+writing process, in other processes through the log, and by a rebuild
+when a write was not logged.
+"""
+from datetime import datetime
+
+import pytest
+
+from services.rollups import TelemetryRollups
+from storage.backend import open_backend
+from tests.conftest import row
+
+
+def buckets(rollups):
+    """(kind, owner, tier, start) -> (count, sums), for comparing rollups."""
+    return {
+        (kind, owner_id, tier, ts): (count, sums)
+        for kind, owner_id, tier, ts, count, _, _, sums in rollups.to_dict()["buckets"]
+    }
+
+
+def assert_current(view):
+    expected = buckets(TelemetryRollups.from_rows(view.backend.read_rows("telemetry")))
+    actual = buckets(view.get())
+    assert actual.keys() == expected.keys()
+    for key, (count, sums) in expected.items():
+        assert actual[key][0] == count
+        assert actual[key][1] == pytest.approx(sums)
+
+
+@pytest.fixture
+def storage(storage):
+    """open_storage() -> (backend, rollups view)."""
+    def open_storage():
+        backend, views = storage()
+        return backend, views["rollups"]
+    return open_storage
+
+
+def test_writes_update_loaded_data(storage):
+    backend, view = storage()
+    backend.upsert("telemetry", [row(i, hour=i) for i in range(1, 6)])
+    assert_current(view)
+
+    version = backend.telemetry_version()
+    backend.apply({"telemetry": [row(6, day=2), row(2, day=3, temperature=35.0)]},
+                  {"telemetry": [4]})
+    assert backend.telemetry_version() == version + 1
+    assert_current(view)
+
+
+def test_other_process_writes_are_replayed_from_the_log(storage, monkeypatch):
+    backend, view = storage()
+    backend.upsert("telemetry", [row(i, battery_id=i % 2 + 1, hour=i) for i in range(1, 10)])
+    view.get()      # writes the snapshot
+
+    other, _ = storage()
+    other.upsert("telemetry", [row(20, day=5), row(3, day=6, voltage=47.0)])
+    other.delete("telemetry", [5, 99])
+
+    # Catching up must not rescan the telemetry
+    def no_rescan(rows):
+        raise AssertionError("rebuilt instead of replaying the log")
+    monkeypatch.setattr(TelemetryRollups, "from_rows", no_rescan)
+
+    fresh, fresh_view = storage()
+    result = fresh_view.get()
+    monkeypatch.undo()
+    assert buckets(result) == buckets(view.get())
+    assert_current(view)
+    assert_current(fresh_view)
+
+
+def test_unlogged_write_forces_rebuild(storage, tmp_path):
+    backend, view = storage()
+    backend.upsert("telemetry", [row(1), row(2, hour=1)])
+    view.get()
+
+    # A writer that does not keep the derived data
+    plain = open_backend(backend.name, str(tmp_path))
+    plain.upsert("telemetry", [row(3, hour=2)])
+    plain.close()
+
+    assert_current(view)
+    assert view.get().summary("battery", 1, datetime(2025, 1, 1), datetime(2025, 1, 2)).count == 3
+
+
+def test_retention_and_replace_all(storage):
+    backend, view = storage()
+    backend.upsert("telemetry", [row(i, day=i) for i in range(1, 6)])
+    view.get()
+
+    backend.drop_telemetry_before(datetime(2025, 1, 3))
+    assert_current(view)
+
+    backend.replace_all("telemetry", [row(50, day=9)])
+    assert_current(view)
+
+
+
+def test_menu_startup_leaves_rollups_unloaded(active_backend, monkeypatch):
+    import database_manager
+    import main
+
+    active_backend.upsert("telemetry", [row(1), row(2, hour=1)])
+    database_manager.rollups()      # saved snapshot
+    monkeypatch.setattr(database_manager, "_backend", None)
+    monkeypatch.setattr("builtins.input", lambda prompt="": "nobody@example.com")
+
+    main.main()     # stops at the failed login
+    view = database_manager._views["rollups"]
+    assert view._data is None
+
+    # Written while unloaded: logged, and replayed on first use
+    database_manager.get_backend().upsert("telemetry", [row(3, hour=2)])
+    assert view.get().summary("battery", 1, datetime(2025, 1, 1), datetime(2025, 1, 2)).count == 3
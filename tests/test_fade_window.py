@@ -0,0 +1,114 @@
+"""
+Sliding-window fade (models.fade_window) against a full recompute over
+the readings that should be in the window, and the displayed fade in
+volts per day.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from models.fade_window import FadeWindows, SlidingFadeWindow
+from models.telemetry import TelemetryRecord
+from services.analytics_engine import AnalyticsEngine
+from tests.conftest import make_battery
+
+START = datetime(2025, 1, 1)
+
+
+class BruteWindow:
+    """The readings a SlidingFadeWindow should hold, kept as a plain dict."""
+
+    def __init__(self, span):
+        self.span = span
+        self.readings = {}   # record_id -> (timestamp, voltage)
+
+    def add(self, record_id, timestamp, voltage):
+        newest = max((t for t, _ in self.readings.values()), default=None)
+        if record_id in self.readings or (newest is not None and timestamp <= newest - self.span):
+            return
+        self.readings[record_id] = (timestamp, voltage)
+        cutoff = max(t for t, _ in self.readings.values()) - self.span
+        self.readings = {i: (t, v) for i, (t, v) in self.readings.items() if t > cutoff}
+
+    def remove(self, record_id):
+        self.readings.pop(record_id, None)
+
+    def fade(self):
+        readings = list(self.readings.values())
+        days = [(t - START).total_seconds() / 86400 for t, _ in readings]
+        return abs(AnalyticsEngine().run_regression(days, [v for _, v in readings])[0])
+
+
+def readings(n):
+    """(record_id, timestamp, voltage): every 3 hours, some late, some repeated."""
+    out = []
+    for i in range(n):
+        late = timedelta(hours=7) if i % 5 == 4 else timedelta(0)
+        out.append((i + 1, START + timedelta(hours=3 * i) - late, 48.0 - 0.01 * i + (i % 4) * 0.05))
+        if i % 11 == 10:
+            out.append(out[-3])    # already counted: ignored
+    return out
+
+
+def assert_same(window, brute):
+    assert window.count == len(brute.readings)
+    assert window.fade() == pytest.approx(brute.fade(), rel=1e-9, abs=1e-12)
+
+
+@pytest.mark.parametrize("span", [timedelta(hours=24), timedelta(days=7)])
+def test_window_matches_recompute_as_readings_expire(span):
+    window, brute = SlidingFadeWindow(span), BruteWindow(span)
+    for record_id, timestamp, voltage in readings(200):
+        window.add(record_id, timestamp, voltage)
+        brute.add(record_id, timestamp, voltage)
+        assert_same(window, brute)
+
+    # 600 hours of readings against a 24h or 7d span: most have expired
+    assert len(brute.readings) < 100
+
+    # Too old for the window: ignored
+    window.add(999, START, 40.0)
+    brute.add(999, START, 40.0)
+    assert_same(window, brute)
+
+
+def test_window_matches_recompute_after_removal():
+    span = timedelta(hours=24)
+    window, brute = SlidingFadeWindow(span), BruteWindow(span)
+    for record_id, timestamp, voltage in readings(40):
+        window.add(record_id, timestamp, voltage)
+        brute.add(record_id, timestamp, voltage)
+
+    for record_id in (40, 38, 1, 36):      # the newest, one inside, an expired one
+        window.remove(record_id)
+        brute.remove(record_id)
+        assert_same(window, brute)
+
+    for record_id, timestamp, voltage in readings(60)[40:]:
+        window.add(record_id, timestamp, voltage)
+        brute.add(record_id, timestamp, voltage)
+        assert_same(window, brute)
+
+
+def test_fade_windows_skip_invalid_readings():
+    truck, battery, records = make_battery(n=60)
+    windows = FadeWindows(records=reversed(records))
+    for name, span in (("24h", timedelta(hours=24)), ("7d", timedelta(days=7))):
+        brute = BruteWindow(span)
+        for r in sorted(records, key=lambda r: r.timestamp):
+            if AnalyticsEngine().is_valid_reading(r.temperature_c, r.voltage_v):
+                brute.add(r.record_id, r.timestamp, r.voltage_v)
+        assert_same(windows[name], brute)
+
+
+def test_displayed_fade_is_volts_per_day():
+    truck, battery, _ = make_battery(n=0)
+    # 0.5 V less every 12 hours, added out of order
+    for i in (3, 0, 2, 1):
+        battery.add_telemetry(TelemetryRecord(i + 1, truck, battery, 20.0, 48.0 - 0.5 * i,
+                                              10.0, START + timedelta(hours=12 * i)))
+    engine = AnalyticsEngine()
+    assert engine.predict_capacity_fade(battery.telemetry) == pytest.approx(1.0)
+    assert engine.summarize_stats(battery.stats)[1] == pytest.approx(1.0)
+    assert "Voltage Trend (fade): 1.0000 V/day" in engine.analyze_battery(battery)
+    assert "1.0000 V/day" in engine.analyze_battery(battery, START, START + timedelta(days=3))
@@ -0,0 +1,156 @@
+"""
+The ingest queue at capacity under each overflow policy, and its metrics
+(high-water mark, rates, time in queue) against a fake clock.
+"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import services.ingest_queue
+from services.ingest_queue import BLOCK, DROP_OLDEST, REJECT, IngestQueue, RateMeter
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """The queue's time.monotonic(), set by hand: clock.now = ..."""
+    fake = SimpleNamespace(now=0.0)
+    fake.monotonic = lambda: fake.now
+    monkeypatch.setattr(services.ingest_queue, "time", fake)
+    return fake
+
+
+def test_block_waits_for_enough_room():
+    async def run():
+        queue = IngestQueue(capacity=3, policy=BLOCK)
+        assert await queue.put("a", 1)
+        assert await queue.put("b", 2)
+        blocked = asyncio.create_task(queue.put("c", 2))
+        await asyncio.sleep(0)
+        assert not blocked.done()
+
+        assert await queue.get_batch(max_size=1, max_delay=0) == ["a"]
+        await asyncio.sleep(0)
+        assert not blocked.done()          # room for 1, not 2
+        assert queue.depth == 2
+
+        assert queue.drain() == ["b"]
+        assert await blocked
+        assert queue.drain() == ["c"]
+        return queue.metrics
+
+    metrics = asyncio.run(run())
+    assert (metrics.enqueued, metrics.dequeued, metrics.dropped, metrics.rejected) == (5, 5, 0, 0)
+    assert metrics.high_water == 3
+
+
+def test_drop_oldest_makes_room_and_reports_the_dropped():
+    dropped = []
+
+    async def run():
+        queue = IngestQueue(capacity=4, policy=DROP_OLDEST, on_drop=dropped.append)
+        for item, size in (("a", 2), ("b", 1), ("c", 1)):
+            assert await queue.put(item, size)
+        assert await queue.put("d", 3)     # a and b go; c still fits
+        assert queue.depth == 4
+        return queue, queue.drain()
+
+    queue, left = asyncio.run(run())
+    assert dropped == ["a", "b"]
+    assert left == ["c", "d"]
+    assert queue.metrics.dropped == 3
+    assert queue.metrics.enqueued == 7
+    assert queue.metrics.high_water == 4
+
+
+def test_reject_refuses_what_does_not_fit_and_keeps_nothing_of_it():
+    async def run():
+        queue = IngestQueue(capacity=3, policy=REJECT)
+        assert await queue.put("a", 2)
+        assert not await queue.put("b", 2)
+        assert await queue.put("c", 1)     # still fits
+        assert not await queue.put("d", 1)
+        full = queue.drain()
+        assert await queue.put("b", 2)     # room again
+        return queue, full, queue.drain()
+
+    queue, full, later = asyncio.run(run())
+    assert full == ["a", "c"]
+    assert later == ["b"]
+    assert queue.metrics.rejected == 3
+    assert queue.metrics.enqueued == 5
+    assert queue.metrics.high_water == 3
+
+
+@pytest.mark.parametrize("policy", [BLOCK, DROP_OLDEST, REJECT])
+def test_entries_larger_than_the_queue_are_an_error(policy):
+    queue = IngestQueue(capacity=3, policy=policy)
+    with pytest.raises(ValueError):
+        asyncio.run(queue.put("a", 4))
+    assert queue.depth == 0
+
+
+def test_invalid_settings():
+    with pytest.raises(ValueError):
+        IngestQueue(capacity=0)
+    with pytest.raises(ValueError):
+        IngestQueue(policy="drop-newest")
+
+
+def test_metrics_follow_the_clock(clock):
+    async def run():
+        queue = IngestQueue(capacity=1000)
+        # 100 readings, one per millisecond, taken together 100 ms after the first
+        for i in range(100):
+            clock.now = i / 1000
+            await queue.put(i)
+        clock.now = 0.1
+        assert len(queue.drain()) == 100
+        return queue
+
+    queue = asyncio.run(run())
+    snapshot = queue.snapshot()
+    assert snapshot["depth"] == 0
+    assert snapshot["high_water"] == 100
+    assert snapshot["enqueue_per_s"] == pytest.approx(1000.0)
+    assert snapshot["dequeue_per_s"] == pytest.approx(1000.0)
+    # Waits of 1..100 ms
+    assert snapshot["wait_avg_ms"] == pytest.approx(50.5)
+    assert snapshot["wait_p99_ms"] == pytest.approx(100.0)
+
+    # Rates cover the last 10 seconds only
+    clock.now = 30.0
+    snapshot = queue.snapshot()
+    assert snapshot["enqueue_per_s"] == snapshot["dequeue_per_s"] == 0.0
+    assert snapshot["wait_p99_ms"] == pytest.approx(100.0)
+
+
+def test_p99_ignores_the_slowest_percent(clock):
+    def snapshot_with_slow(slow):
+        """200 entries that wait 10 ms, except those in `slow`, which wait a second."""
+        async def run():
+            queue = IngestQueue(capacity=1000)
+            for i in range(200):
+                clock.now = 0.0
+                await queue.put(i)
+                clock.now = 1.0 if i in slow else 0.01
+                queue.drain()
+            return queue.snapshot()
+        return asyncio.run(run())
+
+    # The p99 is the 199th of 200 sorted waits
+    assert snapshot_with_slow({50})["wait_p99_ms"] == pytest.approx(10.0)
+    snapshot = snapshot_with_slow({50, 150})
+    assert snapshot["wait_p99_ms"] == pytest.approx(1000.0)
+    assert snapshot["wait_avg_ms"] == pytest.approx((198 * 10 + 2 * 1000) / 200)
+
+
+def test_rate_meter_before_and_after_a_full_window():
+    meter = RateMeter(window=10.0)
+    start = meter._started
+    meter.add(50, now=start + 1)
+    assert meter.rate(now=start + 2) == pytest.approx(25.0)    # 2 s covered so far
+    meter.add(50, now=start + 9)
+    assert meter.rate(now=start + 10) == pytest.approx(10.0)
+    assert meter.rate(now=start + 15) == pytest.approx(5.0)    # the first 50 left the window
+    assert meter.rate(now=start + 30) == 0.0
@@ -0,0 +1,123 @@
+"""
+The ingestion server answers every line, including lines longer than its
+limit, which are skipped with an error while the connection stays usable,
+and accepts readings of trucks and batteries added after it started.
+Readings refused by a full queue are not held on to: resent, they are
+stored, not counted as duplicates.
+"""
+import asyncio
+import json
+
+import pytest
+
+import database_manager
+from services.ingest_server import IngestServer
+from storage.backend import open_backend
+from tests.conftest import add_fleet
+
+
+def reading(record_id):
+    return {"record_id": record_id, "truck_id": None, "battery_id": None,
+            "temperature_c": 25.0, "voltage_v": 48.0, "current_a": 10.0,
+            "timestamp": f"2025-01-01T00:00:{record_id % 60:02d}"}
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(database_manager, "DATA_DIR", str(tmp_path))
+    return tmp_path
+
+
+async def exchange(server, lines):
+    reader, writer = await asyncio.open_connection(server.host, server.port)
+    replies = []
+    for line in lines:
+        writer.write(line + b"\n")
+        await writer.drain()
+        replies.append(json.loads(await reader.readline()))
+    writer.close()
+    return replies
+
+
+def test_oversized_batch_is_answered_and_skipped(data_dir):
+    async def run():
+        server = IngestServer(port=0, max_line=1024)
+        await server.start()
+        try:
+            oversized = json.dumps([reading(i) for i in range(1, 200)]).encode()
+            assert len(oversized) > 4 * 1024    # several reads past the limit
+            return await exchange(server, [
+                json.dumps([reading(1), reading(2)]).encode(),
+                oversized,
+                json.dumps(reading(3)).encode(),
+                b'{"metrics": true}',
+            ])
+        finally:
+            await server.stop()
+
+    first, too_long, after, metrics = asyncio.run(run())
+    assert first["accepted"] == 2
+    assert too_long["accepted"] == 0
+    assert "longer than 1024 bytes" in too_long["error"]
+    assert after["accepted"] == 1
+    assert metrics["oversized"] == 1
+    assert metrics["accepted"] == 3
+
+
+def test_trucks_and_batteries_added_later_are_accepted(data_dir):
+    def linked(record_id, battery_id):
+        return json.dumps(dict(reading(record_id), truck_id=1, battery_id=battery_id)).encode()
+
+    async def run():
+        server = IngestServer(port=0)
+        await server.start()
+        try:
+            before = await exchange(server, [linked(1, 1)])
+            # Added by another process while the server runs
+            other = open_backend(database_manager.STORAGE_BACKEND, str(data_dir))
+            add_fleet(other, trucks=1, batteries=2)
+            other.close()
+            return before + await exchange(server, [linked(2, 1), linked(3, 2), linked(4, 3)])
+        finally:
+            await server.stop()
+
+    missing, first, second, unknown = asyncio.run(run())
+    assert missing["rejected"] == [{"index": 0, "reason": "Truck 1 not found"}]
+    assert first["accepted"] == second["accepted"] == 1
+    assert unknown["rejected"] == [{"index": 0, "reason": "Battery 3 not found"}]
+
+
+@pytest.mark.parametrize("overflow", ["reject", "drop-oldest"])
+def test_readings_refused_by_a_full_queue_can_be_resent(data_dir, overflow):
+    first = json.dumps([reading(1), reading(2)]).encode()
+    second = json.dumps([reading(3), reading(4)]).encode()
+
+    # reject refuses the second line, drop-oldest drops the first
+    refused_line = second if overflow == "reject" else first
+
+    async def run():
+        server = IngestServer(port=0, max_batch=3, max_queue=3, overflow=overflow)
+        await server.start()
+        try:
+            # Nothing is written while the flusher is paused, so the queue fills
+            server._flusher.cancel()
+            lines = [asyncio.create_task(server._ingest_line(first))]
+            await asyncio.sleep(0)
+            lines.append(asyncio.create_task(server._ingest_line(second)))   # 2 + 2 > 3
+            await asyncio.sleep(0)
+
+            server._flusher = asyncio.create_task(server._flush_loop())
+            answers = dict(zip((first, second), await asyncio.gather(*lines)))
+            resent = await server._ingest_line(refused_line)
+            return answers.pop(refused_line), answers.popitem()[1], resent, server.metrics()
+        finally:
+            await server.stop()
+
+    refused, stored, resent, metrics = asyncio.run(run())
+    assert refused["accepted"] == 0
+    assert refused["error"] in ("Ingest queue full, resend later",
+                                "Dropped from a full ingest queue, resend later")
+    assert stored["accepted"] == 2
+    assert resent == {"accepted": 2, "duplicates": 0, "rejected": []}
+    assert metrics["queue"]["rejected" if overflow == "reject" else "dropped"] == 2
+    assert metrics["accepted"] == 4 and metrics["duplicates"] == 0
@@ -0,0 +1,49 @@
+"""
+The JSON backend's per-truck index of trucks.json and batteries.json:
+lookups by truck read only that truck's rows, and an index that no
+longer matches its file is not used.
+"""
+import json
+import os
+
+from storage.json_backend import JsonBackend
+from tests.conftest import add_fleet
+
+
+def by_truck(backend, table, truck_ids):
+    rows = [r for r in backend.read_rows(table) if r["truck_id"] in truck_ids]
+    return sorted(rows, key=json.dumps)
+
+
+def test_grouped_reads_follow_writes(tmp_path, monkeypatch):
+    backend = JsonBackend(str(tmp_path))
+    add_fleet(backend, trucks=3, batteries=10)
+    backend.upsert("batteries", [{"battery_id": 4, "truck_id": 2, "capacity_ah": 300.0,
+                                  "voltage_v": 72.0, "status": "active"}])
+    backend.delete("batteries", [7])
+    expected = {ids: by_truck(backend, "batteries", ids) for ids in [(1,), (2,), (1, 3), (9,)]}
+
+    def no_full_read(filename):
+        raise AssertionError(f"read all of {filename}")
+
+    monkeypatch.setattr(backend, "load_json", no_full_read)
+    for ids, rows in expected.items():
+        assert sorted(backend.read_rows_where("batteries", "truck_id", ids), key=json.dumps) == rows
+    assert [t["truck_id"] for t in backend.read_rows_where("trucks", "truck_id", [2])] == [2]
+
+
+def test_stale_index_is_not_used(tmp_path):
+    backend = JsonBackend(str(tmp_path))
+    add_fleet(backend, trucks=2, batteries=4)
+
+    # Edited by hand: the index no longer matches the file
+    path = os.path.join(str(tmp_path), "batteries.json")
+    with open(path) as f:
+        rows = json.load(f)
+    rows[0]["truck_id"] = 2
+    with open(path, "w") as f:
+        json.dump(rows, f)
+
+    assert by_truck(backend, "batteries", (2,)) == sorted(
+        backend.read_rows_where("batteries", "truck_id", [2]), key=json.dumps)
+    assert len(backend.read_rows_where("batteries", "truck_id", [2])) == 3
@@ -0,0 +1,96 @@
+"""
+storage.migrate copies every table between the JSON and SQLite backends,
+leaving the target with exactly the rows of the source.
+"""
+import sys
+
+import pytest
+
+import database_manager
+from storage.backend import TABLES, open_backend
+from storage.migrate import main, migrate
+from tests.conftest import add_fleet, row
+
+USERS = [
+    {"user_id": 1, "name": "Ana", "email": "ana@example.com", "role": "admin",
+     "password_hash": "0" * 64, "trucks": [1, 2]},
+    {"user_id": 2, "name": "Bo", "email": "bo@example.com", "role": "viewer",
+     "password_hash": "f" * 64, "trucks": []},
+]
+
+
+def fill(backend):
+    backend.replace_all("users", USERS)
+    add_fleet(backend, trucks=2, batteries=3)
+    backend.upsert("telemetry", [row(i, battery_id=i % 3 + 1, truck_id=i % 2 + 1,
+                                     day=i % 3 + 1, hour=i % 24, temperature=20.0 + i)
+                                 for i in range(1, 41)])
+
+
+def stored(backend):
+    return {table: sorted(backend.read_rows(table), key=lambda r: r[key])
+            for table, key in TABLES.items()}
+
+
+@pytest.mark.parametrize("source, target", [("json", "sqlite"), ("sqlite", "json")])
+def test_target_gets_exactly_the_source_rows(tmp_path, source, target):
+    data_dir = str(tmp_path)
+    backend = open_backend(source, data_dir)
+    fill(backend)
+    backend.delete("telemetry", [5, 6])
+    expected = stored(backend)
+    backend.close()
+
+    # Rows only the target has are not kept
+    backend = open_backend(target, data_dir)
+    backend.upsert("telemetry", [row(500, hour=3)])
+    backend.replace_all("users", [dict(USERS[0], user_id=9)])
+    backend.close()
+
+    counts = migrate(source, target, data_dir)
+    assert counts == {table: len(rows) for table, rows in expected.items()}
+    assert counts["telemetry"] == 38
+
+    backend = open_backend(target, data_dir)
+    try:
+        assert stored(backend) == expected
+    finally:
+        backend.close()
+
+
+def test_same_backend_is_refused(tmp_path):
+    with pytest.raises(ValueError):
+        migrate("json", "json", str(tmp_path))
+
+
+def test_derived_data_is_rebuilt_after_a_migration(tmp_path, monkeypatch):
+    monkeypatch.setattr(database_manager, "STORAGE_BACKEND", "sqlite")
+    monkeypatch.setattr(database_manager, "DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(database_manager, "_backend", None)
+    # Saved while the SQLite database was still empty
+    assert database_manager.sketches().fleet().count == 0
+    database_manager.get_backend().close()
+
+    backend = open_backend("json", str(tmp_path))
+    fill(backend)
+    backend.close()
+    migrate("json", "sqlite", str(tmp_path))
+
+    # Written without the derived data's log: rebuilt on the next load
+    monkeypatch.setattr(database_manager, "_backend", None)
+    try:
+        assert database_manager.sketches().fleet().count == 40
+    finally:
+        database_manager.get_backend().close()
+
+
+def test_command_line_prints_the_counts(tmp_path, monkeypatch, capsys):
+    backend = open_backend("sqlite", str(tmp_path))
+    fill(backend)
+    backend.close()
+
+    monkeypatch.setattr(sys, "argv", ["migrate", "--from", "sqlite", "--to", "json",
+                                      "--data-dir", str(tmp_path)])
+    main()
+    assert capsys.readouterr().out.splitlines() == [
+        "users: 2 rows", "trucks: 2 rows", "batteries: 3 rows", "telemetry: 40 rows"]
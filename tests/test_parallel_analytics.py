@@ -0,0 +1,95 @@
+"""The process pool must return exactly what the in-process path returns."""
+from datetime import datetime, timedelta
+
+import pytest
+
+import database_manager
+from models.battery import Battery
+from models.telemetry import TelemetryRecord
+from models.truck import Truck
+from services.analytics_engine import AnalyticsEngine
+from services.parallel_analytics import MIN_PARALLEL_BATTERIES, ParallelAnalyticsRunner
+from services.vectorized_engine import VectorizedAnalyticsEngine
+from tests.conftest import add_fleet, row
+
+START = datetime(2025, 1, 1)
+
+
+class ExactEngine(AnalyticsEngine):
+    """Returns the unrounded numbers, so last-bit differences show."""
+
+    def format_analysis(self, battery_id, avg_temp, fade, life):
+        return battery_id, avg_temp, fade, life
+
+
+class ExactVectorizedEngine(VectorizedAnalyticsEngine):
+    def format_analysis(self, battery_id, avg_temp, fade, life):
+        return battery_id, avg_temp, fade, life
+
+
+def make_fleet(batteries=MIN_PARALLEL_BATTERIES + 6, readings=40):
+    truck = Truck(1, "TESTVIN0001", "Ford", "F150", 2020)
+    fleet = []
+    record_id = 0
+    for b in range(1, batteries + 1):
+        battery = Battery(b, truck, 350.0, 72.0, "active")
+        for i in range(readings):
+            record_id += 1
+            # Values whose sums round differently depending on the method
+            temperature = 200.0 if (i + b) % 9 == 0 else 20.0 + (record_id * 7919 % 300) / 7
+            voltage = 48.0 - 0.013 * i + (record_id % 11) / 30
+            battery.add_telemetry(TelemetryRecord.from_trusted(
+                record_id, truck, battery, temperature, voltage, 10.0,
+                START + timedelta(hours=i)))
+        fleet.append(battery)
+    return fleet
+
+
+@pytest.mark.parametrize("engine_class", [ExactEngine, ExactVectorizedEngine])
+@pytest.mark.parametrize("window", [(None, None),
+                                    (START + timedelta(hours=5), START + timedelta(hours=30))])
+def test_pool_matches_serial(engine_class, window):
+    fleet = make_fleet()
+    serial = ParallelAnalyticsRunner(workers=1, engine_class=engine_class).run(fleet, *window)
+    pooled = ParallelAnalyticsRunner(workers=2, engine_class=engine_class).run(fleet, *window)
+    assert pooled == serial
+
+
+def test_pool_matches_serial_after_delete():
+    fleet = make_fleet()
+    runner = ParallelAnalyticsRunner(workers=1, engine_class=ExactEngine)
+    runner.run(fleet)       # build every battery's running stats first
+    for battery in fleet[::3]:
+        battery.remove_telemetry(next(iter(battery.telemetry)))
+
+    # The serial path reverses the deletes in its running stats, the pool
+    # recomputes: the same up to rounding
+    pooled = ParallelAnalyticsRunner(workers=2, engine_class=ExactEngine).run(fleet)
+    for pooled_result, serial_result in zip(pooled, runner.run(fleet)):
+        assert pooled_result == pytest.approx(serial_result, rel=1e-9, abs=1e-12)
+
+
+@pytest.mark.parametrize("window", [(None, None), (datetime(2025, 1, 2), datetime(2025, 1, 3))])
+def test_workers_read_stored_batteries_themselves(active_backend, window):
+    batteries = MIN_PARALLEL_BATTERIES + 6
+    add_fleet(active_backend, batteries=batteries)
+    active_backend.upsert("telemetry", [
+        row(i, battery_id=i % batteries + 1, day=i % 4 + 1, hour=i // batteries % 24,
+            temperature=200.0 if i % 13 == 0 else 20.0 + i % 17, voltage=48.0 - 0.001 * i)
+        for i in range(batteries * 20)
+    ])
+    database_manager.build_telemetry_columns()
+    active_backend.upsert("telemetry", [row(10_000, battery_id=5, day=4, temperature=90.0)])
+
+    _, _, fleet, _ = database_manager.load_all(users=False)
+    fleet[0].add_telemetry(TelemetryRecord.from_trusted(
+        10_001, None, fleet[0], 30.0, 47.0, 10.0, datetime(2025, 1, 2, 12)))  # not stored
+    pooled = ParallelAnalyticsRunner(
+        workers=2, engine_class=ExactEngine, columns=database_manager.current_telemetry_columns
+    ).run(fleet, *window)
+
+    # Not loaded here, and read at the current version of the telemetry
+    assert all(battery.telemetry.untouched for battery in fleet[1:])
+    serial = ParallelAnalyticsRunner(workers=1, engine_class=ExactEngine).run(fleet, *window)
+    for pooled_result, serial_result in zip(pooled, serial):
+        assert pooled_result == pytest.approx(serial_result, rel=1e-9, abs=1e-12)
@@ -0,0 +1,181 @@
+"""
+Day partitions of the JSON backend (storage.partitions), checked against
+a plain dict of the rows that should be stored.
+"""
+import json
+import os
+from datetime import datetime
+
+import pytest
+
+import storage.partitions
+from storage.partitions import PartitionedTelemetry
+from tests.conftest import row
+
+
+def brute_keys(rows, record_ids, readings):
+    ids = {r["record_id"] for r in rows} & set(record_ids)
+    return ids, {(r["battery_id"], r["timestamp"]) for r in rows} & set(readings)
+
+
+@pytest.fixture
+def telemetry(tmp_path):
+    return PartitionedTelemetry(str(tmp_path / "telemetry"))
+
+
+def no_partition_reads(monkeypatch, telemetry):
+    def read_partition(key):
+        raise AssertionError(f"partition {key} was read")
+    monkeypatch.setattr(telemetry, "_read_partition", read_partition)
+
+
+def test_key_files_follow_puts_deletes_and_moves(telemetry, monkeypatch):
+    stored = {r["record_id"]: r for r in [row(i, battery_id=i % 3, hour=i) for i in range(1, 13)]}
+    telemetry.write(list(stored.values()))
+
+    # Moved to another day, rewritten within its day, deleted
+    moves = [row(2, battery_id=2, day=2), row(5, battery_id=2, hour=20), row(13, battery_id=0, hour=1)]
+    telemetry.write(moves, [7, 99])
+    stored.update((r["record_id"], r) for r in moves)
+    del stored[7]
+
+    record_ids = range(0, 16)
+    readings = [(b, f"2025-01-{d:02d}T{h:02d}:30:00") for b in range(3) for d in (1, 2) for h in range(24)]
+    no_partition_reads(monkeypatch, telemetry)
+    assert telemetry.find_keys(record_ids, readings) == brute_keys(stored.values(), record_ids, readings)
+
+
+def test_behind_key_files_are_bypassed_then_rebuilt(telemetry, monkeypatch):
+    telemetry.write([row(1), row(2, hour=1)])
+    # A writer that appended to the log without updating the key file
+    with open(os.path.join(telemetry.root, "2025-01-01.jsonl"), "a") as f:
+        f.write('{"op": "del", "record_id": 1}\n')
+
+    assert telemetry.find_keys([1, 2], [(1, "2025-01-01T00:30:00")]) == ({2}, set())
+
+    telemetry.write([row(3, hour=2)])
+    no_partition_reads(monkeypatch, telemetry)
+    assert telemetry.find_keys([1, 2, 3], [(1, "2025-01-01T00:30:00"), (1, "2025-01-01T02:30:00")]) == (
+        {2, 3}, {(1, "2025-01-01T02:30:00")})
+
+
+def test_compaction_and_drops_keep_key_files(telemetry, monkeypatch):
+    telemetry.write([row(i, day=1 + i % 3, hour=i % 24) for i in range(1, 30)])
+    telemetry.write([], [4, 5])
+    telemetry.compact()
+    telemetry.drop_before(datetime(2025, 1, 2))
+    assert sorted(os.listdir(telemetry.root)) == [
+        "2025-01-02.jsonl", "2025-01-02.keys", "2025-01-03.jsonl", "2025-01-03.keys", "manifest.json"]
+
+    no_partition_reads(monkeypatch, telemetry)
+    assert telemetry.find_keys([3, 5, 8], [(1, "2025-01-03T08:30:00")]) == ({8}, {(1, "2025-01-03T08:30:00")})
+
+
+def log_ops(telemetry, key):
+    with open(os.path.join(telemetry.root, f"{key}.jsonl")) as f:
+        return [json.loads(line) for line in f]
+
+
+def stored_ids(telemetry):
+    return sorted(r["record_id"] for r in telemetry.read())
+
+
+# 10 puts and `dead` deletes: 2 * dead dead operations against 10 - dead live rows
+@pytest.mark.parametrize("dead, compacted", [(4, True), (3, False)])
+def test_mostly_dead_partitions_are_compacted_by_the_next_write(telemetry, monkeypatch, dead, compacted):
+    monkeypatch.setattr(storage.partitions, "COMPACT_MIN_OPS", 10)
+    telemetry.write([row(i, hour=i) for i in range(1, 11)])
+    telemetry.write([], range(1, dead + 1))
+    ops = log_ops(telemetry, "2025-01-01")
+    assert len(ops) == 10 + dead
+
+    # Reads only note it
+    assert stored_ids(telemetry) == list(range(dead + 1, 11))
+    assert log_ops(telemetry, "2025-01-01") == ops
+
+    telemetry.write([row(50, day=2)])
+    ops = log_ops(telemetry, "2025-01-01")
+    if compacted:
+        assert [op["record_id"] for op in ops] == list(range(dead + 1, 11))
+        assert telemetry._manifest["partitions"]["2025-01-01"]["ids"] == [dead + 1, 10]
+    else:
+        assert len(ops) == 10 + dead
+    assert stored_ids(telemetry) == list(range(dead + 1, 11)) + [50]
+
+
+def test_small_partitions_are_not_compacted(telemetry):
+    # Mostly dead, but fewer than COMPACT_MIN_OPS operations
+    telemetry.write([row(i, hour=i) for i in range(1, 11)])
+    telemetry.write([], range(1, 10))
+    telemetry.read()
+    telemetry.write([row(50, day=2)])
+    assert len(log_ops(telemetry, "2025-01-01")) == 19
+
+
+def test_deletes_go_only_to_partitions_whose_id_range_holds_the_id(telemetry):
+    # Days 1, 2, 3 hold ids 1-10, 11-20, 21-30
+    telemetry.write([row(i, day=(i - 1) // 10 + 1, hour=i % 24) for i in range(1, 31)])
+
+    def appended(write):
+        before = {day: len(log_ops(telemetry, day)) for day in telemetry.partitions()}
+        write()
+        return {day: log_ops(telemetry, day)[before.get(day, 0):] for day in telemetry.partitions()}
+
+    new = appended(lambda: telemetry.write([], [15]))
+    assert new == {"2025-01-01": [], "2025-01-02": [{"op": "del", "record_id": 15}], "2025-01-03": []}
+
+    # Moved to day 3: a "del" where it may have been, nothing elsewhere
+    new = appended(lambda: telemetry.write([row(5, day=3, hour=23)]))
+    assert new["2025-01-01"] == [{"op": "del", "record_id": 5}]
+    assert new["2025-01-02"] == []
+    assert [op["op"] for op in new["2025-01-03"]] == ["put"]
+
+    # Above every range: no "del" anywhere
+    new = appended(lambda: telemetry.write([row(100, day=2)]))
+    assert [op["op"] for ops in new.values() for op in ops] == ["put"]
+
+    # Day 2's range is now 11-100, overlapping day 3's 5-30
+    assert telemetry._manifest["partitions"]["2025-01-02"]["ids"] == [11, 100]
+    new = appended(lambda: telemetry.write([], [25]))
+    assert new["2025-01-01"] == []
+    assert new["2025-01-02"] == new["2025-01-03"] == [{"op": "del", "record_id": 25}]
+
+    assert stored_ids(telemetry) == sorted(set(range(1, 31)) - {15, 25} | {100})
+    assert {r["record_id"]: r["timestamp"][:10] for r in telemetry.read_ids([5, 100])} == {
+        5: "2025-01-03", 100: "2025-01-02"}
+
+
+def test_manifests_without_id_ranges(telemetry, monkeypatch):
+    telemetry.write([row(i, day=(i - 1) // 10 + 1, hour=i % 24) for i in range(1, 21)])
+    # As written before id ranges were kept
+    manifest_path = os.path.join(telemetry.root, "manifest.json")
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    for p in manifest["partitions"].values():
+        del p["ids"]
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f)
+    old = PartitionedTelemetry(telemetry.root)
+
+    # Any partition may hold any id
+    assert old._holders([3, 500]) == {3: ["2025-01-01", "2025-01-02"], 500: ["2025-01-01", "2025-01-02"]}
+    assert [r["record_id"] for r in old.read_ids([3, 14])] == [3, 14]
+    assert old.find_keys([3, 14, 500], []) == ({3, 14}, set())
+
+    # The next write records the ranges first, so its deletes are targeted
+    old.write([], [14])
+    with open(manifest_path) as f:
+        ranges = {key: p["ids"] for key, p in json.load(f)["partitions"].items()}
+    assert ranges == {"2025-01-01": [1, 10], "2025-01-02": [11, 20]}
+    assert log_ops(old, "2025-01-01")[-1]["op"] == "put"
+    assert log_ops(old, "2025-01-02")[-1] == {"op": "del", "record_id": 14}
+    assert stored_ids(old) == sorted(set(range(1, 21)) - {14})
+
+
+def test_compaction_records_missing_id_ranges(telemetry):
+    telemetry.write([row(i, hour=i) for i in range(3, 9)])
+    del telemetry._manifest["partitions"]["2025-01-01"]["ids"]
+    telemetry._save_manifest()
+
+    telemetry.compact()
+    assert PartitionedTelemetry(telemetry.root)._manifest["partitions"]["2025-01-01"]["ids"] == [3, 8]
@@ -0,0 +1,118 @@
+"""
+Quantile sketches are kept current by every telemetry write and rebuilt
+after readings are removed, since a sketch cannot forget a value.
+"""
+from datetime import datetime
+
+import pytest
+
+from services.quantiles import KLLSketch, QuantileSketches
+from tests.conftest import row
+
+
+@pytest.fixture
+def storage(storage):
+    """open_storage() -> (backend, sketches view)."""
+    def open_storage():
+        backend, views = storage()
+        return backend, views["sketches"]
+    return open_storage
+
+
+def counts(sketches, battery_ids=(1, 2)):
+    return [sketches.battery(b).count for b in battery_ids]
+
+
+def test_writes_update_the_sketches(storage, monkeypatch):
+    backend, view = storage()
+    backend.upsert("telemetry", [row(i, battery_id=i % 2 + 1, hour=i) for i in range(10)])
+    assert counts(view.get()) == [5, 5]
+
+    other, _ = storage()
+    other.upsert("telemetry", [row(20 + i, battery_id=1, day=2, temperature=30.0 + i)
+                               for i in range(4)])
+
+    # Another process catches up from the log, without a rescan
+    def no_rescan(rows):
+        raise AssertionError("rebuilt instead of replaying the log")
+    monkeypatch.setattr(QuantileSketches, "from_rows", no_rescan)
+    _, fresh_view = storage()
+    sketches = fresh_view.get()
+    monkeypatch.undo()
+    assert counts(sketches) == [9, 5]
+    assert sketches.battery(1).quantile(1.0) == 33.0
+    assert sketches.fleet().count == 14
+
+
+def test_removed_readings_force_a_rebuild(storage):
+    backend, view = storage()
+    backend.upsert("telemetry", [row(i, day=i + 1) for i in range(6)])
+    view.get()
+
+    backend.drop_telemetry_before(datetime(2025, 1, 4))
+    assert counts(view.get(), [1]) == [3]
+
+    backend.delete("telemetry", [5])
+    _, other_view = storage()
+    assert counts(other_view.get(), [1]) == [2]
+
+
+def test_removed_readings_rebuild_only_their_batteries(storage, monkeypatch):
+    backend, view = storage()
+    backend.upsert("telemetry", [row(i, battery_id=i % 3 + 1, hour=i) for i in range(12)])
+    untouched = view.get().battery(2)
+
+    def no_rescan(rows):
+        raise AssertionError("rebuilt every battery")
+    monkeypatch.setattr(QuantileSketches, "from_rows", no_rescan)
+    reads = []
+    read_telemetry = backend.read_telemetry
+    monkeypatch.setattr(backend, "read_telemetry",
+                        lambda **kw: reads.append(kw) or read_telemetry(**kw))
+
+    backend.delete("telemetry", [0, 3])      # battery 1
+    sketches = view.get()
+    assert reads == [{"battery_id": 1}]
+    assert counts(sketches, [1, 2, 3]) == [2, 4, 4]
+    assert sketches.battery(2) is untouched
+
+    # Saved refreshed: another process needs no rebuild either
+    _, other_view = storage()
+    assert counts(other_view.get(), [1, 2, 3]) == [2, 4, 4]
+    assert reads == [{"battery_id": 1}]
+
+
+def test_battery_query_reads_only_its_entries(storage, monkeypatch):
+    backend, view = storage()
+    backend.upsert("telemetry", [row(i, battery_id=i % 4 + 1, hour=i, temperature=float(i))
+                                 for i in range(40)])
+    view.get()
+    backend.upsert("telemetry", [row(100, battery_id=2, day=3, temperature=99.0),
+                                 row(101, battery_id=3, day=3)])
+
+    decoded = []
+    from_dict = KLLSketch.from_dict
+    monkeypatch.setattr(KLLSketch, "from_dict",
+                        classmethod(lambda cls, d: decoded.append(d) or from_dict(d)))
+    _, other_view = storage()
+    part = other_view.get_part([2])
+    assert len(decoded) == 2                 # one battery, two fields
+    assert part.battery(2).count == 11       # with the logged write
+    assert part.battery(2).quantile(1.0) == 99.0
+    assert part.battery(1).count == 0        # not read
+    assert part.battery(2, "voltage_v").count == 11
+
+
+def test_battery_query_falls_back_without_a_current_index(storage):
+    backend, view = storage()
+    backend.upsert("telemetry", [row(i, battery_id=i % 2 + 1, hour=i) for i in range(10)])
+    view.get()
+    with open(view.path, "a") as f:
+        f.write(" ")                         # no longer the indexed file
+
+    _, other_view = storage()
+    assert counts(other_view.get_part([1])) == [5, 5]
+
+    backend.delete("telemetry", [0])         # battery 1 goes stale
+    _, other_view = storage()
+    assert counts(other_view.get_part([1]), [1]) == [4]
@@ -0,0 +1,70 @@
+"""
+The exported report streams the stored telemetry into per-battery running
+stats: it must match the report built from fully loaded batteries while
+holding far less memory.
+"""
+import tracemalloc
+from datetime import datetime, timedelta
+
+import pytest
+
+import database_manager
+from services.report_export import export_report, export_stored
+from tests.conftest import add_fleet
+
+TRUCKS = 5
+BATTERIES = 20
+DAYS = 30
+READINGS_PER_DAY = 200
+
+
+@pytest.fixture
+def stored_fleet(active_backend, tmp_path):
+    backend = active_backend
+    add_fleet(backend, TRUCKS, BATTERIES + 1)     # the last battery has no readings
+
+    start = datetime(2025, 1, 1)
+    step = timedelta(days=1) / READINGS_PER_DAY
+    rows = []
+    for i in range(DAYS * READINGS_PER_DAY):
+        battery_id = i % BATTERIES + 1
+        rows.append({
+            "record_id": i + 1, "truck_id": (battery_id - 1) % TRUCKS + 1,
+            "battery_id": battery_id,
+            # every 13th reading is out of range and must be skipped
+            "temperature_c": 200.0 if i % 13 == 0 else 20.0 + i % 30,
+            "voltage_v": 48.0 - (i % 100) / 100, "current_a": 10.0,
+            "timestamp": (start + step * i).isoformat(),
+        })
+    backend.upsert("telemetry", rows)
+    return tmp_path
+
+
+def loaded_report(path, start=None, end=None):
+    _, _, batteries, _ = database_manager.load_all(start=start, end=end)
+    return export_report(str(path), batteries, start=start, end=end)
+
+
+@pytest.mark.parametrize("window", [(None, None), (datetime(2025, 1, 5), datetime(2025, 1, 12))])
+def test_streamed_report_matches_loaded_report(stored_fleet, window):
+    streamed = stored_fleet / "streamed.jsonl"
+    loaded = stored_fleet / "loaded.jsonl"
+    start, end = window
+    assert export_stored(str(streamed), start=start, end=end) == BATTERIES + 1 + TRUCKS + 1
+    loaded_report(loaded, start, end)
+    assert streamed.read_text() == loaded.read_text()
+
+
+def peak_memory(export):
+    tracemalloc.start()
+    try:
+        export()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_streamed_report_memory_does_not_grow_with_readings(stored_fleet):
+    streamed = peak_memory(lambda: export_stored(str(stored_fleet / "streamed.csv")))
+    loaded = peak_memory(lambda: loaded_report(stored_fleet / "loaded.csv"))
+    assert streamed < loaded / 4
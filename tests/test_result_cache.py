@@ -0,0 +1,89 @@
+"""Cached analytics results must equal a fresh computation."""
+import json
+
+from models.telemetry import TelemetryRecord, to_micros
+from services.analytics_engine import AnalyticsEngine
+from services.parallel_analytics import ParallelAnalyticsRunner
+from services.result_cache import AnalyticsCache, CACHE_VERSION
+from tests.conftest import make_battery
+
+
+def recompute(battery):
+    return AnalyticsEngine().analyze_columns(battery.battery_id,
+                                             [r.temperature_c for r in battery.telemetry],
+                                             [r.voltage_v for r in battery.telemetry],
+                                             [to_micros(r.timestamp) for r in battery.telemetry])
+
+
+def run(battery, cache):
+    return ParallelAnalyticsRunner(workers=1, cache=cache).run([battery])[0]
+
+
+def test_hit_matches_recompute_after_delete_and_add():
+    cache = AnalyticsCache()
+    truck, battery, records = make_battery()
+
+    assert run(battery, cache) == recompute(battery)
+    assert run(battery, cache) == recompute(battery)
+    assert cache.hits == 1
+
+    battery.remove_telemetry(records[3])
+    battery.remove_telemetry(records[8])
+    assert run(battery, cache) == recompute(battery)
+    assert run(battery, cache) == recompute(battery)
+
+    record = TelemetryRecord(100, truck, battery, 45.0, 30.0, 10.0, records[-1].timestamp)
+    battery.add_telemetry(record)
+    assert run(battery, cache) == recompute(battery)
+    assert cache.stats()["misses"] == 3
+
+
+def test_saved_entries_match_recompute(tmp_path):
+    path = str(tmp_path / "cache.json")
+    _, battery, records = make_battery()
+    battery.remove_telemetry(records[5])
+
+    cache = AnalyticsCache(path=path)
+    run(battery, cache)
+    cache.save("stamp-1", [battery])
+
+    # A later session: the same stored data, loaded afresh
+    _, battery, records = make_battery()
+    battery.remove_telemetry(records[5])
+    loaded = AnalyticsCache(path=path)
+    assert loaded.load("stamp-1", [battery]) == 1
+    assert run(battery, loaded) == recompute(battery)
+    assert loaded.hits == 1
+
+    assert AnalyticsCache(path=path).load("stamp-2", [battery]) == 0
+
+
+def test_files_of_other_versions_are_ignored(tmp_path):
+    path = tmp_path / "cache.json"
+    _, battery, _ = make_battery()
+    entries = [[battery.battery_id, None, None, "stale result"]]
+
+    path.write_text(json.dumps({"stamp": "s", "entries": entries}))
+    assert AnalyticsCache(path=str(path)).load("s", [battery]) == 0
+
+    path.write_text(json.dumps({"version": CACHE_VERSION, "stamp": "s", "entries": entries}))
+    assert AnalyticsCache(path=str(path)).load("s", [battery]) == 1
+
+
+def test_save_keeps_entries_of_other_batteries(tmp_path):
+    path = tmp_path / "cache.json"
+    _, battery, _ = make_battery()
+    other = [2, None, None, "battery 2 result"]
+    path.write_text(json.dumps({"version": CACHE_VERSION, "stamp": "s", "entries": [other]}))
+
+    # One battery analyzed, as `fleet.py analytics run --battery 1` does
+    cache = AnalyticsCache(path=str(path))
+    cache.load("s", [battery])
+    run(battery, cache)
+    cache.save("s", [battery])
+    entries = json.loads(path.read_text())["entries"]
+    assert other in entries and len(entries) == 2
+
+    # Changed data: the other battery's entry may be stale
+    cache.save("s2", [battery])
+    assert json.loads(path.read_text())["entries"] == [e for e in entries if e != other]
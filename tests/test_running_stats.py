@@ -0,0 +1,94 @@
+"""Incrementally maintained RunningStats against a from-scratch computation."""
+from datetime import datetime
+
+import pytest
+
+from models.running_stats import RunningStats
+from models.telemetry import TelemetryRecord, to_micros
+from services.analytics_engine import AnalyticsEngine
+from tests.conftest import make_battery
+
+
+def from_scratch(owner):
+    engine = AnalyticsEngine()
+    return engine.summarize_columns([r.temperature_c for r in owner.telemetry],
+                                    [r.voltage_v for r in owner.telemetry],
+                                    [to_micros(r.timestamp) for r in owner.telemetry])
+
+
+def assert_matches(owner):
+    # Same arithmetic in the same order, so equal to the last bit
+    assert AnalyticsEngine().summarize_stats(owner.stats) == from_scratch(owner)
+
+
+def assert_close(owner):
+    # Deletes are reversed rather than recomputed: equal up to rounding
+    assert AnalyticsEngine().summarize_stats(owner.stats) == pytest.approx(from_scratch(owner),
+                                                                           rel=1e-9, abs=1e-12)
+
+
+def test_stats_match_after_adds():
+    truck, battery, _ = make_battery()
+    assert_matches(battery)
+    assert_matches(truck)
+
+
+def test_stats_match_after_delete():
+    truck, battery, records = make_battery()
+    assert_matches(battery)     # build the stats before deleting
+    assert_matches(truck)
+    stats = battery.stats
+
+    for record in (records[5], records[0], records[3], records[-1]):   # records[3] is invalid
+        truck.remove_telemetry(record)
+        battery.remove_telemetry(record)
+        assert_close(battery)
+        assert_close(truck)
+    # Reversed in place, not rebuilt
+    assert battery.stats is stats
+
+    battery.remove_telemetry(records[5])    # no longer there: nothing to take back
+    assert_close(battery)
+
+    for record in records:
+        battery.remove_telemetry(record)
+    assert battery.stats.count == 0
+    assert AnalyticsEngine().summarize_stats(battery.stats) == (0, 0, 100)
+
+
+def test_stats_match_after_delete_then_add():
+    truck, battery, records = make_battery()
+    assert_matches(battery)
+    battery.remove_telemetry(records[4])
+
+    record = TelemetryRecord(100, truck, battery, 25.0, 40.0, 10.0, datetime(2025, 2, 1))
+    battery.add_telemetry(record)
+    assert_close(battery)
+
+
+def test_readding_or_replacing_a_record_counts_it_once():
+    truck, battery, records = make_battery()
+    assert_matches(battery)
+
+    battery.add_telemetry(records[6])
+    assert_matches(battery)
+
+    # Same id, new values: the old reading is taken back
+    replacement = TelemetryRecord(records[6].record_id, truck, battery, 35.0, 44.0, 10.0,
+                                  records[6].timestamp)
+    battery.add_telemetry(replacement)
+    assert battery.stats.count == RunningStats(battery.telemetry).count
+    assert_close(battery)
+
+
+def test_analyze_battery_matches_columns_after_delete():
+    engine = AnalyticsEngine()
+    _, battery, records = make_battery()
+    engine.analyze_battery(battery)
+    battery.remove_telemetry(records[2])
+
+    expected = engine.analyze_columns(battery.battery_id,
+                                      [r.temperature_c for r in battery.telemetry],
+                                      [r.voltage_v for r in battery.telemetry],
+                                      [to_micros(r.timestamp) for r in battery.telemetry])
+    assert engine.analyze_battery(battery) == expected
@@ -0,0 +1,71 @@
+"""
+Imported readings are validated like readings entered by hand: bad rows
+(including JSON lines that are not objects) are rejected, and timestamps
+with a UTC offset are stored as naive UTC so they compare and dedupe
+correctly against the rest of the data, like the default of the current
+UTC time.
+"""
+import io
+from datetime import datetime, timezone
+
+from models.telemetry import TelemetryRecord, naive_utc
+from services.dedupe import dedupe, find_duplicates
+from services.telemetry_import import TelemetryImporter, read_rows
+from tests.conftest import row
+
+
+def jsonl(*lines):
+    return read_rows(io.StringIO("\n".join(lines) + "\n"), "jsonl")
+
+
+def reading(record_id, timestamp):
+    return (f'{{"record_id": {record_id}, "truck_id": 1, "battery_id": 1, "temperature_c": 25, '
+            f'"voltage_v": 48, "current_a": 10, "timestamp": "{timestamp}"}}')
+
+
+def test_offsets_are_stored_as_naive_utc(backend):
+    importer = TelemetryImporter(backend)
+    result = importer.import_rows(jsonl(reading(1, "2025-01-01T12:00:00+02:00"),
+                                        reading(2, "2025-01-01T10:00:00Z"),
+                                        reading(3, "2025-01-01T11:00:00")))
+    assert (result.imported, result.duplicates) == (2, 1)
+    assert [r["timestamp"] for r in backend.read_telemetry()] == [
+        "2025-01-01T10:00:00", "2025-01-01T11:00:00"]
+
+
+def test_lines_that_are_not_objects_are_rejected(backend):
+    importer = TelemetryImporter(backend)
+    result = importer.import_rows(jsonl("5", '"text"', "[1, 2]", "null",
+                                        reading(1, "2025-01-01T10:00:00")))
+    assert result.imported == 1
+    assert result.rejected == 4
+    assert {reason for _, reason, _ in result.rejects} == {"Expected an object"}
+
+
+def test_dedupe_rewrites_stored_offsets(backend):
+    # Written by an older import that kept the offsets
+    backend.upsert("telemetry", [
+        dict(row(1), timestamp="2025-01-01T12:30:00+02:00"),
+        dict(row(2), timestamp="2025-01-01T10:30:00"),
+        dict(row(3), timestamp="2025-01-02T08:00:00-05:00"),
+    ])
+    found = find_duplicates(backend)
+    assert found["telemetry"] == [2]
+    assert [r["record_id"] for r in found["timestamps"]] == [1, 3]
+
+    dedupe(backend)
+    stored = sorted((r["record_id"], r["timestamp"]) for r in backend.read_rows("telemetry"))
+    assert stored == [(1, "2025-01-01T10:30:00"), (3, "2025-01-02T13:00:00")]
+
+
+def test_missing_timestamps_default_to_utc_now(backend):
+    before = naive_utc(datetime.now(timezone.utc))
+    importer = TelemetryImporter(backend)
+    importer.import_rows(jsonl('{"record_id": 1, "truck_id": 1, "battery_id": 1, "temperature_c": 25, '
+                               '"voltage_v": 48, "current_a": 10}'))
+    record = TelemetryRecord(2, None, None, 25.0, 48.0, 10.0)
+    after = naive_utc(datetime.now(timezone.utc))
+
+    stored = datetime.fromisoformat(backend.read_telemetry()[0]["timestamp"])
+    assert before <= stored <= after
+    assert before <= record.timestamp <= after
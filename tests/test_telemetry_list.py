@@ -0,0 +1,54 @@
+"""TelemetryList against a plain list, through indexing and every kind of change."""
+import random
+from datetime import datetime
+
+from models.telemetry import TelemetryRecord
+from models.telemetry_list import TelemetryList
+
+
+def record(record_id):
+    return TelemetryRecord.from_trusted(record_id, None, None, 20.0, 48.0, 10.0,
+                                        datetime(2025, 1, 1))
+
+
+def test_indexing_follows_changes():
+    rng = random.Random(7)
+    stored = [record(i) for i in range(1, 21)]
+    lazy = TelemetryList(loader=lambda: stored)
+    lazy.append(record(100))                # before loading: kept after the stored ones
+    expected = stored + [lazy.get(100)]
+    next_id = 200
+
+    for step in range(300):
+        assert [lazy[i] for i in range(len(lazy))] == expected
+        assert lazy[-1] is expected[-1]
+        op = rng.choice(["append", "replace", "discard", "set", "del", "insert"])
+        if op == "append":
+            next_id += 1
+            r = record(next_id)
+            lazy.append(r)
+            expected.append(r)
+        elif not expected:
+            continue
+        elif op == "replace":
+            i = rng.randrange(len(expected))
+            expected[i] = record(expected[i].record_id)
+            lazy.append(expected[i])        # same id: replaced where it was
+        elif op == "discard":
+            lazy.discard(expected.pop(rng.randrange(len(expected))))
+        elif op == "set":
+            i = rng.randrange(len(expected))
+            next_id += 1
+            expected[i] = record(next_id)
+            lazy[i] = expected[i]
+        elif op == "del":
+            i = rng.randrange(len(expected))
+            del lazy[i]
+            del expected[i]
+        else:
+            i = rng.randrange(len(expected) + 1)
+            next_id += 1
+            expected.insert(i, record(next_id))
+            lazy.insert(i, expected[i])
+
+    assert list(lazy) == expected
@@ -0,0 +1,137 @@
+"""TimeIndex against a brute-force sorted list, through adds, removals and every query."""
+import random
+from datetime import datetime, timedelta
+
+import models.time_index
+from models.battery import Battery
+from models.telemetry import TelemetryRecord
+from models.time_index import TimeIndex
+from models.truck import Truck
+
+START = datetime(2025, 1, 1)
+
+
+def record(record_id, minute, truck=None, battery=None):
+    return TelemetryRecord.from_trusted(record_id, truck, battery, 20.0, 48.0, 10.0,
+                                        START + timedelta(minutes=minute))
+
+
+class BruteIndex:
+    """The records a TimeIndex should hold, as a list sorted on every query."""
+
+    def __init__(self, records=()):
+        self.records = list(records)
+
+    def sorted(self):
+        return sorted(self.records, key=lambda r: (r.timestamp, r.record_id))
+
+    def between(self, start, end):
+        return [r for r in self.sorted()
+                if (start is None or r.timestamp >= start) and (end is None or r.timestamp < end)]
+
+    def latest(self, n):
+        return self.sorted()[::-1][:max(n, 0)]
+
+    def as_of(self, timestamp):
+        taken = [r for r in self.sorted() if r.timestamp <= timestamp]
+        return taken[-1] if taken else None
+
+
+def assert_same(index, brute, rng):
+    assert len(index) == len(brute.records)
+    assert list(index.between()) == brute.sorted()
+    for _ in range(5):
+        # Bounds on whole minutes land on stored timestamps (and their ties)
+        start, end = sorted(START + timedelta(minutes=rng.randrange(-5, 130)) for _ in range(2))
+        assert list(index.between(start, end)) == brute.between(start, end)
+        assert list(index.between(start=start)) == brute.between(start, None)
+        assert list(index.between(end=end)) == brute.between(None, end)
+        timestamp = START + timedelta(minutes=rng.randrange(-5, 130), seconds=rng.choice([0, 30]))
+        assert index.as_of(timestamp) is brute.as_of(timestamp)
+    for n in (0, 1, 3, len(brute.records), len(brute.records) + 2):
+        assert list(index.latest(n)) == brute.latest(n)
+
+
+def test_queries_match_brute_force_through_adds_and_removals():
+    rng = random.Random(11)
+    initial = [record(i, rng.randrange(60)) for i in range(1, 31)]
+    index, brute = TimeIndex(reversed(initial)), BruteIndex(initial)
+    next_id = 100
+
+    for step in range(400):
+        assert_same(index, brute, rng)
+        op = rng.choice(["in_order", "in_order", "late", "again", "remove", "remove_missing"])
+        if op == "in_order":
+            newest = max((r.timestamp for r in brute.records), default=START)
+            next_id += 1
+            r = record(next_id, (newest - START) // timedelta(minutes=1) + rng.randrange(2))
+            assert index.add(r)
+            brute.records.append(r)
+        elif op == "late":
+            next_id += 1
+            r = record(next_id, rng.randrange(120))
+            assert index.add(r)
+            brute.records.append(r)
+        elif not brute.records:
+            continue
+        elif op == "again":
+            assert not index.add(rng.choice(brute.records))
+        elif op == "remove":
+            r = brute.records.pop(rng.randrange(len(brute.records)))
+            assert index.remove(r)
+        else:
+            assert not index.remove(record(next_id + 1, rng.randrange(120)))
+
+    assert_same(index, brute, rng)
+
+
+def test_empty_index():
+    index = TimeIndex()
+    assert list(index.between()) == []
+    assert list(index.latest(3)) == []
+    assert index.as_of(START) is None
+    assert not index.remove(record(1, 0))
+
+
+def test_in_order_appends_skip_the_search(monkeypatch):
+    index = TimeIndex([record(1, 0), record(2, 5)])
+
+    def no_search(*args, **kwargs):
+        raise AssertionError("searched for the position of an in-order append")
+    monkeypatch.setattr(models.time_index, "bisect_left", no_search)
+    appended = [record(3, 5), record(4, 6), record(5, 9)]    # a tie on 5 sorts by id
+    for r in appended:
+        assert index.add(r)
+    monkeypatch.undo()
+
+    # Same timestamp, lower id: searched, and placed before the tie
+    early = record(0, 5)
+    assert index.add(early)
+    assert [r.record_id for r in index.between()] == [1, 0, 2, 3, 4, 5]
+    assert index.as_of(START + timedelta(minutes=5)).record_id == 3
+
+
+def test_owners_keep_their_index_in_step():
+    truck = Truck(1, "TESTVIN0001", "Ford", "F150", 2020)
+    battery = Battery(1, truck, 350.0, 72.0, "active")
+    records = [record(i, 10 * i, truck, battery) for i in range(1, 6)]
+    for r in records:
+        battery.add_telemetry(r)
+        truck.add_telemetry(r)
+
+    for owner in (battery, truck):
+        assert list(owner.time_index.between()) == records
+
+    moved = record(2, 100, truck, battery)          # same id, new time: replaced
+    battery.add_telemetry(moved)
+    truck.add_telemetry(moved)
+    battery.remove_telemetry(records[0])
+    truck.remove_telemetry(records[0])
+
+    expected = [records[2], records[3], records[4], moved]
+    for owner in (battery, truck):
+        assert list(owner.time_index.between()) == expected
+        assert list(owner.time_index.latest(1)) == [moved]
+        assert owner.time_index.as_of(START + timedelta(minutes=25)) is None
+        assert owner.time_index.as_of(START + timedelta(minutes=30)) is records[2]
+        assert list(owner.time_index.between()) == sorted(owner.telemetry, key=lambda r: r.timestamp)
@@ -0,0 +1,83 @@
+"""
+The pure Python analytics against hand-computed values, and the NumPy
+engine against the pure Python one (skipped when NumPy is not installed).
+"""
+import pytest
+
+from models.telemetry import MICROS_PER_DAY
+from services.analytics_engine import AnalyticsEngine
+from services.vectorized_engine import HAS_NUMPY, VectorizedAnalyticsEngine
+
+
+# Battery 1: the 200 °C reading (day 2) is invalid, leaving temperatures
+# 20/30/40 and voltages 48/47/45 on days 0/1/3 -> mean 30, slope
+# -1 V/day, life 95.
+# Battery 2: a single valid reading -> no trend.
+# Battery 3: nothing valid -> the defaults.
+DAY = MICROS_PER_DAY
+BATTERY_IDS = [1, 1, 1, 1, 2, 3]
+TEMPERATURES = [20.0, 30.0, 200.0, 40.0, 10.0, -50.0]
+VOLTAGES = [48.0, 47.0, 46.0, 45.0, 50.0, 48.0]
+TIMESTAMPS = [20000 * DAY, 20001 * DAY, 20002 * DAY, 20003 * DAY, 20000 * DAY, 20000 * DAY]
+
+EXPECTED = {
+    1: (30.0, 1.0, 95.0),
+    2: (10.0, 0, 100),
+    3: (0, 0, 100),
+}
+
+ENGINES = [
+    pytest.param(AnalyticsEngine(), id="python"),
+    pytest.param(VectorizedAnalyticsEngine(use_numpy=False), id="fallback"),
+    pytest.param(VectorizedAnalyticsEngine(), id="numpy",
+                 marks=pytest.mark.skipif(not HAS_NUMPY, reason="NumPy is not installed")),
+]
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_run_regression(engine):
+    slope, intercept = engine.run_regression([0, 1, 2, 3], [1.0, 3.0, 5.0, 7.0])
+    assert slope == pytest.approx(2.0)
+    assert intercept == pytest.approx(1.0)
+    assert engine.run_regression([1], [1.0]) == (0, 0)
+    assert engine.run_regression([2, 2], [1.0, 3.0]) == (0, 0)
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_voltage_fade(engine):
+    # Half a day apart: 1.5 V per reading is 3 V/day
+    assert engine.voltage_fade([48.0, 47.0, 45.0], [0, DAY // 2, DAY]) == pytest.approx(3.0)
+    assert engine.voltage_fade([45.0, 48.0, 47.0], [DAY, 0, DAY // 2]) == pytest.approx(3.0)
+    assert engine.voltage_fade([48.0], [0]) == 0
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_summarize_columns(engine):
+    assert engine.summarize_columns(TEMPERATURES[:4], VOLTAGES[:4], TIMESTAMPS[:4]) == \
+        pytest.approx(EXPECTED[1])
+    assert engine.summarize_columns([], [], []) == (0, 0, 100)
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_summarize_fleet(engine):
+    results = engine.summarize_fleet(BATTERY_IDS, TEMPERATURES, VOLTAGES, TIMESTAMPS)
+    assert results.keys() == EXPECTED.keys()
+    for battery_id, expected in EXPECTED.items():
+        assert results[battery_id] == pytest.approx(expected)
+
+
+@pytest.mark.skipif(not HAS_NUMPY, reason="NumPy is not installed")
+def test_numpy_matches_python_on_generated_fleet():
+    battery_ids, temperatures, voltages, timestamps = [], [], [], []
+    for i in range(20000):
+        battery_ids.append(i // 500 + 1)
+        temperatures.append(200.0 if i % 97 == 0 else 20 + (i * 7919 % 300) / 10)
+        voltages.append(48 - (i % 500) * 0.001 + (i % 7) / 100)
+        timestamps.append(20000 * DAY + (i % 500) * DAY // 24 + i % 13)
+    columns = battery_ids, temperatures, voltages, timestamps
+
+    expected = AnalyticsEngine().summarize_fleet(*columns)
+    actual = VectorizedAnalyticsEngine().summarize_fleet(*columns)
+    assert actual.keys() == expected.keys()
+    for battery_id, values in expected.items():
+        assert actual[battery_id] == pytest.approx(values, rel=1e-6, abs=1e-9)